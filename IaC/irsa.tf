@@ -226,6 +226,14 @@ resource "aws_iam_role_policy" "processor_s3" {
           "arn:aws:s3:::video-analytics-uploads",
           "arn:aws:s3:::video-analytics-uploads/*"
         ]
+      },
+      {
+        # Stage checkpoints are removed once a job finishes
+        Effect = "Allow"
+        Action = [
+          "s3:DeleteObject"
+        ]
+        Resource = "arn:aws:s3:::video-analytics-uploads/checkpoints/*"
       }
     ]
   })
@@ -292,7 +300,11 @@ resource "aws_iam_role_policy" "uploader_s3" {
         Action = [
           "s3:PutObject",
           "s3:GetObject",
-          "s3:ListBucket"
+          "s3:ListBucket",
+          "s3:DeleteObject",
+          "s3:AbortMultipartUpload",
+          "s3:ListMultipartUploadParts",
+          "s3:ListBucketMultipartUploads"
         ]
         Resource = [
           "arn:aws:s3:::video-analytics-uploads",
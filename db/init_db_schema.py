@@ -41,6 +41,14 @@ schema_statements = [
         s3_bucket VARCHAR(255) NOT NULL,
         s3_key VARCHAR(512) NOT NULL,
         thumbnail_key VARCHAR(512),
+        hls_master_key VARCHAR(512),
+        renditions JSON,
+        content_hash VARCHAR(64),
+        duplicate_of UUID,
+        thumbnails JSON,
+        perceptual_hash BIGINT,
+        scene_index BYTEA,
+        audio_summary JSON,
         size_bytes BIGINT,
         duration_seconds INTEGER,
         status VARCHAR(50) DEFAULT 'UPLOADED',
@@ -49,6 +57,14 @@ schema_statements = [
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )''',
+    'ALTER TABLE videos ADD COLUMN IF NOT EXISTS hls_master_key VARCHAR(512)',
+    'ALTER TABLE videos ADD COLUMN IF NOT EXISTS renditions JSON',
+    'ALTER TABLE videos ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)',
+    'ALTER TABLE videos ADD COLUMN IF NOT EXISTS duplicate_of UUID',
+    'ALTER TABLE videos ADD COLUMN IF NOT EXISTS thumbnails JSON',
+    'ALTER TABLE videos ADD COLUMN IF NOT EXISTS perceptual_hash BIGINT',
+    'ALTER TABLE videos ADD COLUMN IF NOT EXISTS scene_index BYTEA',
+    'ALTER TABLE videos ADD COLUMN IF NOT EXISTS audio_summary JSON',
     '''CREATE TABLE IF NOT EXISTS video_views (
         id SERIAL PRIMARY KEY,
         video_id UUID REFERENCES videos(video_id) ON DELETE CASCADE,
@@ -68,6 +84,7 @@ schema_statements = [
     'CREATE INDEX IF NOT EXISTS idx_views_viewed_at ON video_views(viewed_at DESC)',
     'CREATE INDEX IF NOT EXISTS idx_likes_video_id ON video_likes(video_id)',
     'CREATE INDEX IF NOT EXISTS idx_likes_liked_at ON video_likes(liked_at DESC)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_content_hash ON videos(content_hash)',
 ]
 
 # Execute schema
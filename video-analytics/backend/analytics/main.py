@@ -1,22 +1,28 @@
-from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 import boto3
 import os
 import json
+import collections
+import functools
 import logging
+import struct
 import uuid
 import time
-from datetime import datetime
-from prometheus_client import make_asgi_app, Counter, Histogram
+import threading
+from datetime import datetime, timedelta
+from prometheus_client import make_asgi_app, Counter, Gauge, Histogram
 from typing import Optional
 from botocore.exceptions import ClientError
 from sqlalchemy import create_engine, desc
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import QueuePool
-from sqlalchemy import Column, String, BigInteger, Integer, TIMESTAMP, ForeignKey, UUID as SQLA_UUID
+from sqlalchemy import Column, String, BigInteger, Integer, LargeBinary, TIMESTAMP, ForeignKey, JSON, UUID as SQLA_UUID
 from sqlalchemy.sql import func
 from urllib.parse import quote
 
+from metadata_codec import decode_metadata
+
 
 # ============================================================================
 # STRUCTURED JSON LOGGING
@@ -68,6 +74,9 @@ class Video(Base):
     s3_bucket = Column(String(255), nullable=False)
     s3_key = Column(String(512), nullable=False)
     thumbnail_key = Column(String(512))
+    perceptual_hash = Column(BigInteger)
+    scene_index = Column(LargeBinary)
+    audio_summary = Column(JSON)
     size_bytes = Column(BigInteger)
     duration_seconds = Column(Integer)
     status = Column(String(50), default="UPLOADED")
@@ -184,6 +193,12 @@ API_LATENCY = Histogram(
     'API latency in seconds',
     ['endpoint', 'method']
 )
+SIMILARITY_INDEX_SIZE = Gauge('analytics_similarity_index_videos', 'Videos in the in-memory perceptual hash index')
+SIMILARITY_LOOKUP_TIME = Histogram(
+    'analytics_similarity_lookup_seconds',
+    'Hamming-radius lookup time in the perceptual hash index',
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1]
+)
 
 # AWS Client - Real AWS (endpoint_url=None) or LocalStack (if AWS_ENDPOINT_URL is set)
 endpoint_url = os.getenv("AWS_ENDPOINT_URL")  # None for real AWS, URL for LocalStack
@@ -198,6 +213,25 @@ S3_BUCKET = os.getenv("S3_BUCKET_NAME", "video-analytics-uploads")
 # Presigned URL expiration time (1 hour)
 PRESIGNED_URL_EXPIRATION = 3600
 
+# Near-duplicate lookup: new perceptual hashes are picked up incrementally every
+# SIMILARITY_REFRESH_SECONDS and the index is rebuilt from scratch (dropping
+# deleted or re-hashed videos) every SIMILARITY_REBUILD_SECONDS
+SIMILARITY_REFRESH_SECONDS = int(os.getenv("SIMILARITY_REFRESH_SECONDS", "30"))
+SIMILARITY_REBUILD_SECONDS = int(os.getenv("SIMILARITY_REBUILD_SECONDS", "3600"))
+SIMILARITY_DEFAULT_DISTANCE = 10  # Of 64 bits; re-encodes and trims typically land well below this
+
+# Scene index written by the processor (see processor/scenes.py): a header, then
+# one fixed-size little-endian entry per scene
+SCENE_INDEX_MAGIC = b"SCNI"
+SCENE_INDEX_HEADER = struct.Struct("<4sBBHI")  # magic, version, reserved, sample fps, scene count
+SCENE_INDEX_ENTRY = struct.Struct("<IIH")  # start ms, keyframe ms, cut score x 10000
+SCENE_INDEX_MEDIA_TYPE = "application/vnd.video-analytics.scenes"
+
+# Waveform peaks files are content-addressed (peaks-<digest>.bin), so they can be
+# cached for a long time and kept in memory once read
+WAVEFORM_MAX_AGE = int(os.getenv("WAVEFORM_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+WAVEFORM_CACHE_SIZE = int(os.getenv("WAVEFORM_CACHE_SIZE", "512"))
+
 
 # ============================================================================
 # HELPERS
@@ -235,6 +269,179 @@ def log_with_context(level, message, correlation_id=None, video_id=None):
         record.video_id = video_id
     logger.handle(record)
 
+# ============================================================================
+# PERCEPTUAL HASH INDEX
+# ============================================================================
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+# Every 16-bit flip mask ordered by popcount, so the masks with at most k bits set
+# are the prefix FLIP_MASKS[:FLIP_MASK_COUNTS[k]]
+FLIP_MASKS = sorted(range(1 << 16), key=int.bit_count)
+FLIP_MASK_COUNTS = [sum(1 for m in FLIP_MASKS if m.bit_count() <= k) for k in range(17)]
+
+
+class MultiIndexHashTable:
+    """Hamming-radius search over 64-bit hashes (multi-index hashing).
+
+    Each hash is split into four 16-bit substrings with one table per substring.
+    Two hashes within distance r agree to within r // 4 bits on at least one
+    substring (pigeonhole), so a query only probes the buckets of its substrings
+    with up to r // 4 bits flipped and verifies those candidates, instead of
+    comparing against every hash in the catalog.
+    """
+
+    SUBSTRINGS = 4
+    SUBSTRING_BITS = 16
+
+    def __init__(self):
+        self.tables = [collections.defaultdict(list) for _ in range(self.SUBSTRINGS)]
+        self.size = 0
+
+    def _substrings(self, value):
+        mask = (1 << self.SUBSTRING_BITS) - 1
+        return [(value >> (i * self.SUBSTRING_BITS)) & mask for i in range(self.SUBSTRINGS)]
+
+    def add(self, value, item):
+        for table, key in zip(self.tables, self._substrings(value)):
+            table[key].append((value, item))
+        self.size += 1
+
+    def search(self, value, radius):
+        """Yield (distance, hash, item) for every item whose hash is within radius of value"""
+        masks = FLIP_MASKS[:FLIP_MASK_COUNTS[min(radius // self.SUBSTRINGS, self.SUBSTRING_BITS)]]
+        seen = set()
+        for table, key in zip(self.tables, self._substrings(value)):
+            for mask in masks:
+                for entry in table.get(key ^ mask, ()):
+                    if entry in seen:
+                        continue
+                    seen.add(entry)
+                    distance = hamming(value, entry[0])
+                    if distance <= radius:
+                        yield distance, entry[0], entry[1]
+
+
+class PerceptualHashIndex:
+    """In-memory multi-index hash table of every processed video's perceptual hash, kept in sync with RDS"""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Guards the table; held only while inserting or searching
+        self.refresh_lock = threading.Lock()
+        self.table = MultiIndexHashTable()
+        self.hashes = {}  # video_id -> current hash (entries for older hashes are filtered out)
+        self.watermark = None
+        self.refreshed_at = 0.0
+        self.rebuilt_at = 0.0
+
+    def refresh(self):
+        """Load hashes written since the last refresh (or everything, when a rebuild is due)"""
+        if time.monotonic() - self.refreshed_at < SIMILARITY_REFRESH_SECONDS:
+            return
+        # Other requests keep serving from the current table while one refreshes (except the first load)
+        if not self.refresh_lock.acquire(blocking=not self.rebuilt_at):
+            return
+        try:
+            now = time.monotonic()
+            if now - self.refreshed_at < SIMILARITY_REFRESH_SECONDS:
+                return
+            rebuild = now - self.rebuilt_at >= SIMILARITY_REBUILD_SECONDS
+            session = get_db_session()
+            try:
+                query = session.query(Video.video_id, Video.perceptual_hash, Video.updated_at).filter(
+                    Video.status == "PROCESSED", Video.perceptual_hash.isnot(None)
+                )
+                if not rebuild and self.watermark is not None:
+                    # Small overlap so rows committed with a slightly older updated_at are not missed
+                    query = query.filter(Video.updated_at > self.watermark - timedelta(seconds=SIMILARITY_REFRESH_SECONDS))
+                rows = query.all()
+            finally:
+                session.close()
+
+            if rebuild:
+                table, hashes = MultiIndexHashTable(), {}
+                self._insert(table, hashes, rows)
+                with self.lock:
+                    self.table, self.hashes = table, hashes
+                self.rebuilt_at = now
+            else:
+                with self.lock:
+                    self._insert(self.table, self.hashes, rows)
+            self.refreshed_at = now
+            SIMILARITY_INDEX_SIZE.set(len(self.hashes))
+        finally:
+            self.refresh_lock.release()
+
+    def _insert(self, table, hashes, rows):
+        for video_id, signed_hash, updated_at in rows:
+            value = signed_hash & 0xFFFFFFFFFFFFFFFF  # Stored as a signed BIGINT
+            video_id = str(video_id)
+            if hashes.get(video_id) != value:
+                hashes[video_id] = value
+                table.add(value, video_id)
+            if updated_at and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+
+    def similar(self, video_id, max_distance, limit):
+        """Videos within max_distance of video_id's hash, closest first; None if it has no hash"""
+        self.refresh()
+        with SIMILARITY_LOOKUP_TIME.time(), self.lock:
+            value = self.hashes.get(video_id)
+            if value is None:
+                return None
+            matches = sorted(
+                (distance, other) for distance, other_hash, other in self.table.search(value, max_distance)
+                if other != video_id and self.hashes.get(other) == other_hash
+            )
+        return matches[:limit]
+
+
+similarity_index = PerceptualHashIndex()
+
+
+def decode_scene_index(index, duration_seconds=None):
+    """Scenes of a binary scene index as dicts, each ending where the next one starts"""
+    magic, version, _, sample_fps, count = SCENE_INDEX_HEADER.unpack_from(index)
+    if magic != SCENE_INDEX_MAGIC or version != 1:
+        raise ValueError(f"Unsupported scene index (magic={magic!r}, version={version})")
+    entries = list(SCENE_INDEX_ENTRY.iter_unpack(index[SCENE_INDEX_HEADER.size:SCENE_INDEX_HEADER.size + count * SCENE_INDEX_ENTRY.size]))
+    scenes = []
+    for i, (start_ms, keyframe_ms, score) in enumerate(entries):
+        end_ms = entries[i + 1][0] if i + 1 < len(entries) else (duration_seconds * 1000 if duration_seconds else None)
+        scenes.append({
+            'start': start_ms / 1000,
+            'end': end_ms / 1000 if end_ms is not None else None,
+            'keyframe': keyframe_ms / 1000,
+            'score': score / 10000,
+        })
+    return scenes
+
+
+@functools.lru_cache(maxsize=WAVEFORM_CACHE_SIZE)
+def load_immutable_object(bucket, key):
+    """Body of an S3 object whose key changes whenever its content does"""
+    return s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+
+def get_audio_row(video_id):
+    """(s3_bucket, audio_summary) of a video, raising 400/404 like the other video endpoints"""
+    try:
+        video_uuid = uuid.UUID(video_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid video_id format")
+    session = get_db_session()
+    try:
+        row = session.query(Video.s3_bucket, Video.audio_summary).filter(Video.video_id == video_uuid).first()
+    finally:
+        session.close()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Video {video_id} not found")
+    if not row.audio_summary:
+        raise HTTPException(status_code=404, detail=f"No audio analysis for video {video_id}")
+    return row
+
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
@@ -335,9 +542,9 @@ def get_videos(
                                     Bucket=S3_BUCKET,
                                     Key=obj['Key']
                                 )
-                                metadata = json.loads(metadata_obj['Body'].read().decode('utf-8'))
+                                metadata = decode_metadata(metadata_obj['Body'].read())
 
-                                s3_key = metadata.get('s3_key', metadata.get('s3_video_key', ''))
+                                s3_key = metadata.get('s3_key', '')
                                 # Generate presigned URL for video access with Content-Type for streaming
                                 try:
                                     content_type = metadata.get('content_type', 'video/mp4')
@@ -352,7 +559,7 @@ def get_videos(
                                     )
                                 except Exception as e:
                                     log_with_context(logging.WARNING, f"Failed to generate presigned URL for {s3_key}: {str(e)}", correlation_id)
-                                    processed_url = metadata.get('processed_url', f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}")
+                                    processed_url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
 
                                 thumbnail_url = metadata.get('thumbnail_url', '')
 
@@ -380,7 +587,7 @@ def get_videos(
                                         )
                                         log_with_context(logging.INFO, f"Found thumbnail in S3 for {metadata.get('video_id')}, generated presigned URL", correlation_id, metadata.get('video_id'))
                                     except ClientError:
-                                        size_mb = round(metadata.get('size', metadata.get('file_size', 0)) / (1024 * 1024), 2)
+                                        size_mb = round(metadata.get('size', 0) / (1024 * 1024), 2)
                                         runtime = metadata.get('runtime', 0)
                                         if size_mb > 0 and runtime > 0:
                                             thumbnail_url = f"https://via.placeholder.com/320x180.png?text={size_mb}MB*{runtime}s"
@@ -388,13 +595,13 @@ def get_videos(
 
                                 video = {
                                     'video_id': metadata.get('video_id', ''),
-                                    'filename': metadata.get('filename', metadata.get('original_filename', 'unknown')),
+                                    'filename': metadata.get('filename', 'unknown'),
                                     's3_bucket': metadata.get('s3_bucket', S3_BUCKET),
                                     's3_key': s3_key,
                                     'processed_url': processed_url,
                                     'thumbnail_url': thumbnail_url,
-                                    'timestamp': int(metadata.get('timestamp', metadata.get('upload_timestamp', 0))),
-                                    'size': int(metadata.get('size', metadata.get('file_size', 0))),
+                                    'timestamp': int(metadata.get('timestamp', 0)),
+                                    'size': int(metadata.get('size', 0)),
                                     'runtime': int(metadata.get('runtime', 0)),
                                     'views': int(metadata.get('views', 0)),
                                     'likes': int(metadata.get('likes', 0)),
@@ -456,9 +663,9 @@ def get_video(video_id: str, request: Request):
                 Bucket=S3_BUCKET,
                 Key=metadata_key
             )
-            metadata = json.loads(metadata_obj['Body'].read().decode('utf-8'))
+            metadata = decode_metadata(metadata_obj['Body'].read())
 
-            s3_key = metadata.get('s3_key', metadata.get('s3_video_key', ''))
+            s3_key = metadata.get('s3_key', '')
             try:
                 content_type = metadata.get('content_type', 'video/mp4')
                 processed_url = s3_client.generate_presigned_url(
@@ -472,7 +679,7 @@ def get_video(video_id: str, request: Request):
                 )
             except Exception as e:
                 log_with_context(logging.WARNING, f"Failed to generate presigned URL for {s3_key}: {str(e)}", correlation_id, video_id)
-                processed_url = metadata.get('processed_url', f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}")
+                processed_url = f"https://{S3_BUCKET}.s3.amazonaws.com/{s3_key}"
 
             thumbnail_url = metadata.get('thumbnail_url', '')
 
@@ -497,20 +704,20 @@ def get_video(video_id: str, request: Request):
                     )
                     log_with_context(logging.INFO, f"Found thumbnail in S3 for {video_id}, generated presigned URL", correlation_id, video_id)
                 except ClientError:
-                    size_mb = round(metadata.get('size', metadata.get('file_size', 0)) / (1024 * 1024), 2)
+                    size_mb = round(metadata.get('size', 0) / (1024 * 1024), 2)
                     runtime = metadata.get('runtime', 0)
                     if size_mb > 0 and runtime > 0:
                         thumbnail_url = f"https://via.placeholder.com/320x180.png?text={size_mb}MB*{runtime}s"
 
             video = {
                 'video_id': metadata.get('video_id', video_id),
-                'filename': metadata.get('filename', metadata.get('original_filename', 'unknown')),
+                'filename': metadata.get('filename', 'unknown'),
                 's3_bucket': metadata.get('s3_bucket', S3_BUCKET),
                 's3_key': s3_key,
                 'processed_url': processed_url,
                 'thumbnail_url': thumbnail_url,
-                'timestamp': int(metadata.get('timestamp', metadata.get('upload_timestamp', 0))),
-                'size': int(metadata.get('size', metadata.get('file_size', 0))),
+                'timestamp': int(metadata.get('timestamp', 0)),
+                'size': int(metadata.get('size', 0)),
                 'runtime': int(metadata.get('runtime', 0)),
                 'views': int(metadata.get('views', 0)),
                 'likes': int(metadata.get('likes', 0)),
@@ -535,6 +742,155 @@ def get_video(video_id: str, request: Request):
         duration = time.perf_counter() - start_time
         API_LATENCY.labels(endpoint=endpoint, method=method).observe(duration)
 
+@app.get("/video/{video_id}/similar")
+def get_similar_videos(
+    video_id: str,
+    request: Request,
+    max_distance: Optional[int] = Query(SIMILARITY_DEFAULT_DISTANCE, ge=0, le=16, description="Maximum Hamming distance between perceptual hashes (of 64 bits)"),
+    limit: Optional[int] = Query(20, ge=1, le=100, description="Maximum number of videos to return")
+):
+    """Near-duplicates of a video (re-encodes, rescales, trims) by perceptual hash distance."""
+    start_time = time.perf_counter()
+    correlation_id = get_correlation_id(request)
+    endpoint = "/video/{video_id}/similar"
+    method = "GET"
+
+    try:
+        try:
+            video_id = str(uuid.UUID(video_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid video_id format")
+
+        matches = similarity_index.similar(video_id, max_distance, limit)
+        if matches is None:
+            raise HTTPException(status_code=404, detail=f"No perceptual hash for video {video_id}")
+
+        log_with_context(logging.INFO, f"[video_id={video_id}] [action=get_similar] Found {len(matches)} similar videos", correlation_id, video_id)
+        return {
+            'video_id': video_id,
+            'max_distance': max_distance,
+            'similar': [
+                {'video_id': other, 'distance': distance, 'similarity': round(1 - distance / 64, 4)}
+                for distance, other in matches
+            ]
+        }
+    except HTTPException as exc:
+        API_ERRORS.labels(endpoint=endpoint, status_code=exc.status_code).inc()
+        raise
+    except Exception as e:
+        API_ERRORS.labels(endpoint=endpoint, status_code=500).inc()
+        log_with_context(logging.ERROR, f"[video_id={video_id}] [action=get_similar] Error finding similar videos: {str(e)}", correlation_id, video_id)
+        raise HTTPException(status_code=500, detail=f"Failed to find similar videos: {str(e)}")
+    finally:
+        duration = time.perf_counter() - start_time
+        API_LATENCY.labels(endpoint=endpoint, method=method).observe(duration)
+
+@app.get("/video/{video_id}/scenes")
+def get_video_scenes(video_id: str, request: Request):
+    """Scene cuts and one representative keyframe per scene, as JSON or as the
+    processor's binary index (Accept: application/vnd.video-analytics.scenes)."""
+    start_time = time.perf_counter()
+    correlation_id = get_correlation_id(request)
+    endpoint = "/video/{video_id}/scenes"
+    method = "GET"
+
+    try:
+        try:
+            video_uuid = uuid.UUID(video_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid video_id format")
+
+        session = get_db_session()
+        try:
+            row = session.query(Video.scene_index, Video.duration_seconds).filter(Video.video_id == video_uuid).first()
+        finally:
+            session.close()
+        if row is None:
+            raise HTTPException(status_code=404, detail=f"Video {video_id} not found")
+        if row.scene_index is None:
+            raise HTTPException(status_code=404, detail=f"No scene index for video {video_id}")
+
+        # Scene indexes only change when a video is reprocessed
+        headers = {'Cache-Control': 'public, max-age=3600'}
+        if SCENE_INDEX_MEDIA_TYPE in request.headers.get("accept", ""):
+            return Response(content=bytes(row.scene_index), media_type=SCENE_INDEX_MEDIA_TYPE, headers=headers)
+
+        scenes = decode_scene_index(bytes(row.scene_index), row.duration_seconds)
+        log_with_context(logging.INFO, f"[video_id={video_id}] [action=get_scenes] Retrieved {len(scenes)} scenes", correlation_id, video_id)
+        return Response(
+            content=json.dumps({'video_id': video_id, 'scene_count': len(scenes), 'scenes': scenes}),
+            media_type="application/json",
+            headers=headers
+        )
+    except HTTPException as exc:
+        API_ERRORS.labels(endpoint=endpoint, status_code=exc.status_code).inc()
+        raise
+    except Exception as e:
+        API_ERRORS.labels(endpoint=endpoint, status_code=500).inc()
+        log_with_context(logging.ERROR, f"[video_id={video_id}] [action=get_scenes] Error getting scenes: {str(e)}", correlation_id, video_id)
+        raise HTTPException(status_code=500, detail=f"Failed to get scenes: {str(e)}")
+    finally:
+        duration = time.perf_counter() - start_time
+        API_LATENCY.labels(endpoint=endpoint, method=method).observe(duration)
+
+@app.get("/video/{video_id}/audio")
+def get_video_audio(video_id: str, request: Request):
+    """Loudness summary (integrated LUFS, loudness range, sample peak) of a video's audio."""
+    start_time = time.perf_counter()
+    correlation_id = get_correlation_id(request)
+    endpoint = "/video/{video_id}/audio"
+    method = "GET"
+
+    try:
+        summary = dict(get_audio_row(video_id).audio_summary)
+        summary.pop('peaks_key', None)
+        summary['waveform_url'] = f"/video/{video_id}/waveform"
+        return Response(
+            content=json.dumps({'video_id': video_id, **summary}),
+            media_type="application/json",
+            headers={'Cache-Control': 'public, max-age=3600'}
+        )
+    except HTTPException as exc:
+        API_ERRORS.labels(endpoint=endpoint, status_code=exc.status_code).inc()
+        raise
+    except Exception as e:
+        API_ERRORS.labels(endpoint=endpoint, status_code=500).inc()
+        log_with_context(logging.ERROR, f"[video_id={video_id}] [action=get_audio] Error getting audio summary: {str(e)}", correlation_id, video_id)
+        raise HTTPException(status_code=500, detail=f"Failed to get audio summary: {str(e)}")
+    finally:
+        duration = time.perf_counter() - start_time
+        API_LATENCY.labels(endpoint=endpoint, method=method).observe(duration)
+
+@app.get("/video/{video_id}/waveform")
+def get_video_waveform(video_id: str, request: Request):
+    """Binary waveform peaks (8-bit min/max pairs, see processor/audio.py) for the player."""
+    start_time = time.perf_counter()
+    correlation_id = get_correlation_id(request)
+    endpoint = "/video/{video_id}/waveform"
+    method = "GET"
+
+    try:
+        row = get_audio_row(video_id)
+        peaks_key = row.audio_summary.get('peaks_key')
+        if not peaks_key:
+            raise HTTPException(status_code=404, detail=f"No waveform for video {video_id}")
+        etag = '"' + peaks_key.rsplit('-', 1)[-1].split('.', 1)[0] + '"'
+        headers = {'Cache-Control': f'public, max-age={WAVEFORM_MAX_AGE}', 'ETag': etag}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        body = load_immutable_object(row.s3_bucket, peaks_key)
+        return Response(content=body, media_type="application/octet-stream", headers=headers)
+    except HTTPException as exc:
+        API_ERRORS.labels(endpoint=endpoint, status_code=exc.status_code).inc()
+        raise
+    except Exception as e:
+        API_ERRORS.labels(endpoint=endpoint, status_code=500).inc()
+        log_with_context(logging.ERROR, f"[video_id={video_id}] [action=get_waveform] Error getting waveform: {str(e)}", correlation_id, video_id)
+        raise HTTPException(status_code=500, detail=f"Failed to get waveform: {str(e)}")
+    finally:
+        duration = time.perf_counter() - start_time
+        API_LATENCY.labels(endpoint=endpoint, method=method).observe(duration)
+
 @app.get("/stats")
 def get_stats(
     request: Request,
@@ -563,7 +919,7 @@ def get_stats(
                                 Bucket=S3_BUCKET,
                                 Key=obj['Key']
                             )
-                            metadata = json.loads(metadata_obj['Body'].read().decode('utf-8'))
+                            metadata = decode_metadata(metadata_obj['Body'].read())
 
                             processed_item = {
                                 'video_id': metadata.get('video_id', ''),
@@ -571,10 +927,10 @@ def get_stats(
                                 'views': int(metadata.get('views', 0)),
                                 'likes': int(metadata.get('likes', 0)),
                                 'engagement': int(metadata.get('engagement', 0)),
-                                'timestamp': int(metadata.get('upload_timestamp', metadata.get('timestamp', 0))),
+                                'timestamp': int(metadata.get('timestamp', 0)),
                                 's3_bucket': metadata.get('s3_bucket', S3_BUCKET),
-                                's3_key': metadata.get('s3_video_key', ''),
-                                'processed_url': f"https://{metadata.get('s3_bucket', S3_BUCKET)}.s3.amazonaws.com/{metadata.get('s3_video_key', '')}"
+                                's3_key': metadata.get('s3_key', ''),
+                                'processed_url': f"https://{metadata.get('s3_bucket', S3_BUCKET)}.s3.amazonaws.com/{metadata.get('s3_key', '')}"
                             }
                             processed_items.append(processed_item)
                         except Exception as e:
@@ -0,0 +1,110 @@
+"""
+Video metadata record codec (metadata/{video_id}.json objects in S3).
+
+Shared by the uploader, processor and analytics services. Each service is built
+from its own directory, so this file is copied into all three; keep the copies
+identical.
+
+Records are dicts with the canonical fields of the schema version. They are
+stored in one of two encodings; the reader detects which, so objects can be
+written in either and read by any service:
+
+* binary: BINARY_MAGIC, the schema version byte, then a msgpack array of the
+  fields in RECORD_FIELDS order (trailing empty fields omitted), preceded by a
+  map of any non-schema fields. Needs msgpack.
+* json: compact JSON object with "schema_version" and the non-empty fields.
+  Used when msgpack is not installed or METADATA_ENCODING=json.
+
+Legacy objects (pretty-printed JSON that repeats fields under old names) are
+read through LEGACY_ALIASES. The object key keeps its .json name either way.
+"""
+import json
+import os
+
+try:
+    import msgpack
+except ModuleNotFoundError:
+    msgpack = None
+
+SCHEMA_VERSION = 1
+BINARY_MAGIC = b"VAM"
+BINARY_CONTENT_TYPE = "application/vnd.video-analytics.metadata+msgpack"
+JSON_CONTENT_TYPE = "application/json"
+
+# Field order of each schema version's binary encoding. New versions may only
+# append fields, so a reader can decode every version it knows.
+RECORD_FIELDS = {
+    1: (
+        "video_id", "status", "filename", "file_extension", "content_type", "size",
+        "s3_bucket", "s3_key", "content_hash", "timestamp", "runtime",
+        "views", "likes", "engagement",
+        "thumbnail_url", "hls_master_key", "renditions", "thumbnails",
+        "duplicate_of", "perceptual_hash", "scenes_key", "scene_count", "audio",
+        "processed_timestamp", "correlation_id", "processing_timings",
+    ),
+}
+
+# Legacy field name -> canonical field
+LEGACY_ALIASES = {
+    "original_filename": "filename",
+    "file_size": "size",
+    "s3_video_key": "s3_key",
+    "upload_timestamp": "timestamp",
+}
+# Legacy fields that are derived from others (processed_url = bucket + key)
+LEGACY_DERIVED = {"processed_url"}
+
+METADATA_ENCODING = os.getenv("METADATA_ENCODING", "binary")
+
+
+def normalize_metadata(record):
+    """Canonical record from any version's fields, including legacy duplicated ones"""
+    normalized = {}
+    for key, value in record.items():
+        if key == "schema_version" or key in LEGACY_DERIVED:
+            continue
+        canonical = LEGACY_ALIASES.get(key, key)
+        # The canonical name wins over its legacy alias
+        if canonical not in normalized or canonical == key:
+            normalized[canonical] = value
+    return normalized
+
+
+def encode_metadata(record, encoding=None):
+    """Encode a metadata record; returns (body, content_type)"""
+    record = normalize_metadata(record)
+    encoding = encoding or METADATA_ENCODING
+    if encoding == "binary" and msgpack is not None:
+        fields = RECORD_FIELDS[SCHEMA_VERSION]
+        values = [record.get(field) for field in fields]
+        while values and values[-1] is None:
+            values.pop()
+        extra = {key: value for key, value in record.items() if key not in fields}
+        body = BINARY_MAGIC + bytes([SCHEMA_VERSION]) + msgpack.packb([extra] + values, use_bin_type=True)
+        return body, BINARY_CONTENT_TYPE
+    compact = {"schema_version": SCHEMA_VERSION}
+    compact.update((key, value) for key, value in record.items() if value is not None)
+    return json.dumps(compact, separators=(",", ":")).encode("utf-8"), JSON_CONTENT_TYPE
+
+
+def decode_metadata(body):
+    """Canonical record from an encoded object of any version or encoding"""
+    if body[:len(BINARY_MAGIC)] == BINARY_MAGIC:
+        version = body[len(BINARY_MAGIC)]
+        if version not in RECORD_FIELDS:
+            raise ValueError(f"Unsupported metadata schema version {version}")
+        if msgpack is None:
+            raise ValueError("Binary metadata needs msgpack")
+        extra, *values = msgpack.unpackb(body[len(BINARY_MAGIC) + 1:], raw=False)
+        record = {field: value for field, value in zip(RECORD_FIELDS[version], values) if value is not None}
+        record.update(extra)
+        return record
+    return normalize_metadata(json.loads(body))
+
+
+def is_current(body, encoding=None):
+    """Whether an encoded object is already in the current schema and encoding"""
+    encoding = encoding or METADATA_ENCODING
+    if encoding == "binary" and msgpack is not None:
+        return body[:len(BINARY_MAGIC) + 1] == BINARY_MAGIC + bytes([SCHEMA_VERSION])
+    return not body.startswith(BINARY_MAGIC) and json.loads(body).get("schema_version") == SCHEMA_VERSION
@@ -0,0 +1,121 @@
+import json
+import os
+
+import pytest
+
+import metadata_codec
+from metadata_codec import (
+    BINARY_MAGIC,
+    SCHEMA_VERSION,
+    decode_metadata,
+    encode_metadata,
+    is_current,
+)
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+UPLOADED = {
+    "video_id": "0f8e4a52-3c1d-4b7a-9a55-2f0c6d1e7b11",
+    "status": "UPLOADED",
+    "filename": "clip.mp4",
+    "file_extension": "mp4",
+    "content_type": "video/mp4",
+    "size": 1048576,
+    "s3_bucket": "video-analytics-uploads",
+    "s3_key": "videos/0f8e4a52-3c1d-4b7a-9a55-2f0c6d1e7b11.mp4",
+    "content_hash": "ab" * 32,
+    "timestamp": 1760000000,
+    "runtime": 0,
+    "views": 0,
+    "likes": 0,
+    "engagement": 0,
+}
+
+PROCESSED = dict(
+    UPLOADED,
+    status="PROCESSED",
+    runtime=93,
+    thumbnail_url="thumbnails/0f8e4a52/poster_320x180.jpg",
+    renditions=[{"name": "360p", "height": 360, "bandwidth": 896000}],
+    perceptual_hash=-1234567890123,
+    processing_timings={"total_seconds": 12.5, "stages": {"transcode": 9.1}},
+)
+
+
+@pytest.mark.parametrize("encoding", ["binary", "json"])
+@pytest.mark.parametrize("record", [UPLOADED, PROCESSED], ids=["uploaded", "processed"])
+def test_round_trip(record, encoding):
+    body, _ = encode_metadata(record, encoding)
+    assert decode_metadata(body) == record
+    assert is_current(body, encoding)
+
+
+def test_binary_encoding_is_tagged_and_smaller_than_json():
+    body, content_type = encode_metadata(PROCESSED, "binary")
+    json_body, json_content_type = encode_metadata(PROCESSED, "json")
+    assert body[:len(BINARY_MAGIC) + 1] == BINARY_MAGIC + bytes([SCHEMA_VERSION])
+    assert content_type != json_content_type
+    assert len(body) < len(json_body)
+
+
+def test_fields_outside_the_schema_survive():
+    record = dict(UPLOADED, experiment="b")
+    for encoding in ("binary", "json"):
+        assert decode_metadata(encode_metadata(record, encoding)[0])["experiment"] == "b"
+
+
+def test_empty_fields_are_dropped():
+    record = dict(UPLOADED, content_hash=None)
+    decoded = decode_metadata(encode_metadata(record, "binary")[0])
+    assert "content_hash" not in decoded
+    assert "thumbnail_url" not in decoded
+
+
+def test_legacy_record_is_read_under_canonical_names():
+    legacy = {
+        "video_id": UPLOADED["video_id"],
+        "original_filename": "clip.mp4",
+        "file_size": 1048576,
+        "s3_video_key": UPLOADED["s3_key"],
+        "upload_timestamp": 1760000000,
+        "processed_url": "s3://video-analytics-uploads/videos/clip.mp4",
+        "views": 3,
+    }
+    record = decode_metadata(json.dumps(legacy, indent=2).encode())
+    assert record == {
+        "video_id": UPLOADED["video_id"],
+        "filename": "clip.mp4",
+        "size": 1048576,
+        "s3_key": UPLOADED["s3_key"],
+        "timestamp": 1760000000,
+        "views": 3,
+    }
+
+
+def test_canonical_field_wins_over_legacy_alias():
+    legacy = {"filename": "renamed.mp4", "original_filename": "clip.mp4"}
+    assert decode_metadata(json.dumps(legacy).encode())["filename"] == "renamed.mp4"
+    reversed_order = {"original_filename": "clip.mp4", "filename": "renamed.mp4"}
+    assert decode_metadata(json.dumps(reversed_order).encode())["filename"] == "renamed.mp4"
+
+
+def test_legacy_and_older_encodings_are_not_current():
+    legacy = json.dumps({"video_id": "x", "original_filename": "clip.mp4"}).encode()
+    assert not is_current(legacy, "binary")
+    assert not is_current(legacy, "json")
+    assert not is_current(encode_metadata(UPLOADED, "json")[0], "binary")
+    assert not is_current(encode_metadata(UPLOADED, "binary")[0], "json")
+
+
+def test_unknown_schema_version_is_rejected():
+    body = BINARY_MAGIC + bytes([SCHEMA_VERSION + 1]) + encode_metadata(UPLOADED, "binary")[0][len(BINARY_MAGIC) + 1:]
+    with pytest.raises(ValueError):
+        decode_metadata(body)
+
+
+def test_service_copies_are_identical():
+    with open(metadata_codec.__file__, "rb") as f:
+        source = f.read()
+    for service in ("processor", "uploader"):
+        with open(os.path.join(SERVICES_DIR, service, "metadata_codec.py"), "rb") as f:
+            assert f.read() == source, f"{service}/metadata_codec.py differs from analytics'"
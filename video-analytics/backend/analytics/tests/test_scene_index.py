@@ -0,0 +1,39 @@
+import pytest
+
+from main import SCENE_INDEX_ENTRY, SCENE_INDEX_HEADER, SCENE_INDEX_MAGIC, decode_scene_index
+
+
+def scene_index(entries, magic=SCENE_INDEX_MAGIC, version=1, sample_fps=5):
+    """Index in the layout the processor writes (scenes.encode_index)"""
+    header = SCENE_INDEX_HEADER.pack(magic, version, 0, sample_fps, len(entries))
+    return header + b"".join(SCENE_INDEX_ENTRY.pack(*entry) for entry in entries)
+
+
+def test_scenes_end_where_the_next_one_starts():
+    index = scene_index([(0, 400, 0), (2500, 3200, 4500), (7000, 7600, 10000)])
+    assert decode_scene_index(index, duration_seconds=9.5) == [
+        {"start": 0.0, "end": 2.5, "keyframe": 0.4, "score": 0.0},
+        {"start": 2.5, "end": 7.0, "keyframe": 3.2, "score": 0.45},
+        {"start": 7.0, "end": 9.5, "keyframe": 7.6, "score": 1.0},
+    ]
+
+
+def test_last_scene_is_open_without_a_duration():
+    scenes = decode_scene_index(scene_index([(0, 0, 0), (1200, 1400, 3000)]))
+    assert scenes[-1]["end"] is None
+    assert scenes[0]["end"] == 1.2
+
+
+def test_empty_index():
+    assert decode_scene_index(scene_index([]), duration_seconds=10) == []
+
+
+def test_trailing_bytes_are_ignored():
+    index = scene_index([(0, 0, 0)]) + b"\x00" * SCENE_INDEX_ENTRY.size
+    assert len(decode_scene_index(index)) == 1
+
+
+@pytest.mark.parametrize("magic, version", [(b"XXXX", 1), (SCENE_INDEX_MAGIC, 2)])
+def test_unknown_format_is_rejected(magic, version):
+    with pytest.raises(ValueError):
+        decode_scene_index(scene_index([(0, 0, 0)], magic=magic, version=version))
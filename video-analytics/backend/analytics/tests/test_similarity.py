@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+from main import MultiIndexHashTable, hamming
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    """Random hashes plus near-duplicates of a few of them at every distance up to 16"""
+    rng = random.Random(1234)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    for base in hashes[:20]:
+        hashes.extend(flip_bits(base, distance, rng) for distance in range(17))
+    table = MultiIndexHashTable()
+    for n, value in enumerate(hashes):
+        table.add(value, n)
+    return hashes, table
+
+
+@pytest.mark.parametrize("radius", [0, 1, 3, 4, 7, 8, 12, 16])
+def test_search_matches_brute_force(catalog, radius):
+    hashes, table = catalog
+    rng = random.Random(radius)
+    queries = hashes[:20] + [flip_bits(value, 2, rng) for value in hashes[:10]] + [rng.getrandbits(64) for _ in range(10)]
+    for query in queries:
+        expected = {(hamming(query, value), value, n) for n, value in enumerate(hashes) if hamming(query, value) <= radius}
+        assert set(table.search(query, radius)) == expected
+
+
+def test_search_yields_each_item_once(catalog):
+    hashes, table = catalog
+    results = list(table.search(hashes[0], 16))
+    assert len(results) == len(set(results))
+
+
+def test_duplicate_hashes_are_separate_items():
+    table = MultiIndexHashTable()
+    table.add(0xDEADBEEF, "a")
+    table.add(0xDEADBEEF, "b")
+    assert sorted(item for _, _, item in table.search(0xDEADBEEF, 0)) == ["a", "b"]
+    assert table.size == 2
@@ -1,15 +1,19 @@
 import json
 import logging
 import os
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 import httpx
 from fastapi import Depends, FastAPI, HTTPException, Request, Response, status
-from prometheus_client import Counter, Histogram, make_asgi_app
-
-app = FastAPI(title="API Gateway")
+from prometheus_client import Counter, Gauge, Histogram, make_asgi_app
 
+try:
+    import h2  # noqa: F401  (HTTP/2 support for httpx)
+except ModuleNotFoundError:
+    h2 = None
 
 # Structured JSON Logging
 class JSONFormatter(logging.Formatter):
@@ -48,15 +52,98 @@ UPLOADER_URL = os.getenv("UPLOADER_SERVICE_URL", "http://uploader:8000")
 ANALYTICS_URL = os.getenv("ANALYTICS_SERVICE_URL", "http://analytics:8000")
 AUTH_URL = os.getenv("AUTH_SERVICE_URL", "http://auth:8000")
 REQUEST_TIMEOUT = float(os.getenv("GATEWAY_TIMEOUT_SECONDS", "15"))
+# Upload bodies are streamed through as they arrive; a slow client (or the uploader
+# finishing a large file) may take far longer than REQUEST_TIMEOUT between reads
+UPLOAD_TIMEOUT = float(os.getenv("GATEWAY_UPLOAD_TIMEOUT_SECONDS", "600"))
+
+# Upstream connection pools (one long-lived client per upstream service)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("GATEWAY_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("GATEWAY_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Below uvicorn's 5 s keep-alive timeout, so the gateway never reuses a connection the upstream is closing
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("GATEWAY_KEEPALIVE_EXPIRY_SECONDS", "4"))
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("GATEWAY_POOL_TIMEOUT_SECONDS", "5"))
+# HTTP/2 is negotiated over TLS (ALPN), so it only takes effect for https upstreams; needs the h2 package
+UPSTREAM_HTTP2 = os.getenv("GATEWAY_HTTP2", "false").lower() == "true"
+UPSTREAMS = {
+    "uploader": UPLOADER_URL,
+    "analytics": ANALYTICS_URL,
+    "auth": AUTH_URL,
+}
 
 
 # Metrics
-metrics_app = make_asgi_app()
-app.mount("/metrics", metrics_app)
-
 REQUEST_COUNTER = Counter("gateway_requests_total", "Gateway requests", ["endpoint", "method", "status_code"])
 REQUEST_LATENCY = Histogram("gateway_request_latency_seconds", "Gateway latency", ["endpoint", "method"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
 GATEWAY_ERRORS = Counter("gateway_errors_total", "Gateway errors", ["endpoint", "reason"])
+UPSTREAM_IN_FLIGHT = Gauge("gateway_upstream_requests_in_flight", "Requests holding an upstream pool connection", ["upstream"])
+UPSTREAM_POOL_SIZE = Gauge("gateway_upstream_pool_max_connections", "Connection limit of each upstream pool", ["upstream"])
+UPSTREAM_CONNECTIONS_OPENED = Counter("gateway_upstream_connections_opened_total", "New TCP connections opened to upstreams", ["upstream"])
+UPSTREAM_CHECKOUT_SECONDS = Histogram("gateway_upstream_checkout_seconds", "Time from proxying a request to sending it upstream (pool wait + connect)", ["upstream"], buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+
+
+# Response headers kept on passthrough (allow_json=False) routes: caching and the
+# resumable upload protocol
+PASSTHROUGH_HEADERS = (
+    "cache-control", "etag", "last-modified",
+    "location", "tus-resumable", "upload-offset", "upload-length", "upload-expires",
+)
+
+# Request headers that describe the client's connection and are not forwarded upstream
+HOP_BY_HOP_HEADERS = (
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade",
+)
+
+
+upstream_clients = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open one pooled client per upstream for the life of the process"""
+    http2 = UPSTREAM_HTTP2 and h2 is not None
+    if UPSTREAM_HTTP2 and not http2:
+        log_with_context(logging.WARNING, "GATEWAY_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+    limits = httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY
+    )
+    for name in UPSTREAMS:
+        upstream_clients[name] = httpx.AsyncClient(
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, pool=UPSTREAM_POOL_TIMEOUT),
+            limits=limits,
+            http2=http2
+        )
+        UPSTREAM_POOL_SIZE.labels(upstream=name).set(UPSTREAM_MAX_CONNECTIONS)
+    try:
+        yield
+    finally:
+        for client in upstream_clients.values():
+            await client.aclose()
+        upstream_clients.clear()
+
+
+app = FastAPI(title="API Gateway", lifespan=lifespan)
+metrics_app = make_asgi_app()
+app.mount("/metrics", metrics_app)
+
+
+def upstream_for(target_url: str) -> str:
+    for name, base_url in UPSTREAMS.items():
+        if target_url.startswith(base_url):
+            return name
+    raise ValueError(f"No upstream configured for {target_url}")
+
+
+def connection_tracer(upstream: str, start: float):
+    """httpcore trace hook: counts new connections and measures time until the request goes out"""
+    async def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            UPSTREAM_CONNECTIONS_OPENED.labels(upstream=upstream).inc()
+        elif event_name.endswith(".send_request_headers.started"):
+            UPSTREAM_CHECKOUT_SECONDS.labels(upstream=upstream).observe(time.perf_counter() - start)
+    return trace
 
 
 def get_correlation_id(request: Request) -> str:
@@ -64,29 +151,47 @@ def get_correlation_id(request: Request) -> str:
 
 
 def enrich_headers(request: Request, correlation_id: str) -> dict:
-    headers = dict(request.headers)
+    # Header names arrive lower-cased; the client's own correlation id is replaced, not sent twice
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() != "x-correlation-id"}
     headers["X-Correlation-ID"] = correlation_id
     return headers
 
 
-async def forward(request: Request, target_url: str, method: str = "GET", allow_json: bool = True):
+async def forward(request: Request, target_url: str, method: str = "GET", allow_json: bool = True, stream_body: bool = False):
+    """Proxy the request upstream; with stream_body the body is sent on as it arrives instead of buffered"""
     correlation_id = get_correlation_id(request)
     endpoint = request.url.path
     start = datetime.utcnow()
-    body = await request.body()
+    if stream_body:
+        body = request.stream()
+        timeout = httpx.Timeout(UPLOAD_TIMEOUT, connect=REQUEST_TIMEOUT, pool=UPSTREAM_POOL_TIMEOUT)
+    else:
+        body = await request.body()
+        timeout = httpx.USE_CLIENT_DEFAULT
     headers = enrich_headers(request, correlation_id)
+    upstream = upstream_for(target_url)
+    client = upstream_clients[upstream]
 
-    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+    with UPSTREAM_IN_FLIGHT.labels(upstream=upstream).track_inprogress():
         try:
-            resp = await client.request(method, target_url, content=body, headers=headers)
+            resp = await client.request(
+                method,
+                target_url,
+                content=body,
+                headers=headers,
+                timeout=timeout,
+                extensions={"trace": connection_tracer(upstream, time.perf_counter())}
+            )
             status_code = resp.status_code
             REQUEST_COUNTER.labels(endpoint=endpoint, method=method, status_code=status_code).inc()
             if resp.headers.get("content-type", "").startswith("application/json") and allow_json:
                 content = resp.json()
             else:
-                content = resp.text
+                # Passthrough responses keep their bytes (binary bodies) and caching headers
+                content = resp.text if allow_json else resp.content
             log_with_context(logging.INFO, "proxy_success", correlation_id, path=endpoint, target=target_url, status_code=status_code)
-            return Response(content=json.dumps(content) if allow_json else content, status_code=status_code, media_type="application/json" if allow_json else resp.headers.get("content-type", "application/octet-stream"))
+            passthrough_headers = {} if allow_json else {k: v for k, v in resp.headers.items() if k.lower() in PASSTHROUGH_HEADERS}
+            return Response(content=json.dumps(content) if allow_json else content, status_code=status_code, media_type="application/json" if allow_json else resp.headers.get("content-type", "application/octet-stream"), headers=passthrough_headers)
         except httpx.HTTPStatusError as exc:
             status_code = exc.response.status_code
             REQUEST_COUNTER.labels(endpoint=endpoint, method=method, status_code=status_code).inc()
@@ -95,7 +200,7 @@ async def forward(request: Request, target_url: str, method: str = "GET", allow_
             raise HTTPException(status_code=status_code, detail="Upstream error")
         except Exception as exc:
             REQUEST_COUNTER.labels(endpoint=endpoint, method=method, status_code=502).inc()
-            GATEWAY_ERRORS.labels(endpoint=endpoint, reason="exception").inc()
+            GATEWAY_ERRORS.labels(endpoint=endpoint, reason="pool_timeout" if isinstance(exc, httpx.PoolTimeout) else "exception").inc()
             log_with_context(logging.ERROR, f"proxy_exception: {exc}", correlation_id, path=endpoint, target=target_url)
             raise HTTPException(status_code=502, detail="Service Unavailable")
         finally:
@@ -142,6 +247,30 @@ async def get_video(video_id: str, request: Request):
     return await forward(request, target, method="GET")
 
 
+@app.get("/api/analytics/video/{video_id}/similar")
+async def get_similar_videos(video_id: str, request: Request):
+    target = f"{ANALYTICS_URL}/video/{video_id}/similar{('?' + str(request.url.query)) if request.url.query else ''}"
+    return await forward(request, target, method="GET")
+
+
+@app.get("/api/analytics/video/{video_id}/scenes")
+async def get_video_scenes(video_id: str, request: Request):
+    target = f"{ANALYTICS_URL}/video/{video_id}/scenes"
+    return await forward(request, target, method="GET", allow_json=False)
+
+
+@app.get("/api/analytics/video/{video_id}/audio")
+async def get_video_audio(video_id: str, request: Request):
+    target = f"{ANALYTICS_URL}/video/{video_id}/audio"
+    return await forward(request, target, method="GET", allow_json=False)
+
+
+@app.get("/api/analytics/video/{video_id}/waveform")
+async def get_video_waveform(video_id: str, request: Request):
+    target = f"{ANALYTICS_URL}/video/{video_id}/waveform"
+    return await forward(request, target, method="GET", allow_json=False)
+
+
 @app.get("/api/analytics/stats")
 async def get_stats(request: Request):
     target = f"{ANALYTICS_URL}/stats"
@@ -170,14 +299,68 @@ async def upload_health(request: Request):
 @app.post("/api/upload")
 async def upload(request: Request):
     target = f"{UPLOADER_URL}/upload"
+    return await forward(request, target, method="POST", stream_body=True)
+
+
+@app.post("/api/upload/batch")
+async def upload_batch(request: Request):
+    target = f"{UPLOADER_URL}/upload/batch"
+    return await forward(request, target, method="POST", stream_body=True)
+
+
+@app.post("/api/upload/initiate")
+async def upload_initiate(request: Request):
+    target = f"{UPLOADER_URL}/upload/initiate"
+    return await forward(request, target, method="POST")
+
+
+@app.post("/api/upload/{video_id}/parts")
+async def upload_parts(video_id: str, request: Request):
+    target = f"{UPLOADER_URL}/upload/{video_id}/parts"
     return await forward(request, target, method="POST")
 
 
+@app.post("/api/upload/{video_id}/complete")
+async def upload_complete(video_id: str, request: Request):
+    target = f"{UPLOADER_URL}/upload/{video_id}/complete"
+    return await forward(request, target, method="POST")
+
+
+@app.delete("/api/upload/{video_id}")
+async def upload_abort(video_id: str, request: Request):
+    target = f"{UPLOADER_URL}/upload/{video_id}"
+    return await forward(request, target, method="DELETE")
+
+
+@app.post("/api/upload/resumable")
+async def upload_resumable_create(request: Request):
+    target = f"{UPLOADER_URL}/upload/resumable"
+    return await forward(request, target, method="POST", allow_json=False)
+
+
+@app.head("/api/upload/resumable/{video_id}")
+async def upload_resumable_offset(video_id: str, request: Request):
+    target = f"{UPLOADER_URL}/upload/resumable/{video_id}"
+    return await forward(request, target, method="HEAD", allow_json=False)
+
+
+@app.patch("/api/upload/resumable/{video_id}")
+async def upload_resumable_append(video_id: str, request: Request):
+    target = f"{UPLOADER_URL}/upload/resumable/{video_id}"
+    return await forward(request, target, method="PATCH", allow_json=False, stream_body=True)
+
+
+@app.delete("/api/upload/resumable/{video_id}")
+async def upload_resumable_terminate(video_id: str, request: Request):
+    target = f"{UPLOADER_URL}/upload/resumable/{video_id}"
+    return await forward(request, target, method="DELETE", allow_json=False)
+
+
 @app.post("/api/uploader/upload")
 async def upload_legacy(request: Request):
     """Legacy route for backward compatibility"""
     target = f"{UPLOADER_URL}/upload"
-    return await forward(request, target, method="POST")
+    return await forward(request, target, method="POST", stream_body=True)
 
 
 # Auth proxy
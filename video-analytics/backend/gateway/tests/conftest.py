@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Services are flat modules run from their own directory (see the Dockerfile)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,104 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+class Upstream(httpx.AsyncBaseTransport):
+    """Transport for every upstream client; records what reached it"""
+
+    def __init__(self):
+        self.requests = []
+        self.chunks = []  # Per request, the body chunks as they were sent
+        self.response = httpx.Response(200, json={"ok": True})
+        self.error = None
+
+    async def handle_async_request(self, request):
+        self.requests.append(request)
+        self.chunks.append([chunk async for chunk in request.stream])
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    fake = Upstream()
+    for name in main.UPSTREAMS:
+        monkeypatch.setitem(main.upstream_clients, name, httpx.AsyncClient(transport=fake))
+    return fake
+
+
+@pytest.fixture
+def client(upstream):
+    return TestClient(main.app)  # Outside a with block the lifespan does not replace the fake clients
+
+
+def test_json_routes_forward_the_query_and_correlation_id(client, upstream):
+    response = client.get("/api/analytics/videos?limit=5", headers={"X-Correlation-ID": "abc", "Connection": "close", "Keep-Alive": "timeout=5"})
+    assert response.status_code == 200 and response.json() == {"ok": True}
+    request, = upstream.requests
+    assert str(request.url) == f"{main.ANALYTICS_URL}/videos?limit=5"
+    assert request.headers["x-correlation-id"] == "abc"
+    # The client's connection handling must not reach the pooled upstream connection
+    assert "keep-alive" not in request.headers and request.headers.get("connection") != "close"
+
+
+def test_passthrough_routes_keep_bytes_and_caching_headers(client, upstream):
+    payload = bytes(range(256))
+    upstream.response = httpx.Response(200, content=payload, headers={
+        "Content-Type": "application/octet-stream", "ETag": '"v1"', "Cache-Control": "max-age=60", "X-Internal": "1",
+    })
+    response = client.get("/api/analytics/video/abc/scenes")
+    assert response.content == payload
+    assert response.headers["etag"] == '"v1"' and response.headers["cache-control"] == "max-age=60"
+    assert "x-internal" not in response.headers
+
+
+def test_upload_bodies_are_streamed_upstream(client, upstream):
+    upstream.response = httpx.Response(204, headers={"Tus-Resumable": "1.0.0", "Upload-Offset": "6"})
+    chunks = [b"abc", b"def"]
+    response = client.patch(
+        "/api/upload/resumable/abc", content=iter(chunks),
+        headers={"Tus-Resumable": "1.0.0", "Upload-Offset": "0", "Content-Type": "application/offset+octet-stream"}
+    )
+    assert response.status_code == 204
+    assert response.headers["upload-offset"] == "6" and response.headers["tus-resumable"] == "1.0.0"
+    request, = upstream.requests
+    assert str(request.url) == f"{main.UPLOADER_URL}/upload/resumable/abc"
+    assert not isinstance(request.stream, httpx.ByteStream)  # Sent on as it arrived, not buffered first
+    assert b"".join(upstream.chunks[0]) == b"abcdef"
+
+
+def test_small_bodies_are_buffered(client, upstream):
+    client.post("/api/upload/initiate", json={"filename": "clip.mp4", "size": 10})
+    request, = upstream.requests
+    assert isinstance(request.stream, httpx.ByteStream)
+    assert upstream.chunks == [[b'{"filename":"clip.mp4","size":10}']]
+
+
+@pytest.mark.parametrize("error, reason", [
+    (httpx.ConnectError("Connection refused"), "exception"),
+    (httpx.PoolTimeout("No connection available"), "pool_timeout"),
+])
+def test_upstream_failures_are_502(client, upstream, error, reason):
+    upstream.error = error
+    before = main.GATEWAY_ERRORS.labels(endpoint="/api/analytics/stats", reason=reason)._value.get()
+    response = client.get("/api/analytics/stats")
+    assert response.status_code == 502
+    assert main.GATEWAY_ERRORS.labels(endpoint="/api/analytics/stats", reason=reason)._value.get() - before == 1
+
+
+def test_upstream_for_matches_the_configured_base_url():
+    assert main.upstream_for(f"{main.AUTH_URL}/token") == "auth"
+    with pytest.raises(ValueError):
+        main.upstream_for("http://elsewhere:8000/token")
+
+
+def test_lifespan_opens_and_closes_one_client_per_upstream():
+    with TestClient(main.app):
+        clients = dict(main.upstream_clients)
+        assert set(clients) == set(main.UPSTREAMS)
+    assert main.upstream_clients == {}
+    assert all(client.is_closed for client in clients.values())
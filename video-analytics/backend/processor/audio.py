@@ -0,0 +1,167 @@
+"""
+Audio analysis for the processor service: waveform peaks and loudness.
+
+The audio track is decoded once to stereo float samples at SAMPLE_RATE. The
+waveform is the min/max of the mono mix over fixed windows, quantised to 8 bits
+(see PEAKS_HEADER). Loudness follows ITU-R BS.1770 / EBU R128: K-weighted energy
+of 100 ms sub-blocks (K-weighting is applied to each sub-block's spectrum, so no
+sample-by-sample IIR filter is needed), gated 400 ms blocks for the integrated
+loudness and 3 s windows for the loudness range. Runs inside the processor's
+ProcessPoolExecutor, so this module must stay free of import-time side effects.
+"""
+import struct
+
+import ffmpeg
+import numpy as np
+
+SAMPLE_RATE = 24000  # Loudness reads slightly low only for content with strong energy above 12 kHz
+CHANNELS = 2
+PEAKS_PER_SECOND = 10
+SUB_BLOCK_SECONDS = 0.1
+DECODE_CHUNK_SECONDS = 60
+
+# Peaks layout (little endian): header, then an int8 (min, max) pair per window
+PEAKS_MAGIC = b"PEAK"
+PEAKS_VERSION = 1
+PEAKS_HEADER = struct.Struct("<4sBBHIII")  # magic, version, bits, channels, sample rate, samples per peak, count
+
+# BS.1770 K-weighting (pre-filter shelf, then RLB high-pass) as specified at 48 kHz
+_K_WEIGHTING_48K = [
+    ([1.53512485958697, -2.69169618940638, 1.19839281085285], [1.0, -1.69065929318241, 0.73248077421585]),
+    ([1.0, -2.0, 1.0], [1.0, -1.99004745483398, 0.99007225036621]),
+]
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+RANGE_RELATIVE_GATE_LU = -20.0
+
+
+def _k_weighting_power(frequencies):
+    """|H(f)|^2 of the K-weighting filter at the given frequencies (Hz)"""
+    z = np.exp(-2j * np.pi * frequencies / 48000)
+    power = np.ones_like(frequencies)
+    for b, a in _K_WEIGHTING_48K:
+        numerator = b[0] + b[1] * z + b[2] * z ** 2
+        denominator = a[0] + a[1] * z + a[2] * z ** 2
+        power = power * np.abs(numerator / denominator) ** 2
+    return power
+
+
+def _sample_chunks(source, input_options):
+    chunk_bytes = SAMPLE_RATE * CHANNELS * 4 * DECODE_CHUNK_SECONDS
+    process = (
+        ffmpeg.input(source, **input_options).audio
+        .output("pipe:", format="f32le", ac=CHANNELS, ar=SAMPLE_RATE)
+        .global_args("-loglevel", "error", "-nostats")
+        .run_async(pipe_stdout=True)
+    )
+    count = 0
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            count += len(data)
+            yield np.frombuffer(data[:len(data) - len(data) % (CHANNELS * 4)], dtype="<f4").reshape(-1, CHANNELS)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0 and count == 0:
+        raise RuntimeError(f"ffmpeg audio decode failed with exit code {returncode}")
+
+
+def _windowed(samples, window):
+    """Samples padded with silence to whole windows, shape (windows, window, channels)"""
+    padding = -len(samples) % window
+    if padding:
+        samples = np.concatenate([samples, np.zeros((padding, samples.shape[1]), dtype=samples.dtype)])
+    return samples.reshape(-1, window, samples.shape[1])
+
+
+def _gated_mean(energies, gate_energy):
+    gated = energies[energies > gate_energy]
+    return gated.mean() if len(gated) else None
+
+
+def _lufs(energy):
+    return -0.691 + 10 * np.log10(energy)
+
+
+def analyze_audio(source, **input_options):
+    """Decode the audio of source once; returns (encoded peaks, loudness summary)"""
+    samples_per_peak = SAMPLE_RATE // PEAKS_PER_SECOND
+    sub_block = int(SAMPLE_RATE * SUB_BLOCK_SECONDS)
+    spectrum_weights = _k_weighting_power(np.fft.rfftfreq(sub_block, 1 / SAMPLE_RATE))
+    # Parseval: mean square of a block from its one-sided spectrum
+    spectrum_weights[1:-1] *= 2
+    spectrum_weights /= sub_block ** 2
+
+    peaks = []
+    energies = []
+    sample_peak = 0.0
+
+    def consume(samples):
+        nonlocal sample_peak
+        windows = _windowed(samples.mean(axis=1, keepdims=True), samples_per_peak)[..., 0]
+        peaks.append(np.stack([windows.min(axis=1), windows.max(axis=1)], axis=1))
+        spectra = np.abs(np.fft.rfft(_windowed(samples, sub_block), axis=1)) ** 2
+        energies.append((spectra * spectrum_weights[None, :, None]).sum(axis=1))  # (sub-blocks, channels)
+        sample_peak = max(sample_peak, float(np.abs(samples).max()))
+
+    # Chunks are consumed in whole peak windows and sub-blocks; only the tail is padded
+    alignment = int(np.lcm(samples_per_peak, sub_block))
+    remainder = np.zeros((0, CHANNELS), dtype=np.float32)
+    for chunk in _sample_chunks(source, input_options):
+        samples = np.concatenate([remainder, chunk])
+        whole = len(samples) - len(samples) % alignment
+        if whole:
+            consume(samples[:whole])
+        remainder = samples[whole:]
+    if len(remainder):
+        consume(remainder)
+    if not peaks:
+        raise RuntimeError("No audio samples could be decoded")
+
+    peaks = np.concatenate(peaks)
+    quantised = np.clip(np.round(peaks * 127), -128, 127).astype(np.int8)
+    encoded = PEAKS_HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, 8, 1, SAMPLE_RATE, samples_per_peak, len(quantised)) + quantised.tobytes()
+
+    # Channel energies are summed (L and R both have weight 1.0 in BS.1770)
+    sub_block_energy = np.concatenate(energies).sum(axis=1)
+    return encoded, {
+        "integrated_lufs": _integrated_loudness(sub_block_energy),
+        "loudness_range_lu": _loudness_range(sub_block_energy),
+        "sample_peak_dbfs": round(float(20 * np.log10(sample_peak)), 2) if sample_peak > 0 else None,
+        "peaks_per_second": PEAKS_PER_SECOND,
+    }
+
+
+def _block_energies(sub_block_energy, sub_blocks):
+    """Mean energy of every window of `sub_blocks` consecutive sub-blocks (hop of one sub-block)"""
+    if len(sub_block_energy) < sub_blocks:
+        return np.zeros(0)
+    cumulative = np.concatenate([[0.0], np.cumsum(sub_block_energy)])
+    return (cumulative[sub_blocks:] - cumulative[:-sub_blocks]) / sub_blocks
+
+
+def _integrated_loudness(sub_block_energy):
+    """Gated integrated loudness (400 ms blocks, 75% overlap); None for silence"""
+    blocks = _block_energies(sub_block_energy, 4)
+    absolute = 10 ** ((ABSOLUTE_GATE_LUFS + 0.691) / 10)
+    mean = _gated_mean(blocks, absolute)
+    if mean is None:
+        return None
+    relative = mean * 10 ** (RELATIVE_GATE_LU / 10)
+    return round(float(_lufs(_gated_mean(blocks, max(absolute, relative)))), 2)
+
+
+def _loudness_range(sub_block_energy):
+    """EBU Tech 3342 loudness range: 10th to 95th percentile of gated 3 s windows"""
+    windows = _block_energies(sub_block_energy, 30)
+    absolute = 10 ** ((ABSOLUTE_GATE_LUFS + 0.691) / 10)
+    mean = _gated_mean(windows, absolute)
+    if mean is None:
+        return None
+    relative = mean * 10 ** (RANGE_RELATIVE_GATE_LU / 10)
+    loudness = _lufs(windows[windows > max(absolute, relative)])
+    low, high = np.percentile(loudness, [10, 95])
+    return round(float(high - low), 2)
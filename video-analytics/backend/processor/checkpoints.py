@@ -0,0 +1,163 @@
+"""
+Stage checkpoints for the processor service.
+
+A job records each completed stage and its result, so a retry or a
+redelivery resumes at the first incomplete stage. The S3 client and the
+checkpoint directory are passed in, so this module has no import-time side
+effects beyond its metrics.
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+
+from prometheus_client import Counter
+
+logger = logging.getLogger("processor")
+
+STAGES_RESUMED = Counter('processing_stages_resumed_total', 'Processing stages skipped because a checkpoint already covered them', ['stage'])
+
+PROCESSING_STAGES = ("dedup", "download", "probe", "thumbnail", "transcode", "scenes", "audio", "db", "metadata")
+
+
+class JobCheckpoint:
+    """Completed stages of one processing job and their results.
+
+    State is written to <checkpoint_dir>/<video_id>.json next to the job's work
+    directory and to s3://<bucket>/<prefix>/<video_id>.json. The local copy
+    lets a retry reuse the downloaded source while it is still on disk; the S3
+    copy lets a redelivery on another pod skip stages whose outputs are in S3.
+    """
+
+    def __init__(self, video_id, s3_bucket, s3_video_key, file_size, s3_client, checkpoint_dir, prefix="checkpoints"):
+        self.video_id = video_id
+        self.s3_bucket = s3_bucket
+        self.s3_client = s3_client
+        self.checkpoint_dir = checkpoint_dir
+        self.work_dir = os.path.join(checkpoint_dir, video_id)
+        self.local_path = os.path.join(checkpoint_dir, f"{video_id}.json")
+        self.state_key = f"{prefix}/{video_id}.json"
+        # Checkpoints only apply to the exact source object they were taken for
+        self.source = {"s3_video_key": s3_video_key, "size": file_size}
+        self.stages = {}
+
+    @property
+    def source_path(self):
+        return os.path.join(self.work_dir, "source")
+
+    def done(self, stage):
+        return stage in self.stages
+
+    def result(self, stage):
+        return self.stages.get(stage)
+
+    async def load(self):
+        """Restore completed stages (local copy first, then S3); returns the skipped stage names"""
+        state = self._read_local()
+        if state is None:
+            state = await asyncio.to_thread(self._read_remote)
+        if not state or state.get("source") != self.source:
+            self.stages = {}
+            return []
+        self.stages = state.get("stages", {})
+        download = self.stages.get("download")
+        if download and not (os.path.exists(self.source_path) and os.path.getsize(self.source_path) == download["size"]):
+            # Local artifacts are gone (other pod, cleaned up): fetch again if a later stage needs it
+            del self.stages["download"]
+        resumed = [stage for stage in PROCESSING_STAGES if stage in self.stages]
+        for stage in resumed:
+            STAGES_RESUMED.labels(stage=stage).inc()
+        return resumed
+
+    async def complete(self, stage, result=None):
+        """Record a finished stage; persistence failures are logged, never raised"""
+        self.stages[stage] = result
+        state = json.dumps({"source": self.source, "stages": self.stages, "updated_at": int(time.time())})
+        try:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            tmp_path = f"{self.local_path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(state)
+            os.replace(tmp_path, self.local_path)
+        except OSError as e:
+            logger.warning(f"Failed to write local checkpoint: {str(e)}", extra={"video_id": self.video_id})
+        if stage == "download":
+            return  # Only meaningful on the pod that holds the file
+        try:
+            await asyncio.to_thread(
+                self.s3_client.put_object,
+                Bucket=self.s3_bucket, Key=self.state_key, Body=state, ContentType="application/json"
+            )
+        except Exception as e:
+            logger.warning(f"Failed to write checkpoint to S3: {str(e)}", extra={"video_id": self.video_id})
+
+    def remove_artifacts(self):
+        """Delete the work directory; the stage results stay"""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    async def clear(self):
+        """Drop all job state once the job is finished"""
+        discard_local_job_state(self.checkpoint_dir, self.video_id)
+        try:
+            await asyncio.to_thread(self.s3_client.delete_object, Bucket=self.s3_bucket, Key=self.state_key)
+        except Exception as e:
+            logger.warning(f"Failed to delete checkpoint from S3: {str(e)}", extra={"video_id": self.video_id})
+
+    def _read_local(self):
+        try:
+            with open(self.local_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_remote(self):
+        try:
+            response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=self.state_key)
+            return json.loads(response['Body'].read().decode('utf-8'))
+        except Exception:
+            return None
+
+
+_job_locks = {}  # video_id -> [asyncio.Lock, number of jobs holding or waiting]
+
+
+async def run_exclusive(video_id, coro_fn, *args):
+    """Run coro_fn for a video_id with no other job for it in this process (they share a work dir)"""
+    entry = _job_locks.setdefault(video_id, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            return await coro_fn(*args)
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            _job_locks.pop(video_id, None)
+
+
+def discard_local_job_state(checkpoint_dir, video_id):
+    """Delete a job's local work dir and checkpoint file"""
+    shutil.rmtree(os.path.join(checkpoint_dir, video_id), ignore_errors=True)
+    try:
+        os.unlink(os.path.join(checkpoint_dir, f"{video_id}.json"))
+    except FileNotFoundError:
+        pass
+
+
+def prune_local_checkpoints(checkpoint_dir, max_age):
+    """Remove work dirs and checkpoints of jobs abandoned longer than max_age seconds"""
+    if not os.path.isdir(checkpoint_dir):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(checkpoint_dir):
+        path = os.path.join(checkpoint_dir, name)
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.unlink(path)
+        except OSError:
+            pass
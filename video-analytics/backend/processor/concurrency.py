@@ -0,0 +1,230 @@
+"""
+Adaptive concurrency for the processor service.
+
+An AIMD controller resizes the lane scheduler's worker slots from queue
+depth, media-stage latency and the container's CPU and memory headroom (read
+from its cgroup). Queue depths come from a callable passed in, so this module
+has no import-time side effects beyond its metrics.
+"""
+import asyncio
+import logging
+import os
+import time
+
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger("processor")
+
+CONCURRENCY_LIMIT = Gauge('processor_concurrency_limit', 'Current adaptive limit on concurrently processed jobs')
+JOBS_IN_FLIGHT = Gauge('processor_jobs_in_flight', 'Jobs currently holding a worker slot')
+CONCURRENCY_SATURATION = Gauge('processor_concurrency_saturation', 'Jobs in flight divided by the concurrency limit')
+CONCURRENCY_ADJUSTMENTS = Counter('processor_concurrency_adjustments_total', 'Adaptive concurrency limit changes', ['direction'])
+QUEUE_BACKLOG = Gauge('processor_queue_backlog_messages', 'SQS ApproximateNumberOfMessages per priority lane', ['lane'])
+CPU_UTILIZATION = Gauge('processor_cpu_utilization', 'Container CPU usage as a fraction of its limit')
+MEMORY_UTILIZATION = Gauge('processor_memory_utilization', 'Container working set as a fraction of its memory limit')
+LATENCY_RATIO = Gauge('processor_latency_ratio', 'Recent media-stage seconds per MB divided by the baseline')
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def _read_cgroup(*paths):
+    """First readable cgroup file among paths (cgroup v2 first, then v1), stripped"""
+    for path in paths:
+        try:
+            with open(os.path.join(CGROUP_ROOT, path)) as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def container_cpu_limit():
+    """CPUs this container may use: its cgroup quota, or the host's cores without one"""
+    cpu_max = _read_cgroup("cpu.max")
+    if cpu_max and not cpu_max.startswith("max"):
+        quota, period = cpu_max.split()
+        return int(quota) / int(period)
+    quota = _read_cgroup("cpu/cpu.cfs_quota_us", "cpu,cpuacct/cpu.cfs_quota_us")
+    period = _read_cgroup("cpu/cpu.cfs_period_us", "cpu,cpuacct/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return float(os.cpu_count() or 1)
+
+
+def _host_memory_bytes():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class ResourceMonitor:
+    """CPU and memory utilization of this container against its own limits.
+
+    Reads the container's cgroup (the processes ffmpeg spawns are charged to it
+    too) and falls back to host-wide load and memory outside a container.
+    """
+
+    def __init__(self):
+        self._last_cpu = None  # (wall time, cpu seconds used)
+        self._cpu_utilization = 0.0
+
+    def cpu_limit(self):
+        return container_cpu_limit()
+
+    def _cpu_seconds(self):
+        stat = _read_cgroup("cpu.stat")
+        if stat:
+            for line in stat.splitlines():
+                if line.startswith("usage_usec"):
+                    return int(line.split()[1]) / 1e6
+        usage = _read_cgroup("cpuacct/cpuacct.usage", "cpu,cpuacct/cpuacct.usage")
+        return int(usage) / 1e9 if usage else None
+
+    def cpu_utilization(self):
+        """Fraction of the CPU limit used since the previous call"""
+        used = self._cpu_seconds()
+        if used is None:
+            return min(1.0, os.getloadavg()[0] / (os.cpu_count() or 1))
+        now = time.monotonic()
+        if self._last_cpu and now - self._last_cpu[0] < 1.0:
+            return self._cpu_utilization  # Too short a window to measure
+        last, self._last_cpu = self._last_cpu, (now, used)
+        if last is not None:
+            self._cpu_utilization = min(1.0, (used - last[1]) / (now - last[0]) / self.cpu_limit())
+        return self._cpu_utilization
+
+    def memory_utilization(self):
+        """Working set (usage minus reclaimable page cache) as a fraction of the memory limit"""
+        usage = _read_cgroup("memory.current", "memory/memory.usage_in_bytes")
+        limit = _read_cgroup("memory.max", "memory/memory.limit_in_bytes")
+        host_memory = _host_memory_bytes()
+        if usage is None:
+            return 0.0
+        limit = int(limit) if limit and limit != "max" else None
+        if host_memory and (limit is None or limit > host_memory):
+            limit = host_memory  # "Unlimited" cgroups report a huge sentinel
+        inactive_file = 0
+        stat = _read_cgroup("memory.stat", "memory/memory.stat")
+        for line in (stat or "").splitlines():
+            key, _, value = line.partition(" ")
+            if key in ("inactive_file", "total_inactive_file"):
+                inactive_file = int(value)
+        return max(0.0, int(usage) - inactive_file) / limit if limit else 0.0
+
+
+class ConcurrencyController:
+    """Adjusts the scheduler's worker slots with additive increase / multiplicative decrease.
+
+    Every interval seconds:
+      - decrease (x backoff) when memory or CPU is above its high watermark,
+        or when media stages got slower per MB than their baseline;
+      - increase by one when a lane has a backlog in SQS, every slot it may use
+        is taken and there is CPU and memory headroom;
+      - otherwise hold.
+
+    queue_depths is called off the event loop and returns {lane name: messages
+    waiting} for the lanes it could read.
+    """
+
+    def __init__(self, scheduler, queue_depths, min_limit=1, max_limit=10, interval=15.0, backoff=0.7,
+                 cpu_target=0.75, memory_target=0.70, cpu_high_watermark=0.95, memory_high_watermark=0.85,
+                 latency_degradation_ratio=1.5, resources=None):
+        self.scheduler = scheduler
+        self.queue_depths = queue_depths
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.interval = interval
+        self.backoff = backoff
+        self.cpu_target = cpu_target  # Only grow below these...
+        self.memory_target = memory_target
+        self.cpu_high_watermark = cpu_high_watermark  # ...and shrink above these
+        self.memory_high_watermark = memory_high_watermark
+        self.latency_degradation_ratio = latency_degradation_ratio  # Recent vs baseline s/MB
+        self.limit = max(min_limit, min(max_limit, scheduler.capacity))
+        self.resources = resources or ResourceMonitor()
+        self.fast_latency = None  # EWMA of media-stage seconds per MB (recent jobs)
+        self.baseline_latency = None  # Slow EWMA of the same (the "normal" level)
+        self.latency_samples = 0  # Jobs observed since the last decrease
+        self._task = None
+
+    def start(self):
+        self.scheduler.set_capacity(self.limit)
+        CONCURRENCY_LIMIT.set(self.limit)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def observe_latency(self, seconds, size_bytes):
+        """Record how long a job's media stages took, normalized by source size"""
+        per_mb = seconds / max(size_bytes / (1024 * 1024), 1.0)
+        self.latency_samples += 1
+        if self.fast_latency is None:
+            self.fast_latency = self.baseline_latency = per_mb
+            return
+        self.fast_latency += 0.3 * (per_mb - self.fast_latency)
+        self.baseline_latency += 0.05 * (per_mb - self.baseline_latency)
+
+    def latency_ratio(self):
+        if not self.fast_latency or not self.baseline_latency:
+            return 1.0
+        return self.fast_latency / self.baseline_latency
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.adjust()
+            except Exception as e:
+                logger.warning(f"Concurrency adjustment failed: {str(e)}")
+
+    async def adjust(self):
+        depths = await asyncio.to_thread(self.queue_depths)
+        cpu = self.resources.cpu_utilization()
+        memory = self.resources.memory_utilization()
+        latency_ratio = self.latency_ratio()
+        in_flight = sum(self.scheduler.in_flight.values())
+
+        for lane, depth in depths.items():
+            QUEUE_BACKLOG.labels(lane=lane).set(depth)
+        CPU_UTILIZATION.set(cpu)
+        MEMORY_UTILIZATION.set(memory)
+        LATENCY_RATIO.set(latency_ratio)
+
+        limit = self.limit
+        # Latency only counts again once jobs finished under the reduced limit
+        slow = latency_ratio > self.latency_degradation_ratio and self.latency_samples > 0
+        if memory > self.memory_high_watermark or cpu > self.cpu_high_watermark or slow:
+            # Back off from the current load, not the old limit, so an idle limit cannot mask pressure
+            limit = max(self.min_limit, int(min(limit, max(in_flight, 1)) * self.backoff))
+            reason = f"cpu={cpu:.2f} memory={memory:.2f} latency_ratio={latency_ratio:.2f}"
+        else:
+            backlogged = [lane for lane, depth in depths.items() if depth > 0]
+            saturated = bool(backlogged) and all(self.scheduler.free_slots(lane) == 0 for lane in backlogged)
+            if saturated and cpu < self.cpu_target and memory < self.memory_target:
+                limit = min(self.max_limit, limit + 1)
+            reason = f"backlog={sum(depths.values())} cpu={cpu:.2f} memory={memory:.2f}"
+
+        if limit < self.limit:
+            self.latency_samples = 0
+        if limit != self.limit:
+            direction = "up" if limit > self.limit else "down"
+            CONCURRENCY_ADJUSTMENTS.labels(direction=direction).inc()
+            logger.info(f"Concurrency limit {self.limit} -> {limit} ({reason})")
+            self.limit = limit
+            self.scheduler.set_capacity(limit)
+
+        CONCURRENCY_LIMIT.set(self.limit)
+        JOBS_IN_FLIGHT.set(in_flight)
+        CONCURRENCY_SATURATION.set(in_flight / self.limit)
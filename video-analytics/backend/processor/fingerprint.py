@@ -0,0 +1,51 @@
+"""
+Perceptual video fingerprints for near-duplicate detection.
+
+Every sampled frame gets a 64-bit pHash (DCT of a 32x32 grayscale thumbnail,
+low-frequency 8x8 block compared against its median) and the video signature
+is the bitwise majority of its frame hashes. Re-encodes, rescales and trims of
+the same content land within a small Hamming distance of each other. Runs
+inside the processor's ProcessPoolExecutor, so this module must stay free of
+import-time side effects.
+"""
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8  # 8x8 low-frequency coefficients -> 64-bit hash
+PHASH_SIZE = 32
+
+
+def _dct_matrix(n):
+    """Orthonormal DCT-II basis, so that D @ X @ D.T is the 2-D DCT of X"""
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+_BIT_WEIGHTS = (1 << np.arange(HASH_SIZE * HASH_SIZE - 1, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+
+def hash_input(image):
+    """Grayscale PHASH_SIZE x PHASH_SIZE pixels of a frame (the per-frame hashing input)"""
+    return np.asarray(image.convert("L").resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS), dtype=np.float32)
+
+
+def phashes(pixels):
+    """64-bit pHash of every frame in an (n, 32, 32) array, as uint64"""
+    coefficients = (_DCT @ pixels @ _DCT.T)[:, :HASH_SIZE, :HASH_SIZE].reshape(len(pixels), -1)
+    # The DC term only carries overall brightness; leave it out of the median
+    medians = np.median(coefficients[:, 1:], axis=1, keepdims=True)
+    return ((coefficients > medians).astype(np.uint64) * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)
+
+
+def video_signature(frame_hashes):
+    """Bitwise majority of the frame hashes: a single 64-bit hash for the whole video"""
+    bits = (np.asarray(frame_hashes, dtype=np.uint64)[:, None] & _BIT_WEIGHTS) != 0
+    return int(((bits.mean(axis=0) >= 0.5).astype(np.uint64) * _BIT_WEIGHTS).sum(dtype=np.uint64))
+
+
+def signature_of_frames(frame_pixels):
+    """Video signature from the hash_input() arrays of its sampled frames, as 16 hex digits"""
+    return f"{video_signature(phashes(np.stack(frame_pixels))):016x}"
@@ -0,0 +1,98 @@
+"""
+Priority lanes for the processor service.
+
+Received jobs from every lane's queue share the processor's worker slots by
+weighted fair scheduling. Pure asyncio bookkeeping: no clients, no
+import-time side effects beyond its metrics.
+"""
+import asyncio
+import collections
+
+from prometheus_client import Gauge
+
+LANE_JOBS_IN_FLIGHT = Gauge('processor_lane_jobs_in_flight', 'Jobs holding a worker slot per priority lane', ['lane'])
+LANE_JOBS_WAITING = Gauge('processor_lane_jobs_waiting', 'Received jobs waiting for a worker slot per priority lane', ['lane'])
+
+
+class LaneScheduler:
+    """Hands out the processor's worker slots to received jobs across priority lanes.
+
+    A freed slot goes to the waiting lane with the lowest in-flight count per
+    unit of weight, so under a backlog in every lane each lane holds slots in
+    proportion to its weight. Slots reserved for a lane are never handed to
+    another lane, even when the reserving lane is idle.
+    """
+
+    def __init__(self, lanes, capacity):
+        self.lanes = {lane["name"]: lane for lane in lanes}
+        self.capacity = capacity
+        self.in_flight = {name: 0 for name in self.lanes}
+        self.waiters = {name: collections.deque() for name in self.lanes}
+        self._changed = asyncio.Event()
+
+    def _held_back(self, lane):
+        """Unused reservations of the other lanes"""
+        return sum(
+            max(0, min(other["reserved"], self.capacity - 1) - self.in_flight[name])
+            for name, other in self.lanes.items() if name != lane
+        )
+
+    def free_slots(self, lane):
+        return max(0, self.capacity - sum(self.in_flight.values()) - self._held_back(lane))
+
+    def headroom(self, lane):
+        """How many more messages the lane's poller should receive right now"""
+        # Waiting jobs of other lanes only compete for slots those lanes may use
+        waiting = len(self.waiters[lane]) + sum(
+            min(len(q), self.free_slots(name)) for name, q in self.waiters.items() if name != lane
+        )
+        return max(0, self.free_slots(lane) - waiting)
+
+    async def wait_for_headroom(self, lane):
+        while self.headroom(lane) == 0:
+            changed = self._changed
+            await changed.wait()
+
+    async def acquire(self, lane):
+        """Wait for a worker slot for a job from lane"""
+        if not any(self.waiters.values()) and self.free_slots(lane) > 0:
+            self._take(lane)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[lane].append(future)
+        LANE_JOBS_WAITING.labels(lane=lane).inc()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(lane)  # Granted just as we were cancelled
+            else:
+                self.waiters[lane].remove(future)
+            raise
+        finally:
+            LANE_JOBS_WAITING.labels(lane=lane).dec()
+
+    def release(self, lane):
+        self.in_flight[lane] -= 1
+        LANE_JOBS_IN_FLIGHT.labels(lane=lane).set(self.in_flight[lane])
+        self._dispatch()
+
+    def set_capacity(self, capacity):
+        self.capacity = capacity
+        self._dispatch()
+
+    def _take(self, lane):
+        self.in_flight[lane] += 1
+        LANE_JOBS_IN_FLIGHT.labels(lane=lane).set(self.in_flight[lane])
+
+    def _dispatch(self):
+        while True:
+            candidates = [name for name, q in self.waiters.items() if q and self.free_slots(name) > 0]
+            if not candidates:
+                break
+            lane = min(candidates, key=lambda name: (self.in_flight[name] + 1) / self.lanes[name]["weight"])
+            self._take(lane)
+            self.waiters[lane].popleft().set_result(None)
+        # Wake the pollers so they can re-check their headroom
+        self._changed.set()
+        self._changed = asyncio.Event()
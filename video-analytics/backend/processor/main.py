@@ -4,22 +4,44 @@ import os
 import json
 import time
 import asyncio
+import base64
+import contextlib
+import functools
+import hashlib
 import logging
+import math
+import multiprocessing
+import shutil
+import signal
 import tempfile
+import threading
+import types
 import ffmpeg
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from io import BytesIO
-from PIL import Image
-from prometheus_client import make_asgi_app, Counter, Histogram
+from prometheus_client import make_asgi_app, Counter, Gauge, Histogram
+from botocore.config import Config
 from botocore.exceptions import ClientError, BotoCoreError
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.pool import QueuePool
-from sqlalchemy import Column, String, BigInteger, Integer, TIMESTAMP, UUID as SQLA_UUID
+from sqlalchemy import Column, String, BigInteger, Integer, LargeBinary, TIMESTAMP, JSON, UUID as SQLA_UUID
 from sqlalchemy.sql import func
 from urllib.parse import quote
 
+import audio
+from checkpoints import JobCheckpoint, discard_local_job_state, prune_local_checkpoints, run_exclusive
+from concurrency import ConcurrencyController, container_cpu_limit
+from db_batch import VideoWriteBatcher
+from lanes import LaneScheduler
+from metadata_codec import decode_metadata, encode_metadata
+import scenes
+from sqs_batch import SQS_ERRORS, SQSBatcher
+import streaming
+import thumbnails
+import transcode
+
 # ============================================================================
 # STRUCTURED JSON LOGGING SETUP
 # ============================================================================
@@ -38,6 +60,8 @@ class JSONFormatter(logging.Formatter):
             log_data["correlation_id"] = record.correlation_id
         if hasattr(record, "video_id"):
             log_data["video_id"] = record.video_id
+        # Any other structured fields passed to log_with_context (e.g. timings)
+        log_data.update(getattr(record, "fields", {}))
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
         return json.dumps(log_data)
@@ -67,9 +91,16 @@ app.mount("/metrics", metrics_app)
 VIDEOS_PROCESSED = Counter('videos_processed_total', 'Total successfully processed videos')
 VIDEOS_FAILED = Counter('videos_processing_errors_total', 'Total video processing errors')
 PROCESSING_TIME = Histogram('video_processing_seconds', 'Time spent processing video')
+TRANSCODE_TIME = Histogram('video_transcode_seconds', 'Time spent transcoding one rendition', ['rendition'], buckets=[1, 5, 15, 30, 60, 120, 300, 600, 1200])
 SQS_MESSAGES_RECEIVED = Counter('sqs_messages_received_total', 'Total SQS messages received')
-SQS_MESSAGES_DELETED = Counter('sqs_messages_deleted_total', 'Total SQS messages deleted')
-SQS_ERRORS = Counter('sqs_errors_total', 'Total SQS errors')
+LANE_MESSAGES_RECEIVED = Counter('processor_lane_messages_received_total', 'SQS messages received per priority lane', ['lane'])
+LANE_SLOT_WAIT_TIME = Histogram('processor_lane_slot_wait_seconds', 'Time a received job waited for a worker slot', ['lane'], buckets=[0.01, 0.1, 0.5, 1, 5, 15, 30, 60, 120, 300])
+LANE_TIME_TO_READY = Histogram('processor_lane_time_to_ready_seconds', 'Time from enqueue to processed, per priority lane', ['lane'], buckets=[5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600])
+STAGE_DURATION = Histogram('processor_stage_seconds', 'Time spent in each processing stage', ['stage'], buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600])
+STAGE_BYTES = Counter('processor_stage_bytes_total', 'Bytes read or written by each processing stage', ['stage'])
+STAGE_THROUGHPUT = Gauge('processor_stage_throughput_mbps', 'Throughput of the most recent run of each stage (MB/s)', ['stage'])
+DOWNLOAD_THROUGHPUT = Histogram('processor_download_throughput_mbps', 'Achieved source download throughput (MB/s)', ['mode'], buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500])
+DOWNLOAD_PART_RETRIES = Counter('processor_download_part_retries_total', 'Ranged source download parts retried after a read error')
 
 # ============================================================================
 # DATABASE SETUP
@@ -85,6 +116,14 @@ class Video(Base):
     s3_bucket = Column(String(255), nullable=False)
     s3_key = Column(String(512), nullable=False)
     thumbnail_key = Column(String(512))
+    hls_master_key = Column(String(512))
+    renditions = Column(JSON)
+    thumbnails = Column(JSON)
+    content_hash = Column(String(64), unique=True)
+    duplicate_of = Column(SQLA_UUID(as_uuid=True))  # Original whose renditions/thumbnails this row points at
+    perceptual_hash = Column(BigInteger)
+    scene_index = Column(LargeBinary)
+    audio_summary = Column(JSON)
     size_bytes = Column(BigInteger)
     duration_seconds = Column(Integer)
     status = Column(String(50), default="UPLOADED")
@@ -145,17 +184,31 @@ def create_db_engine():
     return engine
 
 
+db_engine = None
+SessionLocal = None
+_db_engine_lock = threading.Lock()
+
+
+def get_db_engine():
+    """Return the shared, pooled engine (created on first use)"""
+    global db_engine, SessionLocal
+    with _db_engine_lock:
+        if db_engine is None:
+            engine = create_db_engine()
+            SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            db_engine = engine
+    return db_engine
+
+
 def get_db_session():
-    """Get a database session"""
-    engine = create_db_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    """Get a database session on the shared engine"""
+    get_db_engine()
     return SessionLocal()
 
 
 # Initialize database
 try:
-    db_engine = create_db_engine()
-    Base.metadata.create_all(bind=db_engine)
+    Base.metadata.create_all(bind=get_db_engine())
     logger.info("Database initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize database: {str(e)}")
@@ -175,16 +228,122 @@ s3_client = boto3.client(
     endpoint_url=endpoint_url if endpoint_url else None
 )
 
+# Source downloads: objects of at least DOWNLOAD_PARTS_MIN_BYTES are fetched as
+# DOWNLOAD_PART_BYTES ranged GETs, DOWNLOAD_CONCURRENCY at a time, written in place
+# into a preallocated file. A dedicated client keeps these connections from
+# competing with rendition uploads and checkpoint writes on s3_client's pool.
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "16"))
+DOWNLOAD_PART_BYTES = int(os.getenv("DOWNLOAD_PART_BYTES", str(16 * 1024 * 1024)))
+DOWNLOAD_PARTS_MIN_BYTES = int(os.getenv("DOWNLOAD_PARTS_MIN_BYTES", str(2 * DOWNLOAD_PART_BYTES)))
+DOWNLOAD_PART_ATTEMPTS = 3
+download_client = boto3.client(
+    's3',
+    region_name=os.getenv("AWS_REGION", "us-east-1"),
+    endpoint_url=endpoint_url if endpoint_url else None,
+    # One connection per concurrent part (per job), with headroom for concurrent jobs
+    config=Config(max_pool_connections=DOWNLOAD_CONCURRENCY * 2, retries={"max_attempts": 5, "mode": "standard"})
+)
+
 QUEUE_URL = os.getenv("SQS_QUEUE_URL", "")
+FAST_QUEUE_URL = os.getenv("SQS_FAST_QUEUE_URL", "")  # Small uploads (optional, see uploader routing)
 S3_BUCKET = os.getenv("S3_BUCKET_NAME", "video-analytics-uploads")
 DLQ_URL = os.getenv("SQS_DLQ_URL", "")  # Dead-Letter Queue URL (optional)
 
+# Priority lanes: every lane is polled separately and jobs share WORKER_CONCURRENCY
+# slots by weighted fair scheduling. FAST_LANE_RESERVED_SLOTS are kept free for the
+# fast lane so a backlog of long videos can never take every slot.
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "5"))  # Starting point for the adaptive limit
+FAST_LANE_WEIGHT = float(os.getenv("FAST_LANE_WEIGHT", "3"))
+FAST_LANE_RESERVED_SLOTS = int(os.getenv("FAST_LANE_RESERVED_SLOTS", "1"))
+LANES = [
+    lane for lane in (
+        {"name": "fast", "queue_url": FAST_QUEUE_URL, "weight": FAST_LANE_WEIGHT, "reserved": FAST_LANE_RESERVED_SLOTS},
+        {"name": "standard", "queue_url": QUEUE_URL, "weight": 1.0, "reserved": 0},
+    )
+    if lane["queue_url"] or lane["name"] == "standard"
+]
+
 # Retry configuration
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
 RETRY_BACKOFF_FACTOR = float(os.getenv("RETRY_BACKOFF_FACTOR", "2.0"))  # Exponential backoff
-PROCESSING_TIMEOUT = int(os.getenv("PROCESSING_TIMEOUT", "300"))  # 5 minutes
+VISIBILITY_TIMEOUT = 300  # 5 minutes, extended by a heartbeat while a message is in flight
+
+# Stage watchdog: jobs have no overall deadline (the heartbeat keeps the message
+# while they run); each process pool task gets STAGE_TIMEOUT_BASE plus
+# STAGE_TIMEOUT_PER_MEDIA_SECOND per second of the source, capped at STAGE_TIMEOUT_MAX
+# (also used before the duration is known). Presigned source URLs live as long.
+STAGE_TIMEOUT_BASE = float(os.getenv("STAGE_TIMEOUT_BASE_SECONDS", "300"))
+STAGE_TIMEOUT_PER_MEDIA_SECOND = float(os.getenv("STAGE_TIMEOUT_PER_MEDIA_SECOND", "4"))
+STAGE_TIMEOUT_MAX = float(os.getenv("STAGE_TIMEOUT_MAX_SECONDS", str(6 * 3600)))
+
+# Transcoding: one pool task per rendition. The pool is sized from the container's
+# CPU quota, not the node's cores. Each ffmpeg may use the whole quota, so a lone
+# job is not held to a fraction of it; the quota caps concurrent ones.
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", str(max(1, math.ceil(container_cpu_limit())))))
+TRANSCODE_THREADS = int(os.getenv("TRANSCODE_THREADS", str(max(1, math.ceil(container_cpu_limit())))))
+RENDITIONS_PREFIX = "renditions"
+SCENES_PREFIX = "scenes"
+AUDIO_PREFIX = "audio"
+CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+    ".jpg": "image/jpeg",
+    ".webp": "image/webp",
+    ".vtt": "text/vtt",
+}
+# Sources at least this long are split at keyframes and their chunks encoded in parallel
+SEGMENT_PARALLEL_MIN_SECONDS = float(os.getenv("SEGMENT_PARALLEL_MIN_SECONDS", "300"))
+SEGMENT_CHUNK_SECONDS = float(os.getenv("SEGMENT_CHUNK_SECONDS", "60"))
+
+# Thumbnail source: "url" reads the object through a presigned URL with HTTP range
+# requests (falls back to a full download on failure), "download" always downloads
+THUMBNAIL_SOURCE_MODE = os.getenv("THUMBNAIL_SOURCE_MODE", "url").lower()
+HTTP_INPUT_OPTIONS = {
+    "reconnect": 1,
+    "reconnect_delay_max": 5,
+    "rw_timeout": 30 * 1000000,  # microseconds
+}
+
+# Source ingestion: "download" writes the source to disk first; "stream" pipes the
+# S3 object into a single ffmpeg (via a bounded buffer) when the container can be
+# read sequentially, and falls back to downloading otherwise
+SOURCE_INGEST_MODE = os.getenv("SOURCE_INGEST_MODE", "download").lower()
+STREAM_CHUNK_BYTES = int(os.getenv("STREAM_CHUNK_BYTES", str(1024 * 1024)))
+STREAM_BUFFER_CHUNKS = int(os.getenv("STREAM_BUFFER_CHUNKS", "16"))  # Buffer holds at most 16MB by default
+
+# Stage checkpoints: retries and redeliveries resume at the first incomplete stage.
+# Job work dirs (downloaded source, encoded outputs) live under CHECKPOINT_DIR so
+# they survive a container restart; stage results are also kept in S3 for other pods.
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join(tempfile.gettempdir(), "processor-jobs"))
+CHECKPOINT_PREFIX = "checkpoints"
+CHECKPOINT_MAX_AGE = int(os.getenv("CHECKPOINT_MAX_AGE_SECONDS", str(24 * 3600)))
+
+# Adaptive concurrency (AIMD): the slot count moves between MIN/MAX_CONCURRENCY
+MIN_CONCURRENCY = int(os.getenv("MIN_CONCURRENCY", "1"))
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", str(max(WORKER_CONCURRENCY, 2 * TRANSCODE_WORKERS))))
+CONCURRENCY_ADJUST_INTERVAL = float(os.getenv("CONCURRENCY_ADJUST_INTERVAL_SECONDS", "15"))
+CONCURRENCY_BACKOFF = float(os.getenv("CONCURRENCY_BACKOFF", "0.7"))  # Multiplicative decrease
+CPU_TARGET = float(os.getenv("CPU_TARGET", "0.75"))  # Only grow below these...
+MEMORY_TARGET = float(os.getenv("MEMORY_TARGET", "0.70"))
+CPU_HIGH_WATERMARK = float(os.getenv("CPU_HIGH_WATERMARK", "0.95"))  # ...and shrink above these
+MEMORY_HIGH_WATERMARK = float(os.getenv("MEMORY_HIGH_WATERMARK", "0.85"))
+LATENCY_DEGRADATION_RATIO = float(os.getenv("LATENCY_DEGRADATION_RATIO", "1.5"))  # Recent vs baseline s/MB
+
+# RDS write batching: completed jobs are upserted together every DB_BATCH_INTERVAL seconds
+DB_BATCH_INTERVAL = float(os.getenv("DB_BATCH_INTERVAL_SECONDS", "0.25"))
+DB_BATCH_MAX_ROWS = int(os.getenv("DB_BATCH_MAX_ROWS", "100"))
+
+# SQS batching configuration (deletes and DLQ sends are grouped into *_batch calls)
+SQS_BATCH_MAX_WAIT = float(os.getenv("SQS_BATCH_MAX_WAIT_SECONDS", "0.5"))
+SQS_BATCH_MAX_RETRIES = int(os.getenv("SQS_BATCH_MAX_RETRIES", "3"))
+
+# Shutdown: in-flight jobs get this long to finish (and be acked) before they are
+# cancelled and left for redelivery; keep it below terminationGracePeriodSeconds
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("SHUTDOWN_GRACE_SECONDS", "20"))
 
 is_running = True
+transcode_pool = None  # ProcessPoolExecutor, created on startup
+active_jobs = set()  # process_message_safe tasks of all lanes
 
 # ============================================================================
 # HELPER FUNCTIONS
@@ -204,6 +363,8 @@ def log_with_context(level, message, correlation_id=None, video_id=None, **kwarg
         record.correlation_id = correlation_id
     if video_id:
         record.video_id = video_id
+    if kwargs:
+        record.fields = kwargs
     logger.handle(record)
 
 def validate_video_id(video_id: str) -> bool:
@@ -217,6 +378,208 @@ def validate_video_id(video_id: str) -> bool:
         # Allow non-UUID formats too (flexible)
         return len(video_id) > 5 and len(video_id) < 256
 
+# ============================================================================
+# STAGE TIMING
+# ============================================================================
+class StageTimer:
+    """Stage timings of one processing attempt.
+
+    Every timed stage feeds the stage histogram, bytes counter and throughput
+    gauge; the per-job breakdown goes into the job's log line and metadata.
+    Thumbnail and transcode stages run concurrently, so their times overlap.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = {}
+        self.bytes = {}
+        self.resumed = []
+
+    @contextlib.contextmanager
+    def stage(self, name, nbytes=0):
+        """Time the block as stage name; set .bytes on the yielded span if only known at the end"""
+        span = types.SimpleNamespace(bytes=nbytes)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            self.record(name, time.perf_counter() - start, span.bytes)
+
+    def record(self, name, seconds, nbytes=0):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        STAGE_DURATION.labels(stage=name).observe(seconds)
+        if nbytes:
+            self.bytes[name] = self.bytes.get(name, 0) + nbytes
+            STAGE_BYTES.labels(stage=name).inc(nbytes)
+            if seconds > 0:
+                STAGE_THROUGHPUT.labels(stage=name).set(nbytes / seconds / (1024 * 1024))
+
+    def breakdown(self):
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": {name: round(seconds, 3) for name, seconds in self.seconds.items()},
+            "bytes": dict(self.bytes),
+            "resumed": list(self.resumed),
+        }
+
+# ============================================================================
+# RDS WRITE BATCHING (idempotent upserts)
+# ============================================================================
+video_writer = VideoWriteBatcher(get_db_engine, Video.__table__, interval=DB_BATCH_INTERVAL, max_rows=DB_BATCH_MAX_ROWS)
+
+# ============================================================================
+# STAGE WATCHDOG (per-task deadlines in the process pool)
+# ============================================================================
+class StageTimeout(Exception):
+    """A process pool task of a job ran past its deadline and its ffmpeg processes were killed"""
+
+
+_timed_out_jobs = set()  # video_ids whose ffmpeg processes the watchdog killed in this attempt
+_job_pool_tasks = {}  # video_id -> pool futures (concurrent.futures) not finished yet
+
+
+def stage_timeout(duration=None):
+    """Deadline in seconds for one pool task working on a source of `duration` seconds"""
+    if duration is None:
+        return STAGE_TIMEOUT_MAX
+    return min(STAGE_TIMEOUT_MAX, STAGE_TIMEOUT_BASE + STAGE_TIMEOUT_PER_MEDIA_SECOND * duration)
+
+
+def presigned_source_url(s3_bucket, s3_video_key, duration=None):
+    """URL ffmpeg reads the source through; valid as long as the task that reads it may run"""
+    return s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': s3_bucket, 'Key': s3_video_key},
+        ExpiresIn=int(stage_timeout(duration))
+    )
+
+
+def kill_job_processes(video_id):
+    """SIGKILL every ffmpeg/ffprobe working on a job; returns how many were killed.
+    
+    They run in pool workers shared by all jobs, so they are found by the job's
+    video_id in their arguments (work dir paths and presigned source URLs contain it).
+    """
+    marker = video_id.encode()
+    killed = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                args = f.read().split(b"\0")
+        except OSError:
+            continue
+        if os.path.basename(args[0]) in (b"ffmpeg", b"ffprobe") and any(marker in arg for arg in args[1:]):
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+                killed += 1
+            except OSError:
+                pass
+    return killed
+
+
+def abandon_work_dir(video_id):
+    """Move a job's work dir aside (deleted in the background) so the retry starts in a fresh one"""
+    work_dir = os.path.join(CHECKPOINT_DIR, video_id)
+    stale_dir = f"{work_dir}.abandoned-{time.time_ns()}"
+    try:
+        os.rename(work_dir, stale_dir)
+    except OSError:
+        return
+    threading.Thread(target=shutil.rmtree, args=(stale_dir, True), daemon=True).start()
+
+
+def job_timed_out(video_id):
+    """Whether the watchdog killed this job's processes (so a failed optional stage must not be checkpointed)"""
+    return video_id in _timed_out_jobs
+
+
+async def run_in_pool(video_id, fn, *args, duration=None):
+    """Run fn(*args) in the transcode pool, stopping the whole job if it overruns its deadline"""
+    if job_timed_out(video_id):
+        raise StageTimeout("Job was stopped by the stage watchdog")
+    timeout = stage_timeout(duration)
+    task = transcode_pool.submit(fn, *args)
+    tasks = _job_pool_tasks.setdefault(video_id, set())
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(task), timeout=timeout)
+    except asyncio.TimeoutError:
+        name = getattr(fn, "func", fn).__name__
+        killed = await stop_job_processes(video_id)
+        log_with_context(logging.ERROR, 
+            f"{name} exceeded its {timeout:.0f}s deadline, killed {killed} ffmpeg processes", 
+            video_id=video_id)
+        raise StageTimeout(f"{name} exceeded its {timeout:.0f}s deadline")
+    except asyncio.CancelledError:
+        if job_timed_out(video_id):
+            # Queued task cancelled because another task of the job timed out
+            raise StageTimeout("Job was stopped by the stage watchdog") from None
+        raise
+    finally:
+        if not tasks and _job_pool_tasks.get(video_id) is tasks:
+            del _job_pool_tasks[video_id]
+
+
+async def stop_job_processes(video_id):
+    """Cancel the job's queued pool tasks and kill the ffmpeg processes of its running ones"""
+    _timed_out_jobs.add(video_id)
+    for task in list(_job_pool_tasks.get(video_id, ())):
+        task.cancel()  # Only succeeds for tasks no worker has started
+    # Cancelling a running task does not stop the worker: its ffmpeg has to be killed
+    return await asyncio.to_thread(kill_job_processes, video_id)
+
+
+async def reap_timed_out_job(video_id, grace=30):
+    """After a watchdog timeout: wait for the job's pool workers to let go, then give the retry a fresh work dir"""
+    deadline = time.monotonic() + grace
+    while _job_pool_tasks.get(video_id) and time.monotonic() < deadline:
+        # A worker may have started another ffmpeg for the job after the first kill
+        await asyncio.to_thread(kill_job_processes, video_id)
+        await asyncio.sleep(0.5)
+    _job_pool_tasks.pop(video_id, None)
+    await asyncio.to_thread(abandon_work_dir, video_id)
+    _timed_out_jobs.discard(video_id)
+
+# ============================================================================
+# PRIORITY LANES (weighted fair worker slots)
+# ============================================================================
+scheduler = LaneScheduler(LANES, WORKER_CONCURRENCY)
+ack_batchers = {
+    lane["name"]: SQSBatcher(sqs_client, "delete", lane["queue_url"], max_wait=SQS_BATCH_MAX_WAIT, max_retries=SQS_BATCH_MAX_RETRIES, backoff_factor=RETRY_BACKOFF_FACTOR)
+    for lane in LANES
+}
+
+# ============================================================================
+# ADAPTIVE CONCURRENCY (AIMD on queue depth, latency and resource headroom)
+# ============================================================================
+def lane_queue_depths():
+    """ApproximateNumberOfMessages of every lane's queue (lanes that could not be read are left out)"""
+    depths = {}
+    for lane in LANES:
+        try:
+            attributes = sqs_client.get_queue_attributes(
+                QueueUrl=lane["queue_url"], AttributeNames=['ApproximateNumberOfMessages']
+            )["Attributes"]
+            depths[lane["name"]] = int(attributes.get('ApproximateNumberOfMessages', 0))
+        except (ClientError, BotoCoreError, KeyError, ValueError):
+            SQS_ERRORS.inc()
+    return depths
+
+
+controller = ConcurrencyController(
+    scheduler, lane_queue_depths,
+    min_limit=MIN_CONCURRENCY, max_limit=MAX_CONCURRENCY, interval=CONCURRENCY_ADJUST_INTERVAL, backoff=CONCURRENCY_BACKOFF,
+    cpu_target=CPU_TARGET, memory_target=MEMORY_TARGET,
+    cpu_high_watermark=CPU_HIGH_WATERMARK, memory_high_watermark=MEMORY_HIGH_WATERMARK,
+    latency_degradation_ratio=LATENCY_DEGRADATION_RATIO,
+)
+dlq_batcher = SQSBatcher(
+    sqs_client, "send", DLQ_URL, max_wait=SQS_BATCH_MAX_WAIT, max_retries=SQS_BATCH_MAX_RETRIES, backoff_factor=RETRY_BACKOFF_FACTOR
+) if DLQ_URL else None
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "worker_running": is_running}
@@ -252,6 +615,7 @@ async def process_message(message, correlation_id=None):
             s3_video_key = body.get('s3_video_key', f"videos/{video_id}.mp4")
             s3_metadata_key = body.get('s3_metadata_key', f"metadata/{video_id}.json")
             s3_bucket = body.get('s3_bucket', S3_BUCKET) or S3_BUCKET
+            content_hash = body.get('content_hash')
             
             # Verify video exists in S3
             try:
@@ -270,27 +634,18 @@ async def process_message(message, correlation_id=None):
                 VIDEOS_FAILED.inc()
                 return  # Don't retry if video doesn't exist
             
-            # Process video with timeout
-            try:
-                with PROCESSING_TIME.time():
-                    await asyncio.wait_for(
-                        process_video_async(video_id, s3_bucket, s3_video_key, s3_metadata_key, file_size, correlation_id),
-                        timeout=PROCESSING_TIMEOUT
-                    )
-            except asyncio.TimeoutError:
-                log_with_context(logging.ERROR, 
-                    f"Processing timeout after {PROCESSING_TIMEOUT}s", 
-                    correlation_id=correlation_id, 
-                    video_id=video_id)
-                last_error = "timeout"
-                raise
+            # Process video (each process pool task runs under the stage watchdog)
+            timer = StageTimer()
+            with PROCESSING_TIME.time():
+                await process_video_async(video_id, s3_bucket, s3_video_key, s3_metadata_key, file_size, correlation_id, content_hash, timer)
             
             # Success
             VIDEOS_PROCESSED.inc()
             log_with_context(logging.INFO, 
                 f"Successfully processed video", 
                 correlation_id=correlation_id, 
-                video_id=video_id)
+                video_id=video_id,
+                timings=timer.breakdown())
             return
             
         except Exception as e:
@@ -316,229 +671,905 @@ async def process_message(message, correlation_id=None):
                     correlation_id=correlation_id, 
                     video_id=video_id)
                 
-                if DLQ_URL:
-                    try:
-                        sqs_client.send_message(
-                            QueueUrl=DLQ_URL,
-                            MessageBody=json.dumps({
-                                "original_message": body,
-                                "error": last_error,
-                                "correlation_id": correlation_id,
-                                "timestamp": int(time.time())
-                            })
-                        )
-                        log_with_context(logging.INFO, 
-                            f"Message sent to DLQ", 
-                            correlation_id=correlation_id, 
+                if dlq_batcher:
+                    # Wait for the batched send so the original is only deleted once the DLQ has it
+                    sent = await dlq_batcher.submit(
+                        MessageBody=json.dumps({
+                            "original_message": body,
+                            "error": last_error,
+                            "correlation_id": correlation_id,
+                            "timestamp": int(time.time())
+                        })
+                    )
+                    if sent:
+                        log_with_context(logging.INFO,
+                            "Message sent to DLQ",
+                            correlation_id=correlation_id,
                             video_id=video_id)
-                    except Exception as dlq_error:
-                        log_with_context(logging.ERROR, 
-                            f"Failed to send to DLQ: {str(dlq_error)}", 
-                            correlation_id=correlation_id, 
+                    else:
+                        log_with_context(logging.ERROR,
+                            "Failed to send to DLQ",
+                            correlation_id=correlation_id,
                             video_id=video_id)
                 
+                # Free the local work dir; the S3 checkpoint stays for a DLQ redrive
+                discard_local_job_state(CHECKPOINT_DIR, video_id)
                 VIDEOS_FAILED.inc()
                 return
 
-async def process_video_async(video_id, s3_bucket, s3_video_key, s3_metadata_key, file_size, correlation_id):
-    """Core video processing logic (extracted for timeout handling)"""
-    # Simulated transcoding
+def extract_thumbnail(source, s3_bucket, thumbnail_key, **input_options):
+    """Probe a local path or URL and upload a 320x180 JPEG taken from ~1s in"""
+    probe = ffmpeg.probe(source, **input_options)
+    duration = float(probe['streams'][0].get('duration', probe.get('format', {}).get('duration', 0)))
+    seek_time = min(1.0, duration / 2) if duration > 0 else 0.5
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_thumbnail:
+        temp_thumbnail_path = temp_thumbnail.name
+    
+    try:
+        # ss before the input seeks in the container index instead of decoding up to seek_time
+        ffmpeg.input(source, ss=seek_time, **input_options) \
+            .output(temp_thumbnail_path, vframes=1, vf='scale=320:180:force_original_aspect_ratio=decrease,pad=320:180:(ow-iw)/2:(oh-ih)/2') \
+            .overwrite_output() \
+            .run(quiet=True, capture_stderr=True)
+        
+        s3_client.upload_file(temp_thumbnail_path, s3_bucket, thumbnail_key, ExtraArgs={'ContentType': 'image/jpeg'})
+    finally:
+        if os.path.exists(temp_thumbnail_path):
+            os.unlink(temp_thumbnail_path)
+
+async def transcode_chunked(source_path, work_dir, output_dir, ladder, media_info, video_id, correlation_id):
+    """Split a long source at keyframes and encode the chunks in parallel across the pool"""
+    chunk_dir = os.path.join(work_dir, "chunks")
+    shutil.rmtree(chunk_dir, ignore_errors=True)  # Partial chunks from an interrupted attempt
+    
+    async def run(fn, *args):
+        return await run_in_pool(video_id, fn, *args, duration=media_info["duration"])
+    
+    chunks = await run(transcode.split_into_chunks, source_path, chunk_dir, SEGMENT_CHUNK_SECONDS)
+    log_with_context(logging.INFO, 
+        f"Split source into {len(chunks)} keyframe-aligned chunks for parallel encoding", 
+        correlation_id=correlation_id, 
+        video_id=video_id)
+    
+    async def build_rendition(rendition):
+        with TRANSCODE_TIME.labels(rendition=rendition["name"]).time():
+            encoded = [os.path.join(chunk_dir, f"{rendition['name']}_{i:05d}.mkv") for i in range(len(chunks))]
+            jobs = [
+                run(transcode.encode_video_chunk, chunk, output, rendition, TRANSCODE_THREADS)
+                for chunk, output in zip(chunks, encoded)
+            ]
+            audio_path = None
+            if media_info["has_audio"]:
+                audio_path = os.path.join(chunk_dir, f"{rendition['name']}_audio.m4a")
+                jobs.append(run(transcode.encode_audio, source_path, audio_path, rendition))
+            await asyncio.gather(*jobs)
+            return await run(transcode.package_chunks, encoded, audio_path, output_dir, rendition, media_info)
+    
+    renditions = await asyncio.gather(*(build_rendition(r) for r in ladder))
+    
+    for r in renditions:
+        output_duration = transcode.playlist_duration(os.path.join(output_dir, r["playlist"]))
+        if abs(output_duration - media_info["duration"]) > 0.1:
+            log_with_context(logging.WARNING, 
+                f"{r['name']} duration {output_duration:.3f}s differs from source {media_info['duration']:.3f}s", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+    
+    return renditions
+
+def _download_part(s3_bucket, s3_video_key, fd, start, end):
+    """GET bytes start..end (inclusive) and pwrite them at the same offset; retried on read errors"""
+    for attempt in range(DOWNLOAD_PART_ATTEMPTS):
+        offset = start
+        try:
+            body = download_client.get_object(Bucket=s3_bucket, Key=s3_video_key, Range=f"bytes={start}-{end}")['Body']
+            for chunk in body.iter_chunks(1024 * 1024):
+                os.pwrite(fd, chunk, offset)
+                offset += len(chunk)
+            if offset != end + 1:
+                raise IOError(f"Short read for bytes {start}-{end}: got {offset - start} bytes")
+            return
+        except (BotoCoreError, IOError):
+            if attempt == DOWNLOAD_PART_ATTEMPTS - 1:
+                raise
+            DOWNLOAD_PART_RETRIES.inc()
+            time.sleep(0.1 * RETRY_BACKOFF_FACTOR ** attempt)  # Runs on a download thread, not the event loop
+
+def download_source(s3_bucket, s3_video_key, path, size=None):
+    """Download an object to path, with parallel ranged GETs for large objects.
+    
+    Parts go to a preallocated temporary file (so concurrent writes never extend
+    it and the disk space is reserved up front) that is renamed into place only
+    once complete. Returns the number of bytes downloaded.
+    """
+    if size is None:
+        size = download_client.head_object(Bucket=s3_bucket, Key=s3_video_key)['ContentLength']
+    started = time.perf_counter()
+    if size < DOWNLOAD_PARTS_MIN_BYTES:
+        mode = "single"
+        download_client.download_file(s3_bucket, s3_video_key, path)
+    else:
+        mode = "ranged"
+        partial_path = f"{path}.part"
+        fd = os.open(partial_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, size)  # No fallocate support (e.g. some overlay filesystems)
+            parts = [(start, min(start + DOWNLOAD_PART_BYTES, size) - 1) for start in range(0, size, DOWNLOAD_PART_BYTES)]
+            with ThreadPoolExecutor(max_workers=min(DOWNLOAD_CONCURRENCY, len(parts))) as pool:
+                futures = [pool.submit(_download_part, s3_bucket, s3_video_key, fd, start, end) for start, end in parts]
+                try:
+                    for future in futures:
+                        future.result()
+                finally:
+                    for future in futures:
+                        future.cancel()
+        except BaseException:
+            os.close(fd)
+            os.unlink(partial_path)
+            raise
+        os.close(fd)
+        os.replace(partial_path, path)
+    elapsed = time.perf_counter() - started
+    if elapsed > 0:
+        DOWNLOAD_THROUGHPUT.labels(mode=mode).observe(size / elapsed / (1024 * 1024))
+    return size
+
+async def upload_directory(local_dir, s3_bucket, prefix):
+    """Upload every file under local_dir to s3://bucket/prefix/ concurrently (boto3 clients are thread-safe).
+    
+    Returns the number of bytes uploaded.
+    """
+    uploads = []
+    total_bytes = 0
+    for root, _, files in os.walk(local_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            key = f"{prefix}/{os.path.relpath(path, local_dir)}"
+            content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+            total_bytes += os.path.getsize(path)
+            uploads.append(asyncio.to_thread(
+                s3_client.upload_file, path, s3_bucket, key, ExtraArgs={'ContentType': content_type}
+            ))
+    await asyncio.gather(*uploads)
+    return total_bytes
+
+async def transcode_video(video_id, s3_bucket, source_path, work_dir, media_info, correlation_id, timer):
+    """Transcode the source into an HLS ladder in the process pool and upload it to S3"""
+    output_dir = os.path.join(work_dir, "hls")
+    shutil.rmtree(output_dir, ignore_errors=True)  # Partial outputs from an interrupted attempt
+    
+    ladder = transcode.select_renditions(media_info["height"])
     log_with_context(logging.INFO, 
-        f"Starting simulated transcoding", 
+        f"Transcoding {media_info['width']}x{media_info['height']} source ({media_info['duration']:.1f}s) "
+        f"into {', '.join(r['name'] for r in ladder)}", 
         correlation_id=correlation_id, 
         video_id=video_id)
-    await asyncio.sleep(3)  # Simulate processing
     
-    # Generate runtime
-    runtime_seconds = max(5, int(file_size / 50000))
+    async def run_rendition(rendition):
+        with TRANSCODE_TIME.labels(rendition=rendition["name"]).time():
+            return await run_in_pool(
+                video_id, transcode.transcode_rendition,
+                source_path, output_dir, rendition, media_info, TRANSCODE_THREADS,
+                duration=media_info["duration"]
+            )
+    
+    with timer.stage("transcode", os.path.getsize(source_path)):
+        if media_info["duration"] >= SEGMENT_PARALLEL_MIN_SECONDS and TRANSCODE_WORKERS > 1:
+            renditions = await transcode_chunked(source_path, work_dir, output_dir, ladder, media_info, video_id, correlation_id)
+        else:
+            renditions = await asyncio.gather(*(run_rendition(r) for r in ladder))
+    
+    return await publish_renditions(video_id, s3_bucket, output_dir, renditions, media_info, correlation_id, timer)
+
+async def publish_renditions(video_id, s3_bucket, output_dir, renditions, media_info, correlation_id, timer):
+    """Upload the encoded ladder (with its master playlist) and describe it for metadata"""
+    output_prefix = f"{RENDITIONS_PREFIX}/{video_id}"
+    with open(os.path.join(output_dir, "master.m3u8"), "w") as f:
+        f.write(transcode.build_master_playlist(renditions))
+    
+    with timer.stage("upload") as span:
+        span.bytes = await upload_directory(output_dir, s3_bucket, output_prefix)
     
-    # Extract thumbnail
-    thumbnail_url = ""
-    thumbnail_key = f"thumbnails/{video_id}.jpg"
+    log_with_context(logging.INFO, 
+        f"Uploaded {len(renditions)} renditions to s3://{s3_bucket}/{output_prefix}/", 
+        correlation_id=correlation_id, 
+        video_id=video_id)
     
+    return {
+        "duration": media_info["duration"],
+        "master_playlist_key": f"{output_prefix}/master.m3u8",
+        "renditions": [
+            {
+                "name": r["name"],
+                "width": r["width"],
+                "height": r["height"],
+                "bandwidth": r["bandwidth"],
+                "playlist_key": f"{output_prefix}/{r['playlist']}",
+            }
+            for r in renditions
+        ],
+    }
+
+async def build_thumbnails(video_id, s3_bucket, source_path, work_dir, duration, correlation_id, timer):
+    """Build the thumbnail set from one decode pass in the process pool and upload it.
+    
+    Returns the S3 keys of every artifact, or None if the set could not be built.
+    """
+    output_dir = os.path.join(work_dir, "thumbnails")
+    shutil.rmtree(output_dir, ignore_errors=True)
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_video:
-            temp_video_path = temp_video.name
-            s3_client.download_file(s3_bucket, s3_video_key, temp_video_path)
-        
+        with timer.stage("thumbnail", os.path.getsize(source_path)):
+            manifest = await run_in_pool(
+                video_id, thumbnails.build_thumbnail_set, source_path, output_dir, duration, duration=duration
+            )
+    except Exception as e:
+        if job_timed_out(video_id):
+            raise
+        log_with_context(logging.WARNING, 
+            f"Thumbnail set generation failed: {str(e)}", 
+            correlation_id=correlation_id, 
+            video_id=video_id)
+        return None
+    return await publish_thumbnails(video_id, s3_bucket, output_dir, manifest, correlation_id, timer)
+
+async def publish_thumbnails(video_id, s3_bucket, output_dir, manifest, correlation_id, timer):
+    """Upload a built thumbnail set; returns the S3 keys of every artifact, or None on failure"""
+    prefix = f"thumbnails/{video_id}"
+    try:
+        with timer.stage("upload") as span:
+            span.bytes = await upload_directory(output_dir, s3_bucket, prefix)
+    except Exception as e:
+        log_with_context(logging.WARNING, 
+            f"Thumbnail set upload failed: {str(e)}", 
+            correlation_id=correlation_id, 
+            video_id=video_id)
+        return None
+    
+    log_with_context(logging.INFO, 
+        f"Thumbnail set uploaded: {manifest['frames_sampled']} frames sampled, {len(manifest['sprites'])} sprite sheets", 
+        correlation_id=correlation_id, 
+        video_id=video_id)
+    return {
+        "posters": {
+            fmt: {size: f"{prefix}/{name}" for size, name in sizes.items()}
+            for fmt, sizes in manifest["posters"].items()
+        },
+        "sprites": [f"{prefix}/{name}" for name in manifest["sprites"]],
+        "sprite_vtt": f"{prefix}/{manifest['sprite_vtt']}",
+        "preview": f"{prefix}/{manifest['preview']}",
+        "perceptual_hash": manifest["perceptual_hash"],
+    }
+
+async def build_scene_index(checkpoint, video_id, s3_bucket, source, correlation_id, timer, **input_options):
+    """Detect scene cuts in the process pool, store the binary index in S3 and checkpoint it.
+    
+    The index is optional: a failure is logged and checkpointed as an empty result.
+    """
+    result = {"scenes_key": None, "scene_index": None, "scene_count": 0}
+    try:
+        with timer.stage("scenes"):
+            index = await run_in_pool(
+                video_id, functools.partial(scenes.detect_scenes, source, **input_options),
+                duration=(checkpoint.result("probe") or {}).get("duration")
+            )
+        scenes_key = f"{SCENES_PREFIX}/{video_id}.bin"
+        with timer.stage("upload", len(index)):
+            await asyncio.to_thread(
+                s3_client.put_object,
+                Bucket=s3_bucket, Key=scenes_key, Body=index, ContentType="application/octet-stream"
+            )
+        result = {
+            "scenes_key": scenes_key,
+            "scene_index": base64.b64encode(index).decode("ascii"),
+            "scene_count": scenes.scene_count(index),
+        }
+        log_with_context(logging.INFO, 
+            f"Scene index stored: {result['scene_count']} scenes", 
+            correlation_id=correlation_id, 
+            video_id=video_id)
+    except Exception as e:
+        if job_timed_out(video_id):
+            raise
+        log_with_context(logging.WARNING, 
+            f"Scene detection failed: {str(e)}", 
+            correlation_id=correlation_id, 
+            video_id=video_id)
+    await checkpoint.complete("scenes", result)
+
+async def build_audio_analysis(checkpoint, video_id, s3_bucket, source, has_audio, correlation_id, timer, **input_options):
+    """Compute waveform peaks and loudness in the process pool, store the peaks file in S3 and checkpoint the summary.
+    
+    The peaks key contains a digest of its content, so the file can be cached forever.
+    The summary is None for silent videos or if the analysis failed.
+    """
+    summary = None
+    if has_audio:
         try:
-            probe = ffmpeg.probe(temp_video_path)
-            duration = float(probe['streams'][0].get('duration', 0))
-            seek_time = min(1.0, duration / 2) if duration > 0 else 0.5
-            
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_thumbnail:
-                temp_thumbnail_path = temp_thumbnail.name
-                
-                ffmpeg.input(temp_video_path, ss=seek_time) \
-                    .output(temp_thumbnail_path, vframes=1, vf='scale=320:180:force_original_aspect_ratio=decrease,pad=320:180:(ow-iw)/2:(oh-ih)/2') \
-                    .overwrite_output() \
-                    .run(quiet=True, capture_stderr=True)
-                
-                s3_client.upload_file(temp_thumbnail_path, s3_bucket, thumbnail_key, ExtraArgs={'ContentType': 'image/jpeg'})
-                thumbnail_url = thumbnail_key
-                os.unlink(temp_thumbnail_path)
-                
+            with timer.stage("audio"):
+                peaks, summary = await run_in_pool(
+                    video_id, functools.partial(audio.analyze_audio, source, **input_options),
+                    duration=(checkpoint.result("probe") or {}).get("duration")
+                )
+            peaks_key = f"{AUDIO_PREFIX}/{video_id}/peaks-{hashlib.sha256(peaks).hexdigest()[:16]}.bin"
+            with timer.stage("upload", len(peaks)):
+                await asyncio.to_thread(
+                    s3_client.put_object,
+                    Bucket=s3_bucket, Key=peaks_key, Body=peaks,
+                    ContentType="application/octet-stream", CacheControl="public, max-age=31536000, immutable"
+                )
+            summary["peaks_key"] = peaks_key
+            log_with_context(logging.INFO, 
+                f"Audio analysed: {summary['integrated_lufs']} LUFS integrated, {len(peaks)} byte peaks file", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+        except Exception as e:
+            if job_timed_out(video_id):
+                raise
+            summary = None
+            log_with_context(logging.WARNING, 
+                f"Audio analysis failed: {str(e)}", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+    await checkpoint.complete("audio", {"audio_summary": summary})
+
+def generate_thumbnail(video_id, s3_bucket, s3_video_key, thumbnail_key, correlation_id):
+    """Extract and upload the thumbnail, preferring ranged reads over a full download"""
+    if THUMBNAIL_SOURCE_MODE == "url":
+        # Let ffmpeg read the object over HTTP: only the container index and the
+        # bytes around the seek point are fetched (Range requests), not the whole file
+        try:
+            source_url = presigned_source_url(s3_bucket, s3_video_key)
+            extract_thumbnail(source_url, s3_bucket, thumbnail_key, **HTTP_INPUT_OPTIONS)
+            log_with_context(logging.INFO, 
+                "Thumbnail extracted via ranged reads", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+            return
+        except Exception as e:
+            log_with_context(logging.WARNING, 
+                f"Ranged thumbnail extraction failed, falling back to full download: {str(e)}", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+    
+    # Full download fallback for containers that cannot be read over HTTP
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_video:
+        temp_video_path = temp_video.name
+        download_source(s3_bucket, s3_video_key, temp_video_path)
+    
+    try:
+        extract_thumbnail(temp_video_path, s3_bucket, thumbnail_key)
+    finally:
+        if os.path.exists(temp_video_path):
+            os.unlink(temp_video_path)
+
+def signed_hash(hex_hash):
+    """64-bit hex hash as the signed integer a Postgres BIGINT can hold"""
+    if not hex_hash:
+        return None
+    value = int(hex_hash, 16)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def find_processed_original(content_hash, video_id):
+    """Return the processed video that owns content_hash, if it is not this video"""
+    try:
+        session = get_db_session()
+        try:
+            original = session.query(Video).filter(
+                Video.content_hash == content_hash,
+                Video.status == "PROCESSED"
+            ).first()
+        finally:
+            session.close()
+    except Exception as e:
+        log_with_context(logging.WARNING, 
+            f"Content hash lookup failed, processing normally: {str(e)}", 
+            video_id=video_id)
+        return None
+    if original is None or str(original.video_id) == video_id:
+        return None
+    return original
+
+def source_is_streamable(s3_bucket, s3_video_key):
+    """Inspect the container with small ranged GETs to see if it can be piped into ffmpeg"""
+    def read_range(offset, length):
+        response = s3_client.get_object(Bucket=s3_bucket, Key=s3_video_key, Range=f"bytes={offset}-{offset + length - 1}")
+        return response['Body'].read()
+    try:
+        return transcode.supports_sequential_read(read_range)
+    except ClientError:
+        return False  # e.g. InvalidRange when a box points past the end of the object
+
+async def stream_media_stages(checkpoint, video_id, s3_bucket, s3_video_key, file_size, correlation_id, timer):
+    """Probe, transcode and thumbnail stages without downloading the source.
+    
+    The object is probed over ranged reads and then piped, inside one pool
+    worker, through one ffmpeg that encodes the whole ladder and emits the
+    sampled thumbnail frames (see streaming). Returns False when the source has to be downloaded instead.
+    """
+    if not await asyncio.to_thread(source_is_streamable, s3_bucket, s3_video_key):
+        return False
+    
+    source_url = presigned_source_url(s3_bucket, s3_video_key)
+    with timer.stage("probe"):
+        media_info = await run_in_pool(
+            video_id, functools.partial(transcode.probe_media, source_url, **HTTP_INPUT_OPTIONS),
+            duration=0
+        )
+    await checkpoint.complete("probe", media_info)
+    if media_info["duration"] >= SEGMENT_PARALLEL_MIN_SECONDS and TRANSCODE_WORKERS > 1:
+        return False  # Chunked parallel encoding needs the file on disk
+    
+    output_dir = os.path.join(checkpoint.work_dir, "hls")
+    thumbnail_dir = os.path.join(checkpoint.work_dir, "thumbnails")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    shutil.rmtree(thumbnail_dir, ignore_errors=True)
+    ladder = transcode.select_renditions(media_info["height"])
+    log_with_context(logging.INFO, 
+        f"Streaming {media_info['width']}x{media_info['height']} source ({media_info['duration']:.1f}s) "
+        f"from S3 into {', '.join(r['name'] for r in ladder)}", 
+        correlation_id=correlation_id, 
+        video_id=video_id)
+    
+    # One pool worker runs the whole pipeline, so it takes a pool slot and is
+    # covered by the stage watchdog like every other encode
+    source_url = presigned_source_url(s3_bucket, s3_video_key, media_info["duration"])
+    with timer.stage("transcode", file_size):
+        renditions, manifest, thumbnail_error, stats = await run_in_pool(
+            video_id, streaming.stream_transcode, source_url, output_dir, thumbnail_dir, ladder, media_info,
+            TRANSCODE_THREADS, STREAM_CHUNK_BYTES, STREAM_BUFFER_CHUNKS,
+            duration=media_info["duration"]
+        )
+    timer.record("download", stats["download_seconds"], stats["download_bytes"])
+    timer.record("thumbnail", stats["thumbnail_seconds"], file_size)
+    
+    transcode_result = await publish_renditions(video_id, s3_bucket, output_dir, renditions, media_info, correlation_id, timer)
+    await checkpoint.complete("transcode", transcode_result)
+    
+    thumbnail_set = None
+    if thumbnail_error:
+        log_with_context(logging.WARNING, 
+            f"Thumbnail set generation failed: {thumbnail_error}", 
+            correlation_id=correlation_id, 
+            video_id=video_id)
+    else:
+        thumbnail_set = await publish_thumbnails(video_id, s3_bucket, thumbnail_dir, manifest, correlation_id, timer)
+    await record_thumbnail_stage(checkpoint, thumbnail_set, video_id, s3_bucket, s3_video_key, file_size, media_info, correlation_id, timer)
+    return True
+
+async def record_thumbnail_stage(checkpoint, thumbnail_set, video_id, s3_bucket, s3_video_key, file_size, media_info, correlation_id, timer):
+    """Checkpoint the thumbnail stage, falling back to a single JPEG or a placeholder"""
+    if thumbnail_set:
+        thumbnail_key = thumbnail_set["posters"]["jpeg"]["320x180"]
+        thumbnail_url = thumbnail_key
+    else:
+        # Fall back to a single ranged-read JPEG
+        thumbnail_key = f"thumbnails/{video_id}.jpg"
+        try:
+            with timer.stage("thumbnail"):
+                await asyncio.to_thread(generate_thumbnail, video_id, s3_bucket, s3_video_key, thumbnail_key, correlation_id)
+            thumbnail_url = thumbnail_key
         except Exception as e:
             log_with_context(logging.WARNING, 
                 f"Thumbnail extraction failed: {str(e)}", 
                 correlation_id=correlation_id, 
                 video_id=video_id)
             size_mb = round(file_size / (1024 * 1024), 2)
+            runtime_seconds = int(round(media_info["duration"]))
             thumbnail_url = f"https://via.placeholder.com/320x180.png?text={size_mb}MB*{runtime_seconds}s"
+    await checkpoint.complete("thumbnail", {
+        "thumbnail_key": thumbnail_key,
+        "thumbnail_url": thumbnail_url,
+        "thumbnail_set": thumbnail_set,
+    })
+
+async def process_video_async(video_id, s3_bucket, s3_video_key, s3_metadata_key, file_size, correlation_id, content_hash=None, timer=None):
+    """Core video processing logic; a job stopped by the stage watchdog leaves a fresh work dir for its retry"""
+    async def run():
+        try:
+            await run_processing_stages(
+                video_id, s3_bucket, s3_video_key, s3_metadata_key, file_size, correlation_id, content_hash, timer or StageTimer()
+            )
+        finally:
+            if job_timed_out(video_id):
+                await reap_timed_out_job(video_id)
+    
+    await run_exclusive(video_id, run)
+
+async def run_media_stages(checkpoint, video_id, s3_bucket, s3_video_key, file_size, correlation_id, timer):
+    """Download, probe, thumbnail, transcode, scene and audio stages; each one is skipped if already checkpointed"""
+    os.makedirs(checkpoint.work_dir, exist_ok=True)
+    source_path = checkpoint.source_path
+    started = time.perf_counter()
+    fresh = not checkpoint.done("download")
+    
+    if SOURCE_INGEST_MODE == "stream" and not any(checkpoint.done(s) for s in ("download", "transcode", "thumbnail")):
+        async def stream():
+            try:
+                return await stream_media_stages(checkpoint, video_id, s3_bucket, s3_video_key, file_size, correlation_id, timer)
+            except Exception as e:
+                if job_timed_out(video_id):
+                    raise
+                log_with_context(logging.WARNING, 
+                    f"Streaming ingestion failed, downloading the source instead: {str(e)}", 
+                    correlation_id=correlation_id, 
+                    video_id=video_id)
+                return False
         
-        if os.path.exists(temp_video_path):
-            os.unlink(temp_video_path)
-            
-    except Exception as e:
-        log_with_context(logging.ERROR, 
-            f"Thumbnail processing error: {str(e)}", 
+        stages = [stream()]
+        if not checkpoint.done("scenes"):
+            # The ingest pipe has a single frame output, so scene detection reads the object over HTTP
+            source_url = presigned_source_url(s3_bucket, s3_video_key)
+            stages.append(build_scene_index(checkpoint, video_id, s3_bucket, source_url, correlation_id, timer, **HTTP_INPUT_OPTIONS))
+        outcomes = await asyncio.gather(*stages, return_exceptions=True)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        streamed = outcomes[0]
+        if streamed:
+            if not checkpoint.done("audio"):
+                # Audio-only decode over HTTP; needs the probe result of the streaming stages
+                source_url = presigned_source_url(s3_bucket, s3_video_key, checkpoint.result("probe")["duration"])
+                await build_audio_analysis(
+                    checkpoint, video_id, s3_bucket, source_url, checkpoint.result("probe")["has_audio"],
+                    correlation_id, timer, **HTTP_INPUT_OPTIONS
+                )
+            checkpoint.remove_artifacts()
+            controller.observe_latency(time.perf_counter() - started, file_size)
+            return
+    
+    if not checkpoint.done("download"):
+        with timer.stage("download", file_size):
+            await asyncio.to_thread(download_source, s3_bucket, s3_video_key, source_path, file_size)
+        await checkpoint.complete("download", {"size": os.path.getsize(source_path)})
+    
+    if not checkpoint.done("probe"):
+        with timer.stage("probe"):
+            media_info = await run_in_pool(video_id, transcode.probe_media, source_path, duration=0)
+        await checkpoint.complete("probe", media_info)
+    media_info = checkpoint.result("probe")
+    
+    async def transcode_stage():
+        result = await transcode_video(video_id, s3_bucket, source_path, checkpoint.work_dir, media_info, correlation_id, timer)
+        await checkpoint.complete("transcode", result)
+    
+    async def thumbnail_stage():
+        thumbnail_set = await build_thumbnails(video_id, s3_bucket, source_path, checkpoint.work_dir, media_info["duration"], correlation_id, timer)
+        await record_thumbnail_stage(checkpoint, thumbnail_set, video_id, s3_bucket, s3_video_key, file_size, media_info, correlation_id, timer)
+    
+    # Transcoding and the thumbnail, scene and audio decode passes share the downloaded source
+    stages = []
+    if not checkpoint.done("transcode"):
+        stages.append(transcode_stage())
+    if not checkpoint.done("thumbnail"):
+        stages.append(thumbnail_stage())
+    if not checkpoint.done("scenes"):
+        stages.append(build_scene_index(checkpoint, video_id, s3_bucket, source_path, correlation_id, timer))
+    if not checkpoint.done("audio"):
+        stages.append(build_audio_analysis(checkpoint, video_id, s3_bucket, source_path, media_info["has_audio"], correlation_id, timer))
+    for outcome in await asyncio.gather(*stages, return_exceptions=True):
+        if isinstance(outcome, BaseException):
+            raise outcome
+    
+    # Everything downstream only needs the stage results, not the local files
+    checkpoint.remove_artifacts()
+    if fresh:
+        # Resumed jobs skip stages and would make the pipeline look faster than it is
+        controller.observe_latency(time.perf_counter() - started, file_size)
+
+async def run_processing_stages(video_id, s3_bucket, s3_video_key, s3_metadata_key, file_size, correlation_id, content_hash, timer):
+    """Run every stage that is not already covered by the job's checkpoint"""
+    checkpoint = JobCheckpoint(video_id, s3_bucket, s3_video_key, file_size, s3_client, CHECKPOINT_DIR, CHECKPOINT_PREFIX)
+    resumed = await checkpoint.load()
+    timer.resumed = resumed
+    if resumed:
+        log_with_context(logging.INFO, 
+            f"Resuming from checkpoint, skipping completed stages: {', '.join(resumed)}", 
             correlation_id=correlation_id, 
             video_id=video_id)
-        size_mb = round(file_size / (1024 * 1024), 2)
-        thumbnail_url = f"https://via.placeholder.com/320x180.png?text={size_mb}MB*{runtime_seconds}s"
+    
+    if not checkpoint.done("dedup"):
+        with timer.stage("dedup"):
+            original = await asyncio.to_thread(find_processed_original, content_hash, video_id) if content_hash else None
+        if original:
+            # Same bytes were already processed: reuse its renditions, thumbnails and analysis.
+            # The duplicate keeps its own source object, so it never depends on the original's.
+            log_with_context(logging.INFO, 
+                f"Content hash matches already processed video {original.video_id}, skipping transcode", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+            await checkpoint.complete("transcode", {
+                "duration": original.duration_seconds or 0,
+                "master_playlist_key": original.hls_master_key,
+                "renditions": original.renditions,
+            })
+            await checkpoint.complete("thumbnail", {
+                "thumbnail_key": original.thumbnail_key,
+                "thumbnail_url": original.thumbnail_key or "",
+                "thumbnail_set": original.thumbnails,
+            })
+            await checkpoint.complete("scenes", {
+                "scenes_key": f"{SCENES_PREFIX}/{original.video_id}.bin" if original.scene_index else None,
+                "scene_index": base64.b64encode(original.scene_index).decode("ascii") if original.scene_index else None,
+                "scene_count": scenes.scene_count(original.scene_index) if original.scene_index else 0,
+            })
+            await checkpoint.complete("audio", {"audio_summary": original.audio_summary})
+            await checkpoint.complete("dedup", {"duplicate_of": str(original.video_id)})
+        else:
+            await checkpoint.complete("dedup", {})
+    
+    dedup = checkpoint.result("dedup")
+    duplicate_of = dedup.get("duplicate_of")
+    
+    if not all(checkpoint.done(stage) for stage in ("transcode", "thumbnail", "scenes", "audio")):
+        await run_media_stages(checkpoint, video_id, s3_bucket, s3_video_key, file_size, correlation_id, timer)
+    
+    transcode_result = checkpoint.result("transcode")
+    thumbnail_key = checkpoint.result("thumbnail")["thumbnail_key"]
+    thumbnail_url = checkpoint.result("thumbnail")["thumbnail_url"]
+    thumbnail_set = checkpoint.result("thumbnail")["thumbnail_set"]
+    scene_result = checkpoint.result("scenes")
+    audio_summary = checkpoint.result("audio")["audio_summary"]
+    runtime_seconds = int(round(transcode_result["duration"]))
     
     # Read existing metadata
     existing_metadata = {}
-    try:
-        metadata_response = s3_client.get_object(Bucket=s3_bucket, Key=s3_metadata_key)
-        existing_metadata = json.loads(metadata_response['Body'].read().decode('utf-8'))
-    except Exception:
-        pass
+    with timer.stage("metadata"):
+        try:
+            metadata_response = s3_client.get_object(Bucket=s3_bucket, Key=s3_metadata_key)
+            existing_metadata = decode_metadata(metadata_response['Body'].read())
+        except Exception:
+            pass
     
     # Create metadata
     filename = s3_video_key.split("/")[-1] if "/" in s3_video_key else s3_video_key
     views = existing_metadata.get('views', 0)
     likes = existing_metadata.get('likes', 0)
     engagement = existing_metadata.get('engagement', 0)
-    upload_timestamp = existing_metadata.get('upload_timestamp', existing_metadata.get('timestamp', int(time.time())))
     
     metadata = {
         "video_id": video_id,
-        "filename": existing_metadata.get('filename', existing_metadata.get('original_filename', filename)),
+        "filename": existing_metadata.get('filename', filename),
+        "file_extension": existing_metadata.get('file_extension'),
+        "content_type": existing_metadata.get('content_type'),
         "s3_bucket": s3_bucket,
         "s3_key": s3_video_key,
-        "s3_video_key": s3_video_key,
-        "processed_url": f"https://{s3_bucket}.s3.amazonaws.com/{s3_video_key}",
         "thumbnail_url": thumbnail_url,
-        "timestamp": upload_timestamp,
-        "upload_timestamp": upload_timestamp,
+        "timestamp": existing_metadata.get('timestamp', int(time.time())),
         "size": file_size,
-        "file_size": file_size,
         "runtime": runtime_seconds,
+        "hls_master_key": transcode_result["master_playlist_key"],
+        "renditions": transcode_result["renditions"],
+        "thumbnails": thumbnail_set,
+        "content_hash": content_hash,
+        "duplicate_of": duplicate_of,
+        "perceptual_hash": thumbnail_set.get("perceptual_hash") if thumbnail_set else None,
+        "scenes_key": scene_result["scenes_key"],
+        "scene_count": scene_result["scene_count"],
+        "audio": audio_summary,
         "views": views,
         "likes": likes,
         "engagement": engagement,
         "status": "PROCESSED",
         "processed_timestamp": int(time.time()),
-        "correlation_id": correlation_id
+        "correlation_id": correlation_id,
+        # Stages of this attempt up to here (db and metadata are only in the job log line)
+        "processing_timings": timer.breakdown()
     }
     
-    # Store in RDS database
-    try:
-        session = get_db_session()
-        video = Video(
-            video_id=uuid.UUID(video_id),
-            filename=metadata.get('filename', filename),
-            s3_bucket=s3_bucket,
-            s3_key=s3_video_key,
-            thumbnail_key=thumbnail_key if thumbnail_url and not thumbnail_url.startswith('https://via.placeholder') else None,
-            size_bytes=file_size,
-            duration_seconds=runtime_seconds,
-            status="PROCESSED",
-            processed_at=datetime.utcnow()
-        )
-        session.add(video)
-        session.commit()
-        session.close()
-        log_with_context(logging.INFO, 
-            f"Video metadata saved to RDS database", 
-            correlation_id=correlation_id, 
-            video_id=video_id)
-    except Exception as e:
-        log_with_context(logging.ERROR, 
-            f"Failed to save video to RDS: {str(e)}", 
-            correlation_id=correlation_id, 
-            video_id=video_id)
+    # Store in RDS database (idempotent upsert, batched with other finishing jobs)
+    if not checkpoint.done("db"):
+        try:
+            with timer.stage("db"):
+                await video_writer.submit({
+                    "video_id": uuid.UUID(video_id),
+                    "filename": metadata.get('filename', filename),
+                    "s3_bucket": s3_bucket,
+                    "s3_key": s3_video_key,
+                    "thumbnail_key": thumbnail_key if thumbnail_url and not thumbnail_url.startswith('https://via.placeholder') else None,
+                    "hls_master_key": transcode_result["master_playlist_key"],
+                    "renditions": transcode_result["renditions"],
+                    "thumbnails": thumbnail_set,
+                    # The unique content_hash stays on the original; duplicates point at it instead
+                    "content_hash": None if duplicate_of else content_hash,
+                    "duplicate_of": uuid.UUID(duplicate_of) if duplicate_of else None,
+                    "perceptual_hash": signed_hash(thumbnail_set.get("perceptual_hash")) if thumbnail_set else None,
+                    "scene_index": base64.b64decode(scene_result["scene_index"]) if scene_result["scene_index"] else None,
+                    "audio_summary": audio_summary,
+                    "size_bytes": file_size,
+                    "duration_seconds": runtime_seconds,
+                    "status": "PROCESSED",
+                    "processed_at": datetime.utcnow()
+                })
+            await checkpoint.complete("db")
+            log_with_context(logging.INFO, 
+                f"Video metadata saved to RDS database", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+        except Exception as e:
+            log_with_context(logging.ERROR, 
+                f"Failed to save video to RDS: {str(e)}", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+            raise
     
     # Also store metadata in S3 for backward compatibility
-    try:
-        s3_client.put_object(
-            Bucket=s3_bucket,
-            Key=s3_metadata_key,
-            Body=json.dumps(metadata, indent=2),
-            ContentType="application/json"
-        )
-        log_with_context(logging.INFO, 
-            f"Metadata updated in S3", 
-            correlation_id=correlation_id, 
-            video_id=video_id)
-    except Exception as e:
-        log_with_context(logging.ERROR, 
-            f"Metadata storage failed: {str(e)}", 
-            correlation_id=correlation_id, 
-            video_id=video_id)
-        raise
+    if not checkpoint.done("metadata"):
+        try:
+            metadata_body, metadata_content_type = encode_metadata(metadata)
+            with timer.stage("metadata", len(metadata_body)):
+                s3_client.put_object(
+                    Bucket=s3_bucket,
+                    Key=s3_metadata_key,
+                    Body=metadata_body,
+                    ContentType=metadata_content_type
+                )
+            await checkpoint.complete("metadata")
+            log_with_context(logging.INFO, 
+                f"Metadata updated in S3", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+        except Exception as e:
+            log_with_context(logging.ERROR, 
+                f"Metadata storage failed: {str(e)}", 
+                correlation_id=correlation_id, 
+                video_id=video_id)
+            raise
+    
+    await checkpoint.clear()
 
 async def worker_loop():
-    """Main worker loop that polls SQS and processes messages"""
-    log_with_context(logging.INFO, "Worker loop started")
+    """Main worker loop: one SQS poller per priority lane, sharing the worker slots"""
+    log_with_context(logging.INFO, 
+        f"Worker loop started: {WORKER_CONCURRENCY} slots, lanes " + 
+        ", ".join(f"{lane['name']} (weight {lane['weight']:g}, {lane['reserved']} reserved)" for lane in LANES))
+    await asyncio.gather(*(lane_poller(lane) for lane in LANES))
+
+async def lane_poller(lane):
+    """Poll one lane's queue, receiving only as many messages as the lane can start soon"""
+    name = lane["name"]
     
     while is_running:
         try:
             try:
-                response = sqs_client.receive_message(
-                    QueueUrl=QUEUE_URL,
-                    MaxNumberOfMessages=5,  # Process up to 5 messages in parallel
+                await scheduler.wait_for_headroom(name)
+                response = await asyncio.to_thread(
+                    sqs_client.receive_message,
+                    QueueUrl=lane["queue_url"],
+                    MaxNumberOfMessages=max(1, min(10, scheduler.headroom(name))),
                     WaitTimeSeconds=20,     # Long polling: wait up to 20 seconds
-                    VisibilityTimeout=300   # 5 minutes: keep message invisible while processing
+                    VisibilityTimeout=VISIBILITY_TIMEOUT,  # keep message invisible while processing
+                    AttributeNames=['SentTimestamp']
                 )
                 
-                if 'Messages' in response:
+                if 'Messages' in response and not is_running:
+                    # Shutdown began during the long poll: hand the messages straight back
+                    await asyncio.to_thread(release_messages, lane["queue_url"], response['Messages'])
+                elif 'Messages' in response:
                     SQS_MESSAGES_RECEIVED.inc(len(response['Messages']))
+                    LANE_MESSAGES_RECEIVED.labels(lane=name).inc(len(response['Messages']))
                     
-                    # Process messages in parallel
-                    tasks = []
+                    # Jobs start as soon as the scheduler grants them a slot
                     for message in response['Messages']:
                         correlation_id = str(uuid.uuid4())
-                        task = asyncio.create_task(process_message_safe(message, correlation_id))
-                        tasks.append(task)
-                    
-                    # Wait for all messages to be processed
-                    await asyncio.gather(*tasks, return_exceptions=True)
+                        job = asyncio.create_task(process_message_safe(message, correlation_id, lane))
+                        active_jobs.add(job)
+                        job.add_done_callback(active_jobs.discard)
                 else:
-                    log_with_context(logging.DEBUG, "No messages received, waiting...")
+                    log_with_context(logging.DEBUG, f"No messages received on {name} lane, waiting...")
                     await asyncio.sleep(1)
                     
             except ClientError as e:
                 error_code = e.response.get('Error', {}).get('Code', 'Unknown')
-                log_with_context(logging.ERROR, f"SQS error: {error_code}")
+                log_with_context(logging.ERROR, f"SQS error on {name} lane: {error_code}")
                 SQS_ERRORS.inc()
                 await asyncio.sleep(5)  # Backoff on error
                 
         except Exception as e:
-            log_with_context(logging.ERROR, f"Worker loop error: {str(e)}")
+            log_with_context(logging.ERROR, f"Worker loop error on {name} lane: {str(e)}")
             SQS_ERRORS.inc()
             await asyncio.sleep(5)
 
-async def process_message_safe(message, correlation_id):
+def release_messages(queue_url, messages):
+    """Make received messages visible again right away (best effort)"""
+    try:
+        sqs_client.change_message_visibility_batch(
+            QueueUrl=queue_url,
+            Entries=[
+                {"Id": str(i), "ReceiptHandle": message['ReceiptHandle'], "VisibilityTimeout": 0}
+                for i, message in enumerate(messages)
+            ]
+        )
+    except (ClientError, BotoCoreError) as e:
+        log_with_context(logging.WARNING, f"Failed to release messages: {str(e)}")
+
+async def visibility_heartbeat(message, correlation_id, queue_url):
+    """Keep an in-flight message invisible while long transcodes run"""
+    while True:
+        await asyncio.sleep(VISIBILITY_TIMEOUT / 2)
+        try:
+            await asyncio.to_thread(
+                sqs_client.change_message_visibility,
+                QueueUrl=queue_url,
+                ReceiptHandle=message['ReceiptHandle'],
+                VisibilityTimeout=VISIBILITY_TIMEOUT
+            )
+        except Exception as e:
+            log_with_context(logging.WARNING, f"Failed to extend message visibility: {str(e)}", correlation_id=correlation_id)
+
+async def process_message_safe(message, correlation_id, lane):
     """Wrapper to ensure message is deleted from SQS after processing"""
+    name = lane["name"]
+    acknowledge = True
+    # The heartbeat also covers the wait for a worker slot
+    heartbeat = asyncio.create_task(visibility_heartbeat(message, correlation_id, lane["queue_url"]))
     try:
-        await process_message(message, correlation_id)
+        with LANE_SLOT_WAIT_TIME.labels(lane=name).time():
+            await scheduler.acquire(name)
+        try:
+            await process_message(message, correlation_id)
+        finally:
+            scheduler.release(name)
+        sent_timestamp = message.get('Attributes', {}).get('SentTimestamp')
+        if sent_timestamp:
+            LANE_TIME_TO_READY.labels(lane=name).observe(time.time() - int(sent_timestamp) / 1000)
+    except asyncio.CancelledError:
+        # Cut short by shutdown: leave the message for redelivery, which resumes from the checkpoints
+        acknowledge = False
+        raise
     except Exception as e:
         log_with_context(logging.ERROR, f"Unhandled error in process_message: {str(e)}", correlation_id=correlation_id)
     finally:
-        # Delete message from SQS (success or failure - don't want to reprocess)
-        try:
-            sqs_client.delete_message(
-                QueueUrl=QUEUE_URL,
-                ReceiptHandle=message['ReceiptHandle']
-            )
-            SQS_MESSAGES_DELETED.inc()
-            log_with_context(logging.DEBUG, f"Message deleted from SQS", correlation_id=correlation_id)
-        except Exception as e:
-            log_with_context(logging.ERROR, f"Failed to delete SQS message: {str(e)}", correlation_id=correlation_id)
+        heartbeat.cancel()
+        if not acknowledge:
+            await asyncio.to_thread(release_messages, lane["queue_url"], [message])
+        else:
+            # Delete message from SQS (success or failure - don't want to reprocess).
+            # Queued on the lane's ack batcher so deletes go out as DeleteMessageBatch calls.
+            try:
+                ack_batchers[name].submit(ReceiptHandle=message['ReceiptHandle'])
+                log_with_context(logging.DEBUG, "Message queued for batched delete", correlation_id=correlation_id)
+            except Exception as e:
+                log_with_context(logging.ERROR, f"Failed to delete SQS message: {str(e)}", correlation_id=correlation_id)
 
 @app.on_event("startup")
 async def startup_event():
+    global transcode_pool
+    await asyncio.to_thread(prune_local_checkpoints, CHECKPOINT_DIR, CHECKPOINT_MAX_AGE)
+    # spawn (not fork): the parent has boto3/asyncio threads that must not be forked
+    transcode_pool = ProcessPoolExecutor(
+        max_workers=TRANSCODE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    for batcher in ack_batchers.values():
+        batcher.start()
+    video_writer.start()
+    if dlq_batcher:
+        dlq_batcher.start()
+    controller.start()
     asyncio.create_task(worker_loop())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    global is_running
+    is_running = False
+    await controller.stop()
+    # Let in-flight jobs finish and queue their rows and acks; the rest are cancelled
+    # (their messages are released for redelivery) so the batchers can be drained last
+    if active_jobs:
+        _, unfinished = await asyncio.wait(set(active_jobs), timeout=SHUTDOWN_GRACE_SECONDS)
+        for job in unfinished:
+            job.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+    # Flush pending DB writes and acknowledgements so already-processed messages are not redelivered
+    await video_writer.stop()
+    if dlq_batcher:
+        await dlq_batcher.stop()
+    for batcher in ack_batchers.values():
+        await batcher.stop()
+    if transcode_pool:
+        transcode_pool.shutdown(wait=False, cancel_futures=True)
+
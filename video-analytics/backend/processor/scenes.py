@@ -0,0 +1,113 @@
+"""
+Scene-cut detection for the processor service.
+
+The source is decoded once into small RGB frames at SAMPLE_FPS and consecutive
+frames are compared in NumPy batches: mean absolute pixel difference (motion,
+fades) and colour histogram distance (shot changes). A cut is placed where the
+combined score crosses CUT_THRESHOLD, at least MIN_SCENE_SECONDS after the
+previous one. The result is a compact binary index (see encode_index). Runs
+inside the processor's ProcessPoolExecutor, so this module must stay free of
+import-time side effects.
+"""
+import struct
+
+import ffmpeg
+import numpy as np
+
+SAMPLE_FPS = 5
+FRAME_SIZE = (64, 36)
+HISTOGRAM_BINS = 16  # Per channel
+CUT_THRESHOLD = 0.3
+MIN_SCENE_SECONDS = 1.0
+BATCH_FRAMES = 256
+
+# Index layout (little endian): header, then one fixed-size entry per scene
+INDEX_MAGIC = b"SCNI"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sBBHI")  # magic, version, reserved, sample fps, scene count
+INDEX_ENTRY = np.dtype([
+    ("start_ms", "<u4"),     # Scene start
+    ("keyframe_ms", "<u4"),  # Most representative frame of the scene
+    ("score", "<u2"),        # Cut score x 10000 (0 for the first scene)
+])
+
+
+def _frame_batches(source, input_options):
+    width, height = FRAME_SIZE
+    frame_bytes = width * height * 3
+    process = (
+        ffmpeg.input(source, **input_options).video
+        .filter("fps", SAMPLE_FPS)
+        .filter("scale", width, height)
+        .output("pipe:", format="rawvideo", pix_fmt="rgb24")
+        .global_args("-loglevel", "error", "-nostats")
+        .run_async(pipe_stdout=True)
+    )
+    count = 0
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes * BATCH_FRAMES)
+            frames = len(data) // frame_bytes
+            if not frames:
+                break
+            count += frames
+            yield np.frombuffer(data[:frames * frame_bytes], dtype=np.uint8).reshape(frames, height, width, 3)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0 and count == 0:
+        raise RuntimeError(f"ffmpeg scene sampling failed with exit code {returncode}")
+
+
+def _histograms(frames):
+    """Normalised per-channel colour histograms, shape (n, 3 * HISTOGRAM_BINS)"""
+    n = len(frames)
+    bins = (frames // (256 // HISTOGRAM_BINS)).reshape(n, -1, 3).astype(np.int64)
+    offsets = np.arange(3) * HISTOGRAM_BINS + (np.arange(n) * 3 * HISTOGRAM_BINS)[:, None, None]
+    counts = np.bincount((bins + offsets).ravel(), minlength=n * 3 * HISTOGRAM_BINS)
+    return counts.reshape(n, 3 * HISTOGRAM_BINS).astype(np.float32) / (frames.shape[1] * frames.shape[2])
+
+
+def detect_scenes(source, **input_options):
+    """Decode source and return its encoded scene index"""
+    scores = []
+    histograms = []
+    previous_frame = previous_histogram = None
+    for frames in _frame_batches(source, input_options):
+        batch_histograms = _histograms(frames)
+        if previous_frame is None:
+            previous_frame, previous_histogram = frames[:1], batch_histograms[:1]
+        frames_before = np.concatenate([previous_frame, frames[:-1]]).astype(np.int16)
+        histograms_before = np.concatenate([previous_histogram, batch_histograms[:-1]])
+        pixel_difference = np.abs(frames.astype(np.int16) - frames_before).mean(axis=(1, 2, 3)) / 255
+        # Histogram distance is in [0, 1]: half the L1 distance, averaged over the channels
+        histogram_distance = np.abs(batch_histograms - histograms_before).sum(axis=1) / 6
+        scores.append((pixel_difference + histogram_distance) / 2)
+        histograms.append(batch_histograms)
+        previous_frame, previous_histogram = frames[-1:], batch_histograms[-1:]
+    if not scores:
+        raise RuntimeError("No frames could be decoded")
+    scores = np.concatenate(scores)
+    histograms = np.concatenate(histograms)
+
+    min_gap = max(1, int(MIN_SCENE_SECONDS * SAMPLE_FPS))
+    starts = [0]
+    for i in np.flatnonzero(scores >= CUT_THRESHOLD):
+        if i - starts[-1] >= min_gap:
+            starts.append(int(i))
+
+    entries = np.zeros(len(starts), dtype=INDEX_ENTRY)
+    bounds = starts + [len(scores)]
+    for n, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        scene = histograms[start:end]
+        keyframe = start + int(np.abs(scene - scene.mean(axis=0)).sum(axis=1).argmin())
+        entries[n] = (start * 1000 // SAMPLE_FPS, keyframe * 1000 // SAMPLE_FPS, round(float(scores[start]) * 10000) if n else 0)
+    return encode_index(entries)
+
+
+def encode_index(entries):
+    return INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, SAMPLE_FPS, len(entries)) + entries.tobytes()
+
+
+def scene_count(index):
+    return INDEX_HEADER.unpack_from(index)[4]
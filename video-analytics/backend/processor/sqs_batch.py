@@ -0,0 +1,155 @@
+"""
+Batched SQS acknowledgements and dead-letter publishing for the processor service.
+
+Per-message DeleteMessage / SendMessage calls from concurrently finishing jobs
+are coalesced into DeleteMessageBatch / SendMessageBatch. The SQS client is
+passed in, so this module has no import-time side effects beyond its metrics.
+"""
+import asyncio
+import itertools
+import logging
+
+from botocore.exceptions import ClientError, BotoCoreError
+from prometheus_client import Counter, Histogram
+
+logger = logging.getLogger("processor")
+
+SQS_MESSAGES_DELETED = Counter('sqs_messages_deleted_total', 'Total SQS messages deleted')
+SQS_ERRORS = Counter('sqs_errors_total', 'Total SQS errors')
+SQS_BATCH_SIZE = Histogram('sqs_batch_size', 'Entries per SQS batch request', ['operation'], buckets=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10])
+SQS_BATCH_REQUESTS = Counter('sqs_batch_requests_total', 'Total SQS batch API calls', ['operation'])
+SQS_BATCH_FAILED_ENTRIES = Counter('sqs_batch_failed_entries_total', 'SQS batch entries that failed after all retries', ['operation'])
+
+SQS_MAX_BATCH_SIZE = 10  # Hard SQS limit for DeleteMessageBatch / SendMessageBatch
+SQS_MAX_BATCH_BYTES = 256 * 1024  # Hard SQS limit for total SendMessageBatch payload
+
+
+class SQSBatcher:
+    """Coalesce per-message SQS calls into DeleteMessageBatch / SendMessageBatch.
+
+    Entries are flushed when 10 are pending or when the oldest has waited
+    max_wait seconds. Entries that fail inside a batch are retried with
+    exponential backoff; sender faults are not retried.
+    """
+
+    def __init__(self, sqs_client, operation, queue_url, max_wait=0.5, max_retries=3, backoff_factor=2.0):
+        if operation not in ("delete", "send"):
+            raise ValueError(f"Unsupported SQS batch operation: {operation}")
+        self.sqs_client = sqs_client
+        self.operation = operation
+        self.queue_url = queue_url
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._pending = []  # [(entry, future), ...]
+        self._ids = itertools.count()
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+        self._stopped = False
+
+    def start(self):
+        """Start the background flush task (must be called from the event loop)"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush until nothing is pending (batches already being sent included), then stop"""
+        self._closing = True
+        if self._task:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        self._stopped = True
+
+    def submit(self, **fields):
+        """Queue one entry; returns a future resolving to True (acked) or False (gave up)"""
+        if self._stopped:
+            raise RuntimeError(f"SQS {self.operation} batcher is stopped")
+        future = asyncio.get_running_loop().create_future()
+        entry = dict(fields, Id=str(next(self._ids)))
+        self._pending.append((entry, future))
+        if len(self._pending) >= SQS_MAX_BATCH_SIZE and self._wakeup:
+            self._wakeup.set()
+        return future
+
+    async def _run(self):
+        while not (self._closing and not self._pending):
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"SQS {self.operation} batch flush error: {str(e)}")
+                SQS_ERRORS.inc()
+
+    async def flush(self):
+        """Send everything currently pending, in batches of up to 10 entries"""
+        while self._pending:
+            batch = self._take_batch()
+            await self._send_batch(batch)
+
+    def _take_batch(self):
+        batch = []
+        batch_bytes = 0
+        while self._pending and len(batch) < SQS_MAX_BATCH_SIZE:
+            entry_bytes = len(self._pending[0][0].get("MessageBody", "").encode("utf-8"))
+            if batch and batch_bytes + entry_bytes > SQS_MAX_BATCH_BYTES:
+                break
+            batch.append(self._pending.pop(0))
+            batch_bytes += entry_bytes
+        return batch
+
+    def _call(self, entries):
+        if self.operation == "delete":
+            return self.sqs_client.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+        return self.sqs_client.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+
+    async def _send_batch(self, batch):
+        remaining = {entry["Id"]: (entry, future) for entry, future in batch}
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff_factor ** (attempt - 1) * 0.1)
+
+            entries = [entry for entry, _ in remaining.values()]
+            SQS_BATCH_REQUESTS.labels(operation=self.operation).inc()
+            SQS_BATCH_SIZE.labels(operation=self.operation).observe(len(entries))
+            try:
+                response = await asyncio.to_thread(self._call, entries)
+            except (ClientError, BotoCoreError) as e:
+                last_error = str(e)
+                SQS_ERRORS.inc()
+                continue
+
+            for ok in response.get("Successful", []):
+                entry, future = remaining.pop(ok["Id"])
+                if self.operation == "delete":
+                    SQS_MESSAGES_DELETED.inc()
+                if not future.done():
+                    future.set_result(True)
+
+            for failed in response.get("Failed", []):
+                last_error = f"{failed.get('Code')}: {failed.get('Message', '')}"
+                if failed.get("SenderFault"):
+                    # Malformed entry (bad receipt handle, oversized body...) - retrying will not help
+                    entry, future = remaining.pop(failed["Id"])
+                    self._give_up(future, last_error)
+
+            if not remaining:
+                return
+
+        for entry, future in remaining.values():
+            self._give_up(future, last_error)
+
+    def _give_up(self, future, error):
+        SQS_BATCH_FAILED_ENTRIES.labels(operation=self.operation).inc()
+        logger.error(f"SQS {self.operation} batch entry failed: {error}")
+        if not future.done():
+            future.set_result(False)
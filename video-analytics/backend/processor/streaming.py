@@ -0,0 +1,123 @@
+"""
+Single-pass streaming ingest for the processor service.
+
+The source is read from a presigned URL through a bounded buffer into one
+ffmpeg that encodes the whole ladder and writes the sampled thumbnail frames to
+stdout, so download, decode and thumbnailing overlap and the source never
+touches the disk. Runs inside the processor's ProcessPoolExecutor (one worker
+per job, like every other encode), so this module must stay free of
+import-time side effects.
+"""
+import collections
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import thumbnails
+import transcode
+
+READ_TIMEOUT_SECONDS = 30
+
+
+def feed_source(process, source_url, chunk_bytes, buffer_chunks):
+    """Copy the source into ffmpeg's stdin; returns the number of bytes written.
+
+    A reader thread fills a queue of at most buffer_chunks chunks, so a slow
+    decoder throttles the download instead of growing memory, and network
+    stalls are absorbed by the buffer instead of starving the decoder.
+    """
+    buffer = queue.Queue(maxsize=buffer_chunks)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            with urllib.request.urlopen(source_url, timeout=READ_TIMEOUT_SECONDS) as body:
+                while chunk := body.read(chunk_bytes):
+                    if not put(chunk):
+                        return
+            put(None)
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=read, daemon=True).start()
+    written = 0
+    try:
+        while True:
+            item = buffer.get()
+            if item is None:
+                return written
+            if isinstance(item, Exception):
+                raise item
+            process.stdin.write(item)
+            written += len(item)
+    finally:
+        stop.set()
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+
+def stream_transcode(source_url, output_dir, thumbnail_dir, ladder, media_info, threads=1,
+                     chunk_bytes=1024 * 1024, buffer_chunks=16):
+    """Encode the ladder and build the thumbnail set in one pass over the source.
+
+    Returns (renditions, thumbnail manifest or None, thumbnail error or None,
+    stage stats). A failed thumbnail set does not fail the transcode; a failed
+    ffmpeg or source read raises.
+    """
+    process, renditions = transcode.start_stream_transcode(
+        output_dir, ladder, media_info, threads=threads, frames_output=thumbnails.frames_output
+    )
+    stderr_tail = collections.deque(maxlen=20)
+    stats = {}
+
+    def drain_stderr():
+        for line in process.stderr:
+            stderr_tail.append(line.decode("utf-8", errors="replace"))
+
+    def feed():
+        start = time.perf_counter()
+        stats["download_bytes"] = feed_source(process, source_url, chunk_bytes, buffer_chunks)
+        stats["download_seconds"] = time.perf_counter() - start
+
+    def build_thumbnail_set():
+        start = time.perf_counter()
+        try:
+            return thumbnails.build_thumbnail_set(
+                None, thumbnail_dir, media_info["duration"], frames=thumbnails.read_frames(process.stdout)
+            )
+        finally:
+            stats["thumbnail_seconds"] = time.perf_counter() - start
+            # Keep reading so ffmpeg never blocks on a full stdout pipe
+            while process.stdout.read(1024 * 1024):
+                pass
+
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            fed = pool.submit(feed)
+            manifest = pool.submit(build_thumbnail_set)
+            pool.submit(drain_stderr)
+            returncode = process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+    if returncode != 0:
+        raise RuntimeError(f"Streaming ffmpeg failed with exit code {returncode}: {''.join(stderr_tail)[-2000:]}")
+    fed.result()
+
+    try:
+        return renditions, manifest.result(), None, stats
+    except Exception as e:
+        return renditions, None, str(e), stats
@@ -0,0 +1,80 @@
+import asyncio
+import io
+import os
+import sys
+
+import pytest
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+# Services are flat modules run from their own directory (see the Dockerfile)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# boto3 clients are created at import time; tests never reach AWS
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+
+class FakeS3:
+    """In-memory bucket with the object calls the processor makes"""
+
+    def __init__(self):
+        self.objects = {}  # key -> body
+        self.get_calls = []
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body.encode() if isinstance(Body, str) else bytes(Body)
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.get_calls.append((Key, Range))
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not found"}}, "GetObject")
+        body = self.objects[Key]
+        if Range:
+            start, end = Range.removeprefix("bytes=").split("-")
+            body = body[int(start):int(end) + 1]
+        return {"Body": StreamingBody(io.BytesIO(body), len(body)), "ContentLength": len(body)}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+class FakeVideoWriter:
+    """Stands in for main.video_writer: records rows, or fails every submit with error"""
+
+    def __init__(self):
+        self.rows = []
+        self.error = None
+
+    def submit(self, row):
+        future = asyncio.get_running_loop().create_future()
+        if self.error:
+            future.set_exception(self.error)
+        else:
+            self.rows.append(row)
+            future.set_result(True)
+        return future
+
+
+@pytest.fixture
+def s3():
+    return FakeS3()
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path, s3):
+    """main with S3, the checkpoint dir and the RDS writer replaced; returns the writer"""
+    import main
+
+    writer = FakeVideoWriter()
+    monkeypatch.setattr(main, "s3_client", s3)
+    monkeypatch.setattr(main, "CHECKPOINT_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "video_writer", writer)
+    return writer
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import audio
+
+
+def tone(seconds, dbfs=-23.0, frequency=1000):
+    """Stereo sine at the given peak level, as float samples at audio.SAMPLE_RATE"""
+    t = np.arange(int(seconds * audio.SAMPLE_RATE)) / audio.SAMPLE_RATE
+    mono = (10 ** (dbfs / 20) * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+    return np.stack([mono, mono], axis=1)
+
+
+def analyze(monkeypatch, samples, chunk=audio.SAMPLE_RATE * 7 + 13):
+    """Feed samples through analyze_audio in decoder-sized chunks that do not align with its windows"""
+    monkeypatch.setattr(audio, "_sample_chunks", lambda source, options: (samples[i:i + chunk] for i in range(0, len(samples), chunk)))
+    return audio.analyze_audio("source")
+
+
+def decode_peaks(encoded):
+    magic, version, bits, channels, rate, per_peak, count = audio.PEAKS_HEADER.unpack_from(encoded)
+    assert (magic, version, bits, channels, rate) == (audio.PEAKS_MAGIC, audio.PEAKS_VERSION, 8, 1, audio.SAMPLE_RATE)
+    return per_peak, np.frombuffer(encoded, dtype=np.int8, offset=audio.PEAKS_HEADER.size).reshape(count, 2)
+
+
+def test_ebu_reference_tone_reads_minus_23_lufs(monkeypatch):
+    # EBU Tech 3341: a 1 kHz stereo sine at -23 dBFS measures -23.0 LUFS
+    _, summary = analyze(monkeypatch, tone(20))
+    assert summary["integrated_lufs"] == pytest.approx(-23.0, abs=0.1)
+    assert summary["loudness_range_lu"] == pytest.approx(0.0, abs=0.1)
+    assert summary["sample_peak_dbfs"] == pytest.approx(-23.0, abs=0.01)
+
+
+def test_quiet_passages_below_the_relative_gate_are_ignored(monkeypatch):
+    samples = np.concatenate([tone(10, dbfs=-20.0), tone(10, dbfs=-45.0)])
+    _, summary = analyze(monkeypatch, samples)
+    assert summary["integrated_lufs"] == pytest.approx(-20.0, abs=0.2)
+
+
+def test_peaks_cover_every_window_of_the_mono_mix(monkeypatch):
+    samples = tone(2.05, dbfs=0.0)
+    samples[:, 1] = 0  # The mono mix halves the level
+    encoded, _ = analyze(monkeypatch, samples, chunk=1000)
+    per_peak, peaks = decode_peaks(encoded)
+    assert per_peak == audio.SAMPLE_RATE // audio.PEAKS_PER_SECOND
+    assert len(peaks) == 21  # The last, partial window is padded with silence
+    assert peaks[0].tolist() == [-64, 64]
+
+
+def test_chunking_does_not_change_the_result(monkeypatch):
+    samples = np.concatenate([tone(4, dbfs=-18.0, frequency=440), tone(3, dbfs=-30.0, frequency=3000)])
+    assert analyze(monkeypatch, samples, chunk=len(samples)) == analyze(monkeypatch, samples, chunk=777)
+
+
+def test_silence_has_no_loudness(monkeypatch):
+    encoded, summary = analyze(monkeypatch, np.zeros((audio.SAMPLE_RATE * 5, 2), dtype=np.float32))
+    assert summary["integrated_lufs"] is None and summary["sample_peak_dbfs"] is None
+    assert not decode_peaks(encoded)[1].any()
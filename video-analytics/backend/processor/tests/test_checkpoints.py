@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import pytest
+
+import main
+from checkpoints import JobCheckpoint, prune_local_checkpoints, run_exclusive
+
+BUCKET = "video-analytics-uploads"
+
+
+def checkpoint(s3, checkpoint_dir, video_id="video-1", size=1000):
+    return JobCheckpoint(video_id, BUCKET, f"videos/{video_id}.mp4", size, s3, str(checkpoint_dir))
+
+
+def test_completed_stages_are_resumed_in_pipeline_order(s3, tmp_path):
+    first = checkpoint(s3, tmp_path)
+    asyncio.run(first.complete("scenes", {"scene_count": 3}))
+    asyncio.run(first.complete("probe", {"duration": 12.0}))
+
+    second = checkpoint(s3, tmp_path)
+    assert asyncio.run(second.load()) == ["probe", "scenes"]
+    assert second.result("scenes") == {"scene_count": 3}
+    assert not second.done("transcode")
+
+
+def test_another_pod_resumes_from_s3_without_the_download(s3, tmp_path):
+    first = checkpoint(s3, tmp_path / "pod-a")
+    os.makedirs(first.work_dir)
+    with open(first.source_path, "wb") as f:
+        f.write(b"\x00" * 1000)
+    asyncio.run(first.complete("download", {"size": 1000}))
+    asyncio.run(first.complete("probe", {"duration": 12.0}))
+    assert "download" in json.loads(s3.objects["checkpoints/video-1.json"])["stages"]
+
+    # Same pod: the source is still on disk
+    assert asyncio.run(checkpoint(s3, tmp_path / "pod-a").load()) == ["download", "probe"]
+    # Other pod: only the S3 copy, and no local source to reuse
+    assert asyncio.run(checkpoint(s3, tmp_path / "pod-b").load()) == ["probe"]
+
+
+def test_checkpoints_of_another_source_object_are_ignored(s3, tmp_path):
+    asyncio.run(checkpoint(s3, tmp_path, size=1000).complete("probe", {"duration": 12.0}))
+    replaced = checkpoint(s3, tmp_path, size=2000)
+    assert asyncio.run(replaced.load()) == []
+    assert not replaced.done("probe")
+
+
+def test_clear_removes_local_and_s3_state(s3, tmp_path):
+    job = checkpoint(s3, tmp_path)
+    os.makedirs(job.work_dir)
+    asyncio.run(job.complete("probe", {"duration": 12.0}))
+    asyncio.run(job.clear())
+    assert os.listdir(tmp_path) == []
+    assert "checkpoints/video-1.json" not in s3.objects
+
+
+def test_jobs_for_the_same_video_run_one_at_a_time():
+    running = []
+    overlaps = []
+
+    async def job(name):
+        running.append(name)
+        overlaps.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(name)
+        return name
+
+    async def scenario():
+        return await asyncio.gather(*(run_exclusive("video-1", job, n) for n in range(3)), run_exclusive("video-2", job, "other"))
+
+    assert asyncio.run(scenario()) == [0, 1, 2, "other"]
+    assert max(overlaps) == 2  # video-2 overlaps, video-1 jobs never do
+
+
+def test_prune_removes_only_abandoned_jobs(tmp_path):
+    (tmp_path / "old").mkdir()
+    (tmp_path / "old.json").write_text("{}")
+    (tmp_path / "recent.json").write_text("{}")
+    stale = time.time() - 7200
+    os.utime(tmp_path / "old", (stale, stale))
+    os.utime(tmp_path / "old.json", (stale, stale))
+    prune_local_checkpoints(str(tmp_path), max_age=3600)
+    assert os.listdir(tmp_path) == ["recent.json"]
+
+
+def run_job(video_id):
+    return asyncio.run(main.run_processing_stages(
+        video_id, BUCKET, f"videos/{video_id}.mp4", f"metadata/{video_id}.json", 1000, "corr", None, main.StageTimer()
+    ))
+
+
+def test_a_failed_db_write_fails_the_job_and_the_retry_resumes_at_it(monkeypatch, pipeline, s3):
+    media_runs = []
+
+    async def media_stages(job, *args):
+        media_runs.append(job.video_id)
+        await job.complete("transcode", {"duration": 9.6, "master_playlist_key": "renditions/x/master.m3u8", "renditions": []})
+        await job.complete("thumbnail", {"thumbnail_key": "thumbnails/x.jpg", "thumbnail_url": "thumbnails/x.jpg", "thumbnail_set": {}})
+        await job.complete("scenes", {"scenes_key": None, "scene_index": None, "scene_count": 0})
+        await job.complete("audio", {"audio_summary": None})
+
+    monkeypatch.setattr(main, "run_media_stages", media_stages)
+    video_id = str(uuid.uuid4())
+
+    pipeline.error = RuntimeError("connection refused")
+    with pytest.raises(RuntimeError):
+        run_job(video_id)
+    assert f"metadata/{video_id}.json" not in s3.objects
+    stages = json.loads(s3.objects[f"checkpoints/{video_id}.json"])["stages"]
+    assert "transcode" in stages and "db" not in stages
+
+    pipeline.error = None
+    run_job(video_id)
+    assert media_runs == [video_id]  # The retry skipped straight to the db stage
+    assert [row["video_id"] for row in pipeline.rows] == [uuid.UUID(video_id)]
+    assert f"metadata/{video_id}.json" in s3.objects
+    assert f"checkpoints/{video_id}.json" not in s3.objects
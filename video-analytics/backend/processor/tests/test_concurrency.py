@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+import concurrency
+from concurrency import ConcurrencyController
+from lanes import LaneScheduler
+
+LANES = [{"name": "standard", "queue_url": "standard", "weight": 1.0, "reserved": 0}]
+
+
+class FakeResources:
+    def __init__(self, cpu=0.5, memory=0.5):
+        self.cpu = cpu
+        self.memory = memory
+
+    def cpu_utilization(self):
+        return self.cpu
+
+    def memory_utilization(self):
+        return self.memory
+
+
+def controller(capacity=4, in_flight=0, backlog=0, **options):
+    scheduler = LaneScheduler(LANES, capacity)
+    scheduler.in_flight["standard"] = in_flight
+    resources = FakeResources(options.pop("cpu", 0.5), options.pop("memory", 0.5))
+    return ConcurrencyController(scheduler, lambda: {"standard": backlog}, min_limit=1, max_limit=8, resources=resources, **options)
+
+
+def adjust(ctrl):
+    asyncio.run(ctrl.adjust())
+    return ctrl.limit
+
+
+def test_grows_by_one_when_saturated_with_a_backlog():
+    ctrl = controller(capacity=4, in_flight=4, backlog=20)
+    assert adjust(ctrl) == 5
+    assert ctrl.scheduler.capacity == 5
+
+
+def test_holds_without_a_backlog_or_without_free_headroom():
+    assert adjust(controller(capacity=4, in_flight=4, backlog=0)) == 4
+    assert adjust(controller(capacity=4, in_flight=2, backlog=20)) == 4  # Slots still free
+    assert adjust(controller(capacity=4, in_flight=4, backlog=20, cpu=0.8)) == 4  # Above the CPU target
+
+
+def test_never_grows_past_max_limit():
+    assert adjust(controller(capacity=8, in_flight=8, backlog=20)) == 8
+
+
+@pytest.mark.parametrize("pressure", [{"cpu": 0.97}, {"memory": 0.9}])
+def test_backs_off_multiplicatively_under_resource_pressure(pressure):
+    assert adjust(controller(capacity=8, in_flight=8, backlog=20, **pressure)) == 5  # int(8 * 0.7)
+
+
+def test_backs_off_from_the_load_not_an_idle_limit():
+    assert adjust(controller(capacity=8, in_flight=2, cpu=0.97)) == 1
+
+
+def test_slower_media_stages_back_off_once_per_degradation():
+    ctrl = controller(capacity=6, in_flight=6, backlog=20)
+    for _ in range(10):
+        ctrl.observe_latency(10.0, 100 * 1024 * 1024)  # 0.1 s/MB baseline
+    for _ in range(5):
+        ctrl.observe_latency(50.0, 100 * 1024 * 1024)  # 5x slower
+    assert ctrl.latency_ratio() > 1.5
+    assert adjust(ctrl) == 4
+    # No job finished under the new limit yet: latency alone does not shrink it again
+    ctrl.queue_depths = lambda: {"standard": 0}
+    assert adjust(ctrl) == 4
+
+
+def test_unreadable_queues_do_not_count_as_a_backlog():
+    ctrl = controller(capacity=4, in_flight=4)
+    ctrl.queue_depths = dict
+    assert adjust(ctrl) == 4
+
+
+def test_cgroup_v2_cpu_quota(monkeypatch, tmp_path):
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    monkeypatch.setattr(concurrency, "CGROUP_ROOT", str(tmp_path))
+    assert concurrency.container_cpu_limit() == 1.5
+
+
+def test_memory_utilization_excludes_reclaimable_cache(monkeypatch, tmp_path):
+    (tmp_path / "memory.current").write_text(str(600 * 2**20))
+    (tmp_path / "memory.max").write_text(str(1024 * 2**20))
+    (tmp_path / "memory.stat").write_text(f"anon 1\ninactive_file {88 * 2**20}\n")
+    monkeypatch.setattr(concurrency, "CGROUP_ROOT", str(tmp_path))
+    monkeypatch.setattr(concurrency, "_host_memory_bytes", lambda: 64 * 2**30)
+    assert concurrency.ResourceMonitor().memory_utilization() == 0.5
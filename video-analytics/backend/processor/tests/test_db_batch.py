@@ -0,0 +1,151 @@
+import asyncio
+import contextlib
+
+import pytest
+from sqlalchemy import TIMESTAMP, Column, MetaData, String, Table
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from db_batch import VideoWriteBatcher
+
+videos = Table(
+    "videos", MetaData(),
+    Column("video_id", String, primary_key=True),
+    Column("status", String),
+    Column("content_hash", String, unique=True),
+    Column("duplicate_of", String),
+    Column("updated_at", TIMESTAMP),
+)
+
+
+class FakeEngine:
+    """Records the upserts of every transaction; owners are existing content_hash -> video_id rows"""
+
+    def __init__(self, owners=None, fail=None):
+        self.owners = dict(owners or {})
+        self.fail = fail  # fail(video_ids) -> exception to raise for that transaction, or None
+        self.transactions = []
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, statement):
+        if statement.is_select:
+            return FakeResult(self.owners.items())
+        rows = statement.compile(dialect=postgresql.dialect()).params
+        video_ids = [value for key, value in rows.items() if key.startswith("video_id")]
+        error = self.fail and self.fail(video_ids)
+        if error:
+            raise error
+        self.transactions.append(statement)
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def all(self):
+        return self.rows
+
+
+def row(video_id, **columns):
+    return dict({"video_id": video_id, "status": "PROCESSED"}, **columns)
+
+
+def test_rows_submitted_together_share_one_transaction():
+    engine = FakeEngine()
+
+    async def scenario():
+        batcher = VideoWriteBatcher(lambda: engine, videos, interval=60)
+        futures = [batcher.submit(row(f"v{n}")) for n in range(5)]
+        await batcher.flush()
+        return await asyncio.gather(*futures)
+
+    assert asyncio.run(scenario()) == [True] * 5
+    assert len(engine.transactions) == 1
+    assert "ON CONFLICT (video_id) DO UPDATE" in str(engine.transactions[0].compile(dialect=postgresql.dialect()))
+
+
+def test_last_write_wins_for_a_repeated_video_id():
+    engine = FakeEngine()
+
+    async def scenario():
+        batcher = VideoWriteBatcher(lambda: engine, videos)
+        futures = [batcher.submit(row("v0", status="PROCESSING")), batcher.submit(row("v0", status="PROCESSED"))]
+        await batcher.flush()
+        await asyncio.gather(*futures)
+
+    asyncio.run(scenario())
+    params = engine.transactions[0].compile(dialect=postgresql.dialect()).params
+    assert [value for key, value in params.items() if key.startswith("status")] == ["PROCESSED"]
+
+
+def test_batches_are_capped_at_max_rows():
+    engine = FakeEngine()
+
+    async def scenario():
+        batcher = VideoWriteBatcher(lambda: engine, videos, max_rows=2)
+        futures = [batcher.submit(row(f"v{n}")) for n in range(5)]
+        await batcher.flush()
+        await asyncio.gather(*futures)
+
+    asyncio.run(scenario())
+    assert len(engine.transactions) == 3
+
+
+def test_a_content_hash_owned_by_another_video_becomes_duplicate_of():
+    rows = [row("new-a", content_hash="h1"), row("new-b", content_hash="h1"), row("new-c", content_hash="h2")]
+    VideoWriteBatcher(None, videos)._resolve_content_hashes(FakeEngine(owners={"h2": "old"}), rows)
+
+    assert rows[0]["content_hash"] == "h1" and "duplicate_of" not in rows[0]
+    assert rows[1]["content_hash"] is None and rows[1]["duplicate_of"] == "new-a"
+    assert rows[2]["content_hash"] is None and rows[2]["duplicate_of"] == "old"
+
+
+def test_integrity_errors_fall_back_to_one_row_per_transaction():
+    # A content_hash race with another pod fails the batch; only the racing row fails alone
+    def fail(video_ids):
+        if "v1" in video_ids:
+            return IntegrityError("INSERT", {}, Exception("duplicate key"))
+
+    engine = FakeEngine(fail=fail)
+
+    async def scenario():
+        batcher = VideoWriteBatcher(lambda: engine, videos)
+        futures = [batcher.submit(row(f"v{n}")) for n in range(3)]
+        await batcher.flush()
+        return [f.exception() is None for f in futures]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+    assert len(engine.transactions) == 2
+
+
+def test_other_errors_fail_every_row_of_the_batch():
+    engine = FakeEngine(fail=lambda video_ids: RuntimeError("connection reset"))
+
+    async def scenario():
+        batcher = VideoWriteBatcher(lambda: engine, videos)
+        futures = [batcher.submit(row(f"v{n}")) for n in range(2)]
+        await batcher.flush()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    asyncio.run(scenario())
+
+
+def test_stop_writes_pending_rows_and_refuses_new_ones():
+    engine = FakeEngine()
+
+    async def scenario():
+        batcher = VideoWriteBatcher(lambda: engine, videos, interval=60)
+        batcher.start()
+        future = batcher.submit(row("v0"))
+        await batcher.stop()
+        with pytest.raises(RuntimeError):
+            batcher.submit(row("v1"))
+        return future.result()
+
+    assert asyncio.run(scenario()) is True
+    assert len(engine.transactions) == 1
@@ -0,0 +1,69 @@
+import asyncio
+import types
+import uuid
+
+import main
+from metadata_codec import decode_metadata
+
+BUCKET = "video-analytics-uploads"
+ORIGINAL_ID = uuid.uuid4()
+ORIGINAL = types.SimpleNamespace(
+    video_id=ORIGINAL_ID,
+    duration_seconds=42,
+    hls_master_key=f"renditions/{ORIGINAL_ID}/master.m3u8",
+    renditions=[{"name": "360p"}],
+    thumbnail_key=f"thumbnails/{ORIGINAL_ID}/poster_320x180.jpg",
+    thumbnails={"posters": {}},
+    scene_index=None,
+    audio_summary={"integrated_lufs": -16.0},
+)
+
+
+def run_job(video_id, content_hash="ab" * 32):
+    return asyncio.run(main.run_processing_stages(
+        video_id, BUCKET, f"videos/{video_id}.mp4", f"metadata/{video_id}.json", 1000, "corr", content_hash, main.StageTimer()
+    ))
+
+
+async def no_media_stages(*args):
+    raise AssertionError("media stages must not run for a duplicate")
+
+
+def test_duplicate_reuses_the_original_outputs(monkeypatch, pipeline, s3):
+    monkeypatch.setattr(main, "find_processed_original", lambda content_hash, video_id: ORIGINAL)
+    monkeypatch.setattr(main, "run_media_stages", no_media_stages)
+    video_id = str(uuid.uuid4())
+    run_job(video_id)
+
+    [row] = pipeline.rows
+    assert row["duplicate_of"] == ORIGINAL_ID
+    assert row["content_hash"] is None  # The unique hash stays on the original
+    assert row["s3_key"] == f"videos/{video_id}.mp4"  # Keeps its own source object
+    assert row["hls_master_key"] == ORIGINAL.hls_master_key
+    assert row["audio_summary"] == ORIGINAL.audio_summary
+
+    metadata = decode_metadata(s3.objects[f"metadata/{video_id}.json"])
+    assert metadata["duplicate_of"] == str(ORIGINAL_ID)
+    assert metadata["s3_key"] == f"videos/{video_id}.mp4"
+    assert f"checkpoints/{video_id}.json" not in s3.objects
+
+
+def test_unique_content_is_processed(monkeypatch, pipeline):
+    monkeypatch.setattr(main, "find_processed_original", lambda content_hash, video_id: None)
+    ran = []
+
+    async def media_stages(checkpoint, *args):
+        ran.append(checkpoint.video_id)
+        await checkpoint.complete("transcode", {"duration": 9.6, "master_playlist_key": "renditions/x/master.m3u8", "renditions": []})
+        await checkpoint.complete("thumbnail", {"thumbnail_key": "thumbnails/x.jpg", "thumbnail_url": "thumbnails/x.jpg", "thumbnail_set": {}})
+        await checkpoint.complete("scenes", {"scenes_key": None, "scene_index": None, "scene_count": 0})
+        await checkpoint.complete("audio", {"audio_summary": None})
+
+    monkeypatch.setattr(main, "run_media_stages", media_stages)
+    video_id = str(uuid.uuid4())
+    run_job(video_id, content_hash="cd" * 32)
+
+    assert ran == [video_id]
+    [row] = pipeline.rows
+    assert row["content_hash"] == "cd" * 32 and row["duplicate_of"] is None
+    assert row["duration_seconds"] == 10
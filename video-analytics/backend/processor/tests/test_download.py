@@ -0,0 +1,78 @@
+import io
+import os
+
+import pytest
+from botocore.response import StreamingBody
+
+import main
+
+PART = 64 * 1024
+KEY = "videos/source.mp4"
+
+
+class FlakyS3:
+    """Wraps the fake bucket; truncates the first `failures` GETs of the part starting at fail_offset"""
+
+    def __init__(self, s3, fail_offset=None, failures=0):
+        self.s3 = s3
+        self.fail_offset = fail_offset
+        self.failures = failures
+
+    def get_object(self, Bucket, Key, Range=None):
+        response = self.s3.get_object(Bucket, Key, Range)
+        if Range and Range.startswith(f"bytes={self.fail_offset}-") and self.failures:
+            self.failures -= 1
+            body = response["Body"].read()[:100]
+            response["Body"] = StreamingBody(io.BytesIO(body), len(body))
+        return response
+
+    def head_object(self, Bucket, Key):
+        return self.s3.head_object(Bucket, Key)
+
+    def download_file(self, Bucket, Key, Filename):
+        with open(Filename, "wb") as f:
+            f.write(self.s3.objects[Key])
+
+
+@pytest.fixture
+def source(monkeypatch, s3):
+    data = os.urandom(5 * PART + 123)
+    s3.objects[KEY] = data
+    monkeypatch.setattr(main, "DOWNLOAD_PART_BYTES", PART)
+    monkeypatch.setattr(main, "DOWNLOAD_PARTS_MIN_BYTES", 2 * PART)
+    monkeypatch.setattr(main, "RETRY_BACKOFF_FACTOR", 0)
+    return data
+
+
+def download(monkeypatch, client, path):
+    monkeypatch.setattr(main, "download_client", client)
+    return main.download_source("bucket", KEY, str(path))
+
+
+def test_parts_are_reassembled_in_place(monkeypatch, s3, source, tmp_path):
+    assert download(monkeypatch, FlakyS3(s3), tmp_path / "source") == len(source)
+    assert (tmp_path / "source").read_bytes() == source
+    ranges = {r for key, r in s3.get_calls}
+    assert ranges == {f"bytes={n * PART}-{n * PART + PART - 1}" for n in range(5)} | {f"bytes={5 * PART}-{5 * PART + 122}"}
+    assert os.listdir(tmp_path) == ["source"]
+
+
+def test_a_short_part_is_fetched_again(monkeypatch, s3, source, tmp_path):
+    before = main.DOWNLOAD_PART_RETRIES._value.get()
+    download(monkeypatch, FlakyS3(s3, fail_offset=2 * PART, failures=2), tmp_path / "source")
+    assert (tmp_path / "source").read_bytes() == source
+    assert main.DOWNLOAD_PART_RETRIES._value.get() - before == 2
+
+
+def test_a_part_that_keeps_failing_leaves_no_file(monkeypatch, s3, source, tmp_path):
+    client = FlakyS3(s3, fail_offset=PART, failures=main.DOWNLOAD_PART_ATTEMPTS)
+    with pytest.raises(IOError):
+        download(monkeypatch, client, tmp_path / "source")
+    assert os.listdir(tmp_path) == []
+
+
+def test_small_objects_use_a_single_download(monkeypatch, s3, tmp_path):
+    s3.objects[KEY] = b"small"
+    assert download(monkeypatch, FlakyS3(s3), tmp_path / "source") == 5
+    assert (tmp_path / "source").read_bytes() == b"small"
+    assert s3.get_calls == []
@@ -0,0 +1,43 @@
+import numpy as np
+from PIL import Image, ImageEnhance
+
+import fingerprint
+
+
+def scene(seed, size=(640, 360)):
+    """Smooth random image (low-frequency content, like a real frame)"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (9, 16, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize(size, Image.BICUBIC)
+
+
+def signature(frames):
+    return int(fingerprint.signature_of_frames([fingerprint.hash_input(frame) for frame in frames]), 16)
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def test_signature_is_16_hex_digits():
+    assert len(fingerprint.signature_of_frames([fingerprint.hash_input(scene(1))])) == 16
+
+
+def test_rescaled_and_brightened_copies_stay_close():
+    frames = [scene(seed) for seed in range(8)]
+    original = signature(frames)
+    rescaled = signature([frame.resize((320, 180)) for frame in frames])
+    brighter = signature([ImageEnhance.Brightness(frame).enhance(1.2) for frame in frames])
+    # Analytics' default near-duplicate radius is 10 bits
+    assert distance(original, rescaled) <= 6
+    assert distance(original, brighter) <= 6
+
+
+def test_unrelated_videos_are_far_apart():
+    a = signature([scene(seed) for seed in range(8)])
+    b = signature([scene(seed) for seed in range(100, 108)])
+    assert distance(a, b) > 16
+
+
+def test_signature_is_the_bitwise_majority_of_frame_hashes():
+    assert fingerprint.video_signature([0b1100, 0b1010, 0b1001]) == 0b1000
@@ -0,0 +1,72 @@
+import asyncio
+
+from lanes import LaneScheduler
+
+LANES = [
+    {"name": "fast", "queue_url": "fast", "weight": 3.0, "reserved": 1},
+    {"name": "standard", "queue_url": "standard", "weight": 1.0, "reserved": 0},
+]
+
+
+def test_reserved_slots_are_kept_for_their_lane():
+    scheduler = LaneScheduler(LANES, capacity=4)
+    assert scheduler.free_slots("standard") == 3
+    assert scheduler.free_slots("fast") == 4
+
+    async def scenario():
+        for _ in range(3):
+            await scheduler.acquire("standard")
+        assert scheduler.headroom("standard") == 0
+        assert scheduler.headroom("fast") == 1
+        await scheduler.acquire("fast")
+
+    asyncio.run(scenario())
+    assert scheduler.in_flight == {"fast": 1, "standard": 3}
+
+
+def test_slots_are_shared_by_lane_weight_under_a_backlog():
+    scheduler = LaneScheduler(LANES, capacity=0)
+
+    async def scenario():
+        waiting = [asyncio.create_task(scheduler.acquire(lane)) for lane in ["standard"] * 8 + ["fast"] * 8]
+        await asyncio.sleep(0)
+        scheduler.set_capacity(8)
+        await asyncio.sleep(0)
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+
+    asyncio.run(scenario())
+    # Weight 3 against 1: the fast lane holds three slots for every standard one
+    assert scheduler.in_flight == {"fast": 6, "standard": 2}
+
+
+def test_cancelled_waiters_give_up_their_place():
+    scheduler = LaneScheduler(LANES, capacity=1)
+
+    async def scenario():
+        await scheduler.acquire("fast")
+        waiter = asyncio.create_task(scheduler.acquire("standard"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release("fast")
+
+    asyncio.run(scenario())
+    assert scheduler.in_flight == {"fast": 0, "standard": 0}
+    assert not any(scheduler.waiters.values())
+
+
+def test_a_larger_capacity_wakes_waiting_jobs():
+    scheduler = LaneScheduler(LANES, capacity=1)
+
+    async def scenario():
+        await scheduler.acquire("fast")
+        waiter = asyncio.create_task(scheduler.acquire("standard"))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        scheduler.set_capacity(2)
+        await asyncio.wait_for(waiter, 1)
+
+    asyncio.run(scenario())
+    assert scheduler.in_flight == {"fast": 1, "standard": 1}
@@ -0,0 +1,37 @@
+import numpy as np
+
+import scenes
+
+
+def shots(*colors_and_lengths):
+    """Sampled frames of solid-colour shots, as _frame_batches yields them"""
+    width, height = scenes.FRAME_SIZE
+    frames = [np.full((height, width, 3), color, dtype=np.uint8) for color, length in colors_and_lengths for _ in range(length)]
+    return np.stack(frames)
+
+
+def detect(monkeypatch, frames, batch=7):
+    monkeypatch.setattr(scenes, "_frame_batches", lambda source, options: (frames[i:i + batch] for i in range(0, len(frames), batch)))
+    index = scenes.detect_scenes("source")
+    magic, version, _, fps, count = scenes.INDEX_HEADER.unpack_from(index)
+    assert (magic, version, fps) == (scenes.INDEX_MAGIC, scenes.INDEX_VERSION, scenes.SAMPLE_FPS)
+    entries = np.frombuffer(index, dtype=scenes.INDEX_ENTRY, offset=scenes.INDEX_HEADER.size)
+    assert scenes.scene_count(index) == count == len(entries)
+    return entries
+
+
+def test_cuts_are_found_across_decode_batches(monkeypatch):
+    entries = detect(monkeypatch, shots(((200, 0, 0), 10), ((0, 0, 200), 10), ((0, 200, 0), 10)))
+    assert entries["start_ms"].tolist() == [0, 2000, 4000]
+    assert entries["score"][0] == 0 and all(entries["score"][1:] >= scenes.CUT_THRESHOLD * 10000)
+
+
+def test_cuts_closer_than_the_minimum_scene_length_are_merged(monkeypatch):
+    entries = detect(monkeypatch, shots(((200, 0, 0), 10), ((0, 0, 200), 2), ((0, 200, 0), 10)))
+    assert entries["start_ms"].tolist() == [0, 2000]
+
+
+def test_a_single_shot_is_one_scene(monkeypatch):
+    entries = detect(monkeypatch, shots(((90, 90, 90), 12)))
+    assert entries["start_ms"].tolist() == [0]
+    assert entries["keyframe_ms"][0] < 12 * 1000 // scenes.SAMPLE_FPS
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+import sqs_batch
+from sqs_batch import SQSBatcher
+
+
+class FakeSQS:
+    """Records batch calls; responses[n] decides the outcome of call n per entry Id"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def _batch(self, QueueUrl, Entries):
+        self.calls.append([entry["Id"] for entry in Entries])
+        outcome = self.responses.pop(0) if self.responses else {}
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = {"Successful": [], "Failed": []}
+        for entry in Entries:
+            failure = outcome.get(entry["Id"])
+            if failure is None:
+                response["Successful"].append({"Id": entry["Id"]})
+            else:
+                response["Failed"].append({"Id": entry["Id"], "Code": failure, "Message": failure, "SenderFault": failure == "InvalidParameterValue"})
+        return response
+
+    delete_message_batch = _batch
+    send_message_batch = _batch
+
+
+def run_batch(fake, count, operation="delete", **batcher_options):
+    async def scenario():
+        batcher = SQSBatcher(fake, operation, "https://sqs.example/queue", backoff_factor=0, **batcher_options)
+        if operation == "delete":
+            futures = [batcher.submit(ReceiptHandle=f"handle-{n}") for n in range(count)]
+        else:
+            futures = [batcher.submit(MessageBody=f"message-{n}") for n in range(count)]
+        await batcher.flush()
+        return [future.result() for future in futures]
+
+    return asyncio.run(scenario())
+
+
+def test_only_failed_entries_are_retried():
+    fake = FakeSQS({"1": "InternalError", "3": "ServiceUnavailable"}, {})
+    assert run_batch(fake, 4) == [True, True, True, True]
+    assert fake.calls == [["0", "1", "2", "3"], ["1", "3"]]
+
+
+def test_sender_faults_are_not_retried():
+    fake = FakeSQS({"0": "InvalidParameterValue", "2": "InternalError"}, {})
+    assert run_batch(fake, 3) == [False, True, True]
+    assert fake.calls == [["0", "1", "2"], ["2"]]
+
+
+def test_gives_up_after_max_retries():
+    fake = FakeSQS(*[{"1": "InternalError"}] * 5)
+    assert run_batch(fake, 2, max_retries=2) == [True, False]
+    assert fake.calls == [["0", "1"], ["1"], ["1"]]
+
+
+def test_request_errors_retry_the_whole_batch():
+    error = ClientError({"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "DeleteMessageBatch")
+    fake = FakeSQS(error, {})
+    assert run_batch(fake, 2) == [True, True]
+    assert fake.calls == [["0", "1"], ["0", "1"]]
+
+
+def test_entries_are_sent_in_batches_of_ten():
+    fake = FakeSQS()
+    assert all(run_batch(fake, 25, operation="send"))
+    assert [len(call) for call in fake.calls] == [10, 10, 5]
+
+
+def test_batches_respect_the_payload_limit(monkeypatch):
+    monkeypatch.setattr(sqs_batch, "SQS_MAX_BATCH_BYTES", len("message-0") * 3)
+    fake = FakeSQS()
+    assert all(run_batch(fake, 7, operation="send"))
+    assert [len(call) for call in fake.calls] == [3, 3, 1]
+
+
+def test_stop_drains_entries_submitted_while_stopping():
+    fake = FakeSQS()
+
+    async def scenario():
+        batcher = SQSBatcher(fake, "delete", "https://sqs.example/queue", max_wait=60)
+        batcher.start()
+        first = batcher.submit(ReceiptHandle="a")
+        stopping = asyncio.create_task(batcher.stop())
+        await asyncio.sleep(0)
+        second = batcher.submit(ReceiptHandle="b")
+        await stopping
+        with pytest.raises(RuntimeError):
+            batcher.submit(ReceiptHandle="c")
+        return first.result(), second.result()
+
+    assert asyncio.run(scenario()) == (True, True)
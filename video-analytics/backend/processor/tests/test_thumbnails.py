@@ -0,0 +1,49 @@
+import os
+
+import pytest
+from PIL import Image
+
+import thumbnails
+
+
+def frames(count, interval=thumbnails.SAMPLE_INTERVAL_SECONDS):
+    """Decoded samples as iter_frames yields them: (timestamp, 640x360 RGB image)"""
+    return [(n * interval, Image.new("RGB", thumbnails.DECODE_SIZE, (n * 2 % 256, 64, 128))) for n in range(count)]
+
+
+def test_every_artifact_comes_from_one_set_of_samples(tmp_path):
+    manifest = thumbnails.build_thumbnail_set(None, str(tmp_path), duration=250, encode_threads=2, frames=frames(126))
+
+    assert manifest["frames_sampled"] == 126
+    assert set(manifest["posters"]) == {"jpeg", "webp"}
+    for sizes in manifest["posters"].values():
+        assert set(sizes) == {"320x180", "640x360"}
+        for name in sizes.values():
+            assert os.path.exists(tmp_path / name)
+    with Image.open(tmp_path / manifest["posters"]["webp"]["320x180"]) as poster:
+        assert poster.size == (320, 180)
+
+    # 100 tiles per sheet: one full sheet and one with the remaining 26
+    assert manifest["sprites"] == ["sprite_000.jpg", "sprite_001.jpg"]
+    with Image.open(tmp_path / "sprite_000.jpg") as sheet:
+        assert sheet.size == (1600, 900)
+
+    with Image.open(tmp_path / manifest["preview"]) as preview:
+        assert preview.n_frames == thumbnails.PREVIEW_FRAMES
+    assert len(manifest["perceptual_hash"]) == 16
+
+
+def test_sprite_index_points_at_each_tile(tmp_path):
+    thumbnails.build_thumbnail_set(None, str(tmp_path), duration=5, frames=frames(3))
+    cues = (tmp_path / "sprites.vtt").read_text().strip().split("\n\n")
+
+    assert cues[0] == "WEBVTT"
+    assert cues[1] == "00:00:00.000 --> 00:00:02.000\nsprite_000.jpg#xywh=0,0,160,90"
+    assert cues[2] == "00:00:02.000 --> 00:00:04.000\nsprite_000.jpg#xywh=160,0,160,90"
+    # The last cue runs to the end of the video
+    assert cues[3] == "00:00:04.000 --> 00:00:05.000\nsprite_000.jpg#xywh=320,0,160,90"
+
+
+def test_no_frames_is_an_error(tmp_path):
+    with pytest.raises(RuntimeError):
+        thumbnails.build_thumbnail_set(None, str(tmp_path), duration=0, frames=[])
@@ -0,0 +1,73 @@
+import struct
+
+import pytest
+
+from transcode import supports_sequential_read
+
+
+def box(box_type, payload=b"", size=None):
+    return struct.pack(">I4s", 8 + len(payload) if size is None else size, box_type) + payload
+
+
+def large_box(box_type, payload):
+    """Box with a 64-bit size (size field 1, largesize after the type)"""
+    return struct.pack(">I4sQ", 1, box_type, 16 + len(payload)) + payload
+
+
+def reader(data):
+    calls = []
+
+    def read_range(offset, length):
+        calls.append((offset, length))
+        return data[offset:offset + length]
+
+    read_range.calls = calls
+    return read_range
+
+
+FTYP = box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41")
+
+
+@pytest.mark.parametrize("header", [
+    b"\x1a\x45\xdf\xa3" + b"\x00" * 600,           # Matroska / WebM
+    b"FLV\x01\x05" + b"\x00" * 600,                # FLV
+    (b"\x47" + b"\x00" * 187) * 4,                 # MPEG-TS
+], ids=["matroska", "flv", "mpegts"])
+def test_streamable_containers(header):
+    assert supports_sequential_read(reader(header))
+
+
+def test_faststart_mp4():
+    data = FTYP + box(b"moov", b"\x00" * 100) + box(b"mdat", b"\x00" * 1000)
+    assert supports_sequential_read(reader(data))
+
+
+def test_mp4_with_moov_at_the_end():
+    data = FTYP + box(b"free") + box(b"mdat", b"\x00" * 1000) + box(b"moov", b"\x00" * 100)
+    assert not supports_sequential_read(reader(data))
+
+
+def test_boxes_are_skipped_by_size_without_reading_them():
+    data = FTYP + box(b"free", b"\x00" * 50000) + large_box(b"wide", b"\x00" * 70000) + box(b"moov")
+    read_range = reader(data)
+    assert supports_sequential_read(read_range)
+    assert all(length <= 512 for _, length in read_range.calls)
+
+
+def test_large_mdat_before_moov():
+    data = FTYP + large_box(b"mdat", b"\x00" * 1000) + box(b"moov")
+    assert not supports_sequential_read(reader(data))
+
+
+@pytest.mark.parametrize("data", [
+    FTYP + box(b"mdat", size=0),                   # Runs to end of file
+    FTYP + box(b"free", size=4) + box(b"moov"),    # Malformed size
+    FTYP + box(b"free"),                           # Truncated before moov
+    FTYP + box(b"free") * 20 + box(b"moov"),       # moov beyond the inspected boxes
+], ids=["size-zero", "malformed", "truncated", "too-many-boxes"])
+def test_unreadable_layouts_need_random_access(data):
+    assert not supports_sequential_read(reader(data))
+
+
+def test_unknown_container():
+    assert not supports_sequential_read(reader(b"RIFF\x00\x00\x00\x00AVI " + b"\x00" * 600))
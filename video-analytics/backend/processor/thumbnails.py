@@ -0,0 +1,186 @@
+"""
+Thumbnail set generation for the processor service.
+
+One ffmpeg decode pass samples frames at a fixed interval and every image
+artifact is built from those samples: poster thumbnails in several sizes (JPEG
+and WebP), scrubbing sprite sheets with a WebVTT index, and an animated WebP
+preview. The same samples feed the perceptual video signature (see
+fingerprint). Runs inside the processor's ProcessPoolExecutor, so this module must
+stay free of import-time side effects.
+"""
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import ffmpeg
+from PIL import Image
+
+import fingerprint
+
+SAMPLE_INTERVAL_SECONDS = 2
+DECODE_SIZE = (640, 360)  # Largest output size; every other size is downscaled from it
+POSTER_SIZES = [(320, 180), (640, 360)]
+POSTER_FORMATS = {"jpeg": ("JPEG", "jpg"), "webp": ("WEBP", "webp")}
+POSTER_TIME_SECONDS = 1.0
+SPRITE_TILE_SIZE = (160, 90)
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+PREVIEW_FRAMES = 12
+PREVIEW_SIZE = (320, 180)
+PREVIEW_FRAME_MS = 250
+IMAGE_QUALITY = 80
+
+
+def frames_output(video, interval=SAMPLE_INTERVAL_SECONDS, size=DECODE_SIZE):
+    """ffmpeg output writing the sampled, letterboxed RGB frames of a video stream to stdout"""
+    width, height = size
+    return (
+        video.filter("fps", f"1/{interval}")
+        .filter("scale", width, height, force_original_aspect_ratio="decrease")
+        .filter("pad", width, height, "(ow-iw)/2", "(oh-ih)/2")
+        .output("pipe:", format="rawvideo", pix_fmt="rgb24")
+    )
+
+
+def read_frames(pipe, interval=SAMPLE_INTERVAL_SECONDS, size=DECODE_SIZE):
+    """Yield (timestamp, RGB image) for every raw frame written by frames_output"""
+    frame_bytes = size[0] * size[1] * 3
+    index = 0
+    while True:
+        data = pipe.read(frame_bytes)
+        if len(data) < frame_bytes:
+            return
+        yield index * interval, Image.frombytes("RGB", size, data)
+        index += 1
+
+
+def iter_frames(source, interval=SAMPLE_INTERVAL_SECONDS, size=DECODE_SIZE):
+    """Decode source once and yield (timestamp, RGB image) every `interval` seconds"""
+    process = (
+        frames_output(ffmpeg.input(source).video, interval, size)
+        .global_args("-loglevel", "error", "-nostats")
+        .run_async(pipe_stdout=True)
+    )
+    count = 0
+    try:
+        for frame in read_frames(process.stdout, interval, size):
+            count += 1
+            yield frame
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode != 0 and count == 0:
+        raise RuntimeError(f"ffmpeg frame sampling failed with exit code {returncode}")
+
+
+def _vtt_timestamp(seconds):
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def _save(image, path, fmt, **options):
+    image.save(path, fmt, quality=IMAGE_QUALITY, **options)
+    return os.path.basename(path)
+
+
+def _resize(image, size):
+    return image.resize(size, Image.LANCZOS)
+
+
+def _save_sprite_sheet(tile_futures, path):
+    columns = min(SPRITE_COLUMNS, len(tile_futures))
+    rows = math.ceil(len(tile_futures) / SPRITE_COLUMNS)
+    tile_w, tile_h = SPRITE_TILE_SIZE
+    sheet = Image.new("RGB", (columns * tile_w, rows * tile_h))
+    for i, future in enumerate(tile_futures):
+        sheet.paste(future.result(), ((i % SPRITE_COLUMNS) * tile_w, (i // SPRITE_COLUMNS) * tile_h))
+    return _save(sheet, path, "JPEG")
+
+
+def build_thumbnail_set(source, output_dir, duration, encode_threads=4, frames=None):
+    """Write every thumbnail artifact for source into output_dir and return a manifest.
+
+    Frames are read from the decoder on this thread while resizing and encoding
+    run on a small thread pool (Pillow releases the GIL for both). `frames` may
+    supply already decoded (timestamp, image) samples instead of decoding source.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    interval = SAMPLE_INTERVAL_SECONDS
+    expected_frames = int(duration // interval) + 1 if duration > 0 else 0
+    poster_index = math.ceil(min(POSTER_TIME_SECONDS, duration / 2 if duration > 0 else 0) / interval)
+    if expected_frames:
+        poster_index = min(poster_index, expected_frames - 1)
+        step = max(1, expected_frames / PREVIEW_FRAMES)
+        preview_indices = {int(i * step) for i in range(min(PREVIEW_FRAMES, expected_frames))}
+    else:
+        preview_indices = set(range(PREVIEW_FRAMES))
+
+    tiles_per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    tile_w, tile_h = SPRITE_TILE_SIZE
+    poster = None
+    preview_futures = []
+    sheet_tiles = []
+    sheet_futures = []
+    hash_futures = []
+    cues = []
+
+    with ThreadPoolExecutor(max_workers=encode_threads) as pool:
+        for index, (timestamp, frame) in enumerate(frames if frames is not None else iter_frames(source, interval)):
+            if index == poster_index or poster is None:
+                poster = frame
+            if index in preview_indices:
+                preview_futures.append(pool.submit(_resize, frame, PREVIEW_SIZE))
+
+            sheet_number = len(sheet_futures)
+            position = len(sheet_tiles)
+            sheet_tiles.append(pool.submit(_resize, frame, SPRITE_TILE_SIZE))
+            hash_futures.append(pool.submit(fingerprint.hash_input, frame))
+            x, y = (position % SPRITE_COLUMNS) * tile_w, (position // SPRITE_COLUMNS) * tile_h
+            cues.append((timestamp, f"sprite_{sheet_number:03d}.jpg#xywh={x},{y},{tile_w},{tile_h}"))
+
+            if len(sheet_tiles) == tiles_per_sheet:
+                path = os.path.join(output_dir, f"sprite_{sheet_number:03d}.jpg")
+                sheet_futures.append(pool.submit(_save_sprite_sheet, sheet_tiles, path))
+                sheet_tiles = []
+
+        if poster is None:
+            raise RuntimeError("No frames could be decoded")
+
+        if sheet_tiles:
+            path = os.path.join(output_dir, f"sprite_{len(sheet_futures):03d}.jpg")
+            sheet_futures.append(pool.submit(_save_sprite_sheet, sheet_tiles, path))
+
+        poster_futures = {}
+        for width, height in POSTER_SIZES:
+            image = poster if (width, height) == DECODE_SIZE else _resize(poster, (width, height))
+            for name, (fmt, ext) in POSTER_FORMATS.items():
+                path = os.path.join(output_dir, f"poster_{width}x{height}.{ext}")
+                poster_futures.setdefault(name, {})[f"{width}x{height}"] = pool.submit(_save, image, path, fmt)
+
+        preview_frames = [f.result() for f in preview_futures]
+        preview_name = _save(
+            preview_frames[0], os.path.join(output_dir, "preview.webp"), "WEBP",
+            save_all=True, append_images=preview_frames[1:], duration=PREVIEW_FRAME_MS, loop=0
+        )
+        sprites = [f.result() for f in sheet_futures]
+        posters = {name: {size: f.result() for size, f in sizes.items()} for name, sizes in poster_futures.items()}
+        perceptual_hash = fingerprint.signature_of_frames([f.result() for f in hash_futures])
+
+    # Each cue covers the interval until the next sample (the last one runs to the end)
+    end_time = duration if duration > cues[-1][0] else cues[-1][0] + interval
+    lines = ["WEBVTT", ""]
+    for i, (start, target) in enumerate(cues):
+        end = cues[i + 1][0] if i + 1 < len(cues) else end_time
+        lines += [f"{_vtt_timestamp(start)} --> {_vtt_timestamp(end)}", target, ""]
+    with open(os.path.join(output_dir, "sprites.vtt"), "w") as f:
+        f.write("\n".join(lines))
+
+    return {
+        "posters": posters,
+        "sprites": sprites,
+        "sprite_vtt": "sprites.vtt",
+        "preview": preview_name,
+        "frames_sampled": len(cues),
+        "perceptual_hash": perceptual_hash,
+    }
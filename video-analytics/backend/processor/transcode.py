@@ -0,0 +1,289 @@
+"""
+FFmpeg transcoding helpers for the processor service.
+
+Everything here runs inside the processor's ProcessPoolExecutor workers, so this
+module must stay free of import-time side effects (no AWS clients, no DB engine).
+"""
+import os
+import struct
+
+import ffmpeg
+
+# Adaptive-bitrate ladder (HLS). Renditions taller than the source are skipped.
+RENDITIONS = [
+    {"name": "360p", "height": 360, "video_bitrate": 800_000, "audio_bitrate": 96_000},
+    {"name": "720p", "height": 720, "video_bitrate": 2_800_000, "audio_bitrate": 128_000},
+    {"name": "1080p", "height": 1080, "video_bitrate": 5_000_000, "audio_bitrate": 192_000},
+]
+
+HLS_SEGMENT_SECONDS = 6
+
+
+def probe_media(source, **input_options):
+    """Return duration, dimensions and audio presence for a local file or URL"""
+    probe = ffmpeg.probe(source, **input_options)
+    video_stream = next((s for s in probe["streams"] if s.get("codec_type") == "video"), None)
+    if video_stream is None:
+        raise ValueError("No video stream found")
+
+    duration = float(video_stream.get("duration") or probe.get("format", {}).get("duration") or 0)
+    return {
+        "duration": duration,
+        "width": int(video_stream.get("width", 0)),
+        "height": int(video_stream.get("height", 0)),
+        "has_audio": any(s.get("codec_type") == "audio" for s in probe["streams"]),
+    }
+
+
+def select_renditions(source_height):
+    """Pick the ladder rungs that do not upscale the source (always at least the lowest)"""
+    ladder = [r for r in RENDITIONS if r["height"] <= source_height]
+    return ladder or RENDITIONS[:1]
+
+
+def scaled_width(media_info, height):
+    """Even output width that keeps the source aspect ratio at the given height"""
+    if not media_info["height"]:
+        return 0
+    return int(round(media_info["width"] * height / media_info["height"] / 2)) * 2
+
+
+def _video_encode_options(rendition, threads):
+    video_bitrate = rendition["video_bitrate"]
+    return {
+        # -2 keeps the aspect ratio with an even width, as required by libx264
+        "vf": f"scale=-2:{rendition['height']}",
+        "c:v": "libx264",
+        "preset": "veryfast",
+        "profile:v": "main",
+        "pix_fmt": "yuv420p",
+        "b:v": video_bitrate,
+        "maxrate": int(video_bitrate * 1.07),
+        "bufsize": int(video_bitrate * 1.5),
+        # Keyframe every segment so every segment is independently decodable
+        "force_key_frames": f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+        "sc_threshold": 0,
+        "threads": threads,
+    }
+
+
+def _audio_encode_options(rendition):
+    return {"c:a": "aac", "b:a": rendition["audio_bitrate"], "ac": 2}
+
+
+def _hls_options(rendition_dir):
+    return {
+        "f": "hls",
+        "hls_time": HLS_SEGMENT_SECONDS,
+        "hls_playlist_type": "vod",
+        "hls_segment_filename": os.path.join(rendition_dir, "segment_%05d.ts"),
+    }
+
+
+def _run(stream, what):
+    try:
+        stream.overwrite_output().run(quiet=True, capture_stderr=True)
+    except ffmpeg.Error as e:
+        stderr = e.stderr.decode("utf-8", errors="replace")[-2000:] if e.stderr else ""
+        # ffmpeg.Error is not picklable across the process pool boundary
+        raise RuntimeError(f"ffmpeg failed for {what}: {stderr}") from None
+
+
+def _describe(rendition, media_info):
+    has_audio = media_info["has_audio"]
+    return {
+        "name": rendition["name"],
+        "width": scaled_width(media_info, rendition["height"]),
+        "height": rendition["height"],
+        "bandwidth": rendition["video_bitrate"] + (rendition["audio_bitrate"] if has_audio else 0),
+        "playlist": f"{rendition['name']}/index.m3u8",
+    }
+
+
+def transcode_rendition(source, output_dir, rendition, media_info, threads=1):
+    """Encode one HLS rendition into output_dir/<name>/ and return its description"""
+    rendition_dir = os.path.join(output_dir, rendition["name"])
+    os.makedirs(rendition_dir, exist_ok=True)
+    playlist_path = os.path.join(rendition_dir, "index.m3u8")
+
+    output_options = _video_encode_options(rendition, threads)
+    if media_info["has_audio"]:
+        output_options.update(_audio_encode_options(rendition))
+    else:
+        output_options["an"] = None
+    output_options.update(_hls_options(rendition_dir))
+
+    _run(ffmpeg.input(source).output(playlist_path, **output_options), rendition["name"])
+    return _describe(rendition, media_info)
+
+
+# ----------------------------------------------------------------------------
+# Segment-parallel transcoding (long inputs)
+#
+# The source is stream-copied into chunks that start on its own keyframes, the
+# video of every chunk is encoded as an independent pool task, and the encoded
+# chunks are joined with the concat demuxer (stream copy, no re-encode). Audio
+# is encoded once per rendition from the whole source, so there are no AAC
+# priming gaps at chunk boundaries and the output duration matches the source.
+# ----------------------------------------------------------------------------
+def split_into_chunks(source, chunk_dir, chunk_seconds):
+    """Stream-copy the video of source into ~chunk_seconds pieces cut at keyframes"""
+    os.makedirs(chunk_dir, exist_ok=True)
+    pattern = os.path.join(chunk_dir, "chunk_%05d.mkv")
+    _run(
+        ffmpeg.input(source).output(
+            pattern,
+            map="0:v:0",
+            c="copy",
+            f="segment",
+            segment_time=chunk_seconds,
+            # The segment muxer only cuts on keyframes, so every chunk decodes on its own
+            reset_timestamps=1,
+        ),
+        "split",
+    )
+    return sorted(
+        os.path.join(chunk_dir, name) for name in os.listdir(chunk_dir) if name.startswith("chunk_")
+    )
+
+
+def encode_video_chunk(chunk_path, output_path, rendition, threads=1):
+    """Encode the video of one chunk (no audio) for later concatenation"""
+    output_options = _video_encode_options(rendition, threads)
+    output_options["an"] = None
+    _run(ffmpeg.input(chunk_path).output(output_path, **output_options), f"{rendition['name']} {os.path.basename(chunk_path)}")
+    return output_path
+
+
+def encode_audio(source, output_path, rendition):
+    """Encode the whole audio track once for a rendition"""
+    _run(
+        ffmpeg.input(source).output(output_path, map="0:a:0", vn=None, **_audio_encode_options(rendition)),
+        f"{rendition['name']} audio",
+    )
+    return output_path
+
+
+def package_chunks(encoded_chunks, audio_path, output_dir, rendition, media_info):
+    """Concatenate encoded chunks losslessly, mux the audio and write the HLS rendition"""
+    rendition_dir = os.path.join(output_dir, rendition["name"])
+    os.makedirs(rendition_dir, exist_ok=True)
+    playlist_path = os.path.join(rendition_dir, "index.m3u8")
+
+    list_path = os.path.join(os.path.dirname(encoded_chunks[0]), f"{rendition['name']}_concat.txt")
+    with open(list_path, "w") as f:
+        for chunk in encoded_chunks:
+            f.write(f"file '{chunk}'\n")
+
+    video = ffmpeg.input(list_path, f="concat", safe=0)
+    streams = [video["v"]]
+    if audio_path:
+        streams.append(ffmpeg.input(audio_path)["a"])
+
+    _run(
+        ffmpeg.output(*streams, playlist_path, c="copy", **_hls_options(rendition_dir)),
+        f"{rendition['name']} concat",
+    )
+    return _describe(rendition, media_info)
+
+
+def playlist_duration(playlist_path):
+    """Sum of the #EXTINF durations in a media playlist"""
+    total = 0.0
+    with open(playlist_path) as f:
+        for line in f:
+            if line.startswith("#EXTINF:"):
+                total += float(line[len("#EXTINF:"):].split(",", 1)[0])
+    return total
+
+
+# ----------------------------------------------------------------------------
+# Streaming ingestion
+#
+# The source is written to ffmpeg's stdin as it arrives from S3 and a single
+# ffmpeg decodes it once for every rendition (split filter), so download and
+# decode overlap and the source never touches the disk. Only containers that
+# can be demuxed front to back qualify.
+# ----------------------------------------------------------------------------
+MAX_BOXES_INSPECTED = 16
+
+
+def supports_sequential_read(read_range):
+    """Whether the container can be demuxed from a pipe.
+
+    read_range(offset, length) returns bytes of the source. Matroska/WebM,
+    MPEG-TS and FLV always qualify; MP4/MOV only when the moov box precedes
+    mdat ("faststart"), everything else needs random access.
+    """
+    header = read_range(0, 512)
+    if header.startswith(b"\x1a\x45\xdf\xa3") or header.startswith(b"FLV"):
+        return True
+    if len(header) > 376 and header[0] == header[188] == header[376] == 0x47:
+        return True  # MPEG-TS sync bytes
+    if header[4:8] != b"ftyp":
+        return False
+
+    offset = 0
+    for _ in range(MAX_BOXES_INSPECTED):
+        box = read_range(offset, 16)
+        if len(box) < 8:
+            return False
+        size, box_type = struct.unpack(">I4s", box[:8])
+        if box_type == b"moov":
+            return True
+        if box_type == b"mdat":
+            return False
+        if size == 1 and len(box) >= 16:
+            size = struct.unpack(">Q", box[8:16])[0]
+        if size < 8:
+            return False  # Box runs to end of file (size 0) or is malformed
+        offset += size
+    return False
+
+
+def start_stream_transcode(output_dir, ladder, media_info, threads=1, frames_output=None):
+    """Start one ffmpeg that reads the source from stdin and encodes the whole ladder.
+
+    frames_output(video_stream) may add an output on stdout (e.g. sampled
+    thumbnail frames). The caller writes stdin, reads stdout if used and
+    drains stderr. Returns (process, rendition descriptions).
+    """
+    source = ffmpeg.input("pipe:0")
+    branches = len(ladder) + (1 if frames_output else 0)
+    split = source.video.filter_multi_output("split", branches) if branches > 1 else None
+
+    def video_branch(i):
+        return split.stream(i) if split is not None else source.video
+
+    outputs = []
+    for i, rendition in enumerate(ladder):
+        rendition_dir = os.path.join(output_dir, rendition["name"])
+        os.makedirs(rendition_dir, exist_ok=True)
+        output_options = _video_encode_options(rendition, threads)
+        output_options.pop("vf")  # Scaling is part of the filter graph here
+        streams = [video_branch(i).filter("scale", -2, rendition["height"])]
+        if media_info["has_audio"]:
+            streams.append(source.audio)
+            output_options.update(_audio_encode_options(rendition))
+        output_options.update(_hls_options(rendition_dir))
+        outputs.append(ffmpeg.output(*streams, os.path.join(rendition_dir, "index.m3u8"), **output_options))
+    if frames_output:
+        outputs.append(frames_output(video_branch(len(ladder))))
+
+    process = (
+        ffmpeg.merge_outputs(*outputs)
+        .global_args("-loglevel", "error", "-nostats")
+        .overwrite_output()
+        .run_async(pipe_stdin=True, pipe_stdout=frames_output is not None, pipe_stderr=True)
+    )
+    return process, [_describe(rendition, media_info) for rendition in ladder]
+
+
+def build_master_playlist(renditions):
+    """Build the HLS master playlist referencing each rendition playlist"""
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for r in sorted(renditions, key=lambda r: r["bandwidth"]):
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={r['bandwidth']},RESOLUTION={r['width']}x{r['height']}")
+        lines.append(r["playlist"])
+    return "\n".join(lines) + "\n"
+
@@ -1,15 +1,33 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, status, Request
+from fastapi import FastAPI, HTTPException, status, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import ClientDisconnect
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+import asyncio
 import boto3
+import hashlib
 import os
 import uuid
+import base64
 import json
+import math
 import time
 import logging
 from datetime import datetime
-from prometheus_client import make_asgi_app, Counter, Histogram
+from email.utils import formatdate
+from typing import List, Optional
+from prometheus_client import make_asgi_app, Counter, Gauge, Histogram
+from botocore.config import Config
 from botocore.exceptions import ClientError, BotoCoreError
+from pydantic import BaseModel
+
+from metadata_codec import encode_metadata
 
 # Structured JSON Logging
 class JSONFormatter(logging.Formatter):
@@ -45,24 +63,34 @@ logging.getLogger("botocore").setLevel(logging.CRITICAL)
 
 app = FastAPI(title="Uploader Service")
 
-# CORS
+# Reject bodies that declare more than the upload limit before reading any of them
+class MaxUploadSizeMiddleware(BaseHTTPMiddleware):
+    """Middleware that enforces the 500MB upload limit from Content-Length"""
+    async def dispatch(self, request: Request, call_next):
+        content_length = request.headers.get("content-length", "")
+        limit = MAX_BATCH_REQUEST_BYTES if request.url.path == "/upload/batch" else MAX_REQUEST_BYTES
+        if content_length.isdigit() and int(content_length) > limit:
+            UPLOAD_ERRORS.labels(endpoint=request.url.path, status_code=413).inc()
+            log_with_context(logging.WARNING, f"Request rejected by Content-Length: {content_length} bytes", get_correlation_id(request), file_size=int(content_length))
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": f"Maximum request size is {limit // (1024*1024)}MB. Request size: {int(content_length) / (1024*1024):.2f}MB"}
+            )
+        return await call_next(request)
+
+app.add_middleware(MaxUploadSizeMiddleware)
+
+# CORS (outermost, so early rejections carry CORS headers too)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Resumable upload clients read these from responses
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Expires", "Tus-Resumable"],
 )
 
-# Task 1: Increase FastAPI/Uvicorn upload size limit
-class MaxUploadSizeMiddleware(BaseHTTPMiddleware):
-    """Middleware to increase upload size limit to 500MB"""
-    async def dispatch(self, request: Request, call_next):
-        request.scope["client_max_size"] = 1024 * 1024 * 500  # 500MB
-        return await call_next(request)
-
-app.add_middleware(MaxUploadSizeMiddleware)
-
 # Metrics
 metrics_app = make_asgi_app()
 app.mount("/metrics", metrics_app)
@@ -70,6 +98,17 @@ app.mount("/metrics", metrics_app)
 UPLOAD_COUNTER = Counter('video_uploads_total', 'Total number of video uploads')
 UPLOAD_LATENCY = Histogram('video_upload_latency_seconds', 'Latency of video uploads')
 UPLOAD_ERRORS = Counter('upload_api_errors_total', 'Total upload API errors', ['endpoint', 'status_code'])
+UPLOADS_BY_LANE = Counter('video_uploads_by_lane_total', 'Uploads routed to each processing lane', ['lane'])
+UPLOAD_THROUGHPUT = Histogram('video_upload_s3_throughput_mbps', 'S3 transfer throughput per upload (MB/s)', buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000])
+UPLOAD_S3_SECONDS = Histogram('video_upload_s3_seconds', 'Time spent transferring one upload to S3', buckets=[0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300])
+UPLOAD_BYTES = Counter('video_upload_bytes_total', 'Bytes transferred to S3 for uploaded videos')
+DIRECT_UPLOADS = Counter('video_direct_uploads_total', 'Direct-to-S3 multipart uploads by step', ['step'])
+RESUMABLE_UPLOADS = Counter('video_resumable_uploads_total', 'Resumable uploads by step', ['step'])
+RESUMABLE_PATCH_BYTES = Counter('video_resumable_patch_bytes_total', 'Bytes received by resumable upload PATCH requests', ['outcome'])
+OUTBOX_PENDING = Gauge('uploader_outbox_pending_events', 'Upload events in the outbox awaiting delivery')
+OUTBOX_DELIVERY_LAG = Histogram('uploader_outbox_delivery_lag_seconds', 'Time from an upload event entering the outbox to its SQS delivery', buckets=[0.05, 0.1, 0.25, 0.5, 1, 5, 30, 120, 600, 3600])
+OUTBOX_DELIVERY_FAILURES = Counter('uploader_outbox_delivery_failures_total', 'Upload event delivery attempts that failed and will be retried', ['step'])
+EXPIRED_UPLOADS_SWEPT = Counter('video_expired_uploads_swept_total', 'Abandoned uploads cleaned up', ['kind'])
 FILE_SIZE_HISTOGRAM = Histogram('upload_file_size_bytes', 'Distribution of uploaded file sizes', buckets=[1e6, 10e6, 50e6, 100e6, 250e6, 500e6])
 
 # AWS Clients - Real AWS (endpoint_url=None) or LocalStack (if AWS_ENDPOINT_URL is set)
@@ -85,11 +124,78 @@ sqs_client = boto3.client(
     endpoint_url=endpoint_url if endpoint_url else None
 )
 
+# Video transfers: /upload bodies are parsed as they arrive and every UPLOAD_PART_BYTES
+# of the file goes to S3 as a multipart part while the next one fills, up to
+# UPLOAD_CONCURRENCY parts in flight per upload. Nothing is spooled to disk; memory
+# per upload is bounded by (UPLOAD_CONCURRENCY + 1) * UPLOAD_PART_BYTES and is about
+# one part in practice, since clients send slower than S3 accepts. Parts use a
+# dedicated client whose pool covers UPLOAD_MAX_CONCURRENT uploads, so metadata
+# writes never queue behind video parts for a connection.
+UPLOAD_PART_BYTES = int(os.getenv("UPLOAD_PART_BYTES", str(8 * 1024 * 1024)))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "8"))
+transfer_client = boto3.client(
+    's3',
+    region_name=os.getenv("AWS_REGION", "us-east-1"),
+    endpoint_url=endpoint_url if endpoint_url else None,
+    config=Config(max_pool_connections=UPLOAD_CONCURRENCY * UPLOAD_MAX_CONCURRENT, retries={"max_attempts": 5, "mode": "standard"})
+)
+
 BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "video-analytics-uploads")
 QUEUE_URL = os.getenv("SQS_QUEUE_URL", "")
+# Priority lanes: small uploads go to the fast-lane queue (when configured) so the
+# processor can keep short clips moving while long videos are backlogged
+FAST_QUEUE_URL = os.getenv("SQS_FAST_QUEUE_URL", "")
+FAST_LANE_MAX_BYTES = int(os.getenv("FAST_LANE_MAX_BYTES", str(50 * 1024 * 1024)))  # 50MB
 
 # S3 supports large files, but we'll set a reasonable limit
 MAX_FILE_SIZE = 1024 * 1024 * 500  # 500MB
+MAX_REQUEST_BYTES = MAX_FILE_SIZE + 1024 * 1024  # Room for multipart framing and small form fields
+
+# Batch uploads: every file of a /upload/batch request is stored like an /upload,
+# with the S3 work of up to BATCH_UPLOAD_CONCURRENCY files overlapping
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "20"))
+MAX_BATCH_REQUEST_BYTES = int(os.getenv("MAX_BATCH_REQUEST_BYTES", str(2 * 1024 * 1024 * 1024)))  # 2GB
+BATCH_UPLOAD_CONCURRENCY = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "4"))
+SQS_BATCH_SIZE = 10  # SendMessageBatch maximum
+
+# Upload events (initial metadata + processing message) go through a durable local
+# outbox; see UploadOutbox. OUTBOX_DIR must survive container restarts. Each event is
+# also recorded under OUTBOX_PREFIX in S3 until delivered, and the upload sweeper
+# re-publishes records older than OUTBOX_RECOVERY_SECONDS (their pod and its
+# OUTBOX_DIR were lost before delivery).
+OUTBOX_DIR = os.getenv("OUTBOX_DIR", "/var/lib/uploader/outbox")
+OUTBOX_LINGER_SECONDS = float(os.getenv("OUTBOX_LINGER_SECONDS", "0.05"))
+OUTBOX_RETRY_SECONDS = float(os.getenv("OUTBOX_RETRY_SECONDS", "5"))
+OUTBOX_PREFIX = "outbox"
+OUTBOX_RECOVERY_SECONDS = float(os.getenv("OUTBOX_RECOVERY_SECONDS", "600"))
+
+# Leading bytes of the video containers we accept, checked before anything is
+# committed to S3: (offset, signature, container)
+CONTAINER_SIGNATURES = [
+    (4, b"ftyp", "mp4"),                               # MP4 / MOV / M4V
+    (4, b"moov", "mov"), (4, b"mdat", "mov"), (4, b"wide", "mov"), (4, b"free", "mov"), (4, b"skip", "mov"),  # Older QuickTime
+    (0, b"\x1a\x45\xdf\xa3", "matroska"),            # MKV / WebM (EBML)
+    (0, b"FLV\x01", "flv"),
+    (0, b"\x30\x26\xb2\x75\x8e\x66\xcf\x11", "asf"),  # WMV
+]
+CONTAINER_SNIFF_BYTES = 16
+
+# Direct uploads: clients PUT the parts of a multipart upload straight to S3 with
+# presigned URLs; the uploader only starts, signs and completes it. Pending uploads
+# are tracked as small JSON objects under PENDING_UPLOADS_PREFIX.
+DIRECT_PART_BYTES = int(os.getenv("DIRECT_UPLOAD_PART_BYTES", str(16 * 1024 * 1024)))
+DIRECT_URL_EXPIRATION = int(os.getenv("DIRECT_UPLOAD_URL_EXPIRATION", "3600"))  # 1 hour
+PENDING_UPLOADS_PREFIX = "uploads"
+S3_MAX_PARTS = 10000
+# Pending direct and resumable uploads expire UPLOAD_SESSION_TTL after creation; a
+# sweeper aborts abandoned multipart uploads (their parts are billed until then)
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))  # 24 hours
+UPLOAD_SWEEP_INTERVAL = int(os.getenv("UPLOAD_SWEEP_INTERVAL", "900"))  # 15 minutes
+TUS_VERSION = "1.0.0"
+# A PATCH holds its upload's lock object for this long between renewals; a replica
+# that dies mid-PATCH blocks the upload until the lease runs out
+RESUMABLE_LOCK_LEASE = int(os.getenv("RESUMABLE_LOCK_LEASE", "60"))
 
 # Allowed video file extensions (case-insensitive)
 ALLOWED_EXTENSIONS = {"mp4", "mov", "avi", "webm", "mkv", "flv", "wmv", "m4v"}
@@ -104,6 +210,14 @@ ALLOWED_CONTENT_TYPES = {
     "application/octet-stream"  # Some browsers send this for video files
 }
 
+class InitiateUploadRequest(BaseModel):
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+
+class PartUrlsRequest(BaseModel):
+    part_numbers: Optional[List[int]] = None  # Defaults to every part
+
 # Helper functions
 def get_correlation_id(request: Request) -> str:
     """Extract correlation ID from request headers or generate new one"""
@@ -127,6 +241,22 @@ def validate_file_type(filename: str, content_type: str) -> tuple:
     
     return True, ""
 
+def sniff_container(head: bytes):
+    """Video container of a file from its first CONTAINER_SNIFF_BYTES, or None if unrecognised"""
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    for offset, signature, container in CONTAINER_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return container
+    return None
+
+def select_lane(file_size: int) -> tuple:
+    """Pick the processing lane (name, queue URL) for an upload of file_size bytes"""
+    # Unknown sizes (0) take the standard lane: they may well be large
+    if FAST_QUEUE_URL and 0 < file_size <= FAST_LANE_MAX_BYTES:
+        return "fast", FAST_QUEUE_URL
+    return "standard", QUEUE_URL
+
 def log_with_context(level, message, correlation_id=None, video_id=None, filename=None, file_size=None):
     """Log with contextual information"""
     record = logging.LogRecord(
@@ -148,155 +278,573 @@ def log_with_context(level, message, correlation_id=None, video_id=None, filenam
         record.file_size = file_size
     logger.handle(record)
 
+async def iter_multipart_files(request: Request, field_name: str):
+    """Incrementally parse a multipart/form-data body, yielding the files of field_name.
+
+    Yields ("begin", filename, content_type), then ("data", bytes) as the file
+    arrives, then ("end",). Other fields are skipped. Nothing is buffered beyond
+    the network chunk being parsed. Raises ValueError for a body that is not
+    multipart/form-data or that ends before its closing boundary.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise ValueError("Expected a multipart/form-data body")
+
+    events = []
+    headers = {}
+    header_field = bytearray()
+    header_value = bytearray()
+    in_file = False
+    ended = False
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        nonlocal in_file
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        in_file = b"filename" in options and options.get(b"name", b"").decode("utf-8", "replace") == field_name
+        if in_file:
+            part_type = headers.get(b"content-type", b"").decode("latin-1") or None
+            events.append(("begin", options[b"filename"].decode("utf-8", "replace"), part_type))
+
+    def on_part_data(data, start, end):
+        if in_file:
+            events.append(("data", data[start:end]))
+
+    def on_part_end():
+        nonlocal in_file
+        if in_file:
+            events.append(("end",))
+        in_file = False
+
+    def on_end():
+        nonlocal ended
+        ended = True
+
+    parser = MultipartParser(params[b"boundary"], callbacks={
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_end": on_end,
+    })
+    async for chunk in request.stream():
+        if chunk:
+            parser.write(chunk)
+        for event in events:
+            yield event
+        events.clear()
+    parser.finalize()
+    for event in events:
+        yield event
+    if not ended:
+        # A truncated body: the last file it began is incomplete
+        raise ValueError("Multipart body ended before its closing boundary")
+
+class StreamingVideoUpload:
+    """A video written to S3 while it is still being received.
+
+    write() hashes and buffers the bytes; flush() sends every full UPLOAD_PART_BYTES
+    as a multipart part in the background, waiting for the oldest part once
+    UPLOAD_CONCURRENCY are in flight (which also pushes back on the client).
+    Videos no larger than one part go up with a single put_object on complete().
+    """
+    def __init__(self, s3_video_key, content_type):
+        self.s3_video_key = s3_video_key
+        self.content_type = content_type
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._part_count = 0
+        self._in_flight = []
+        self._parts = []
+        self._started = time.perf_counter()
+
+    def write(self, data):
+        self._sha256.update(data)
+        self.size += len(data)
+        self._buffer += data
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def head(self):
+        """First bytes of the video; complete until the first part has been sent"""
+        return bytes(self._buffer[:CONTAINER_SNIFF_BYTES])
+
+    async def flush(self):
+        while len(self._buffer) >= UPLOAD_PART_BYTES:
+            data = bytes(self._buffer[:UPLOAD_PART_BYTES])
+            del self._buffer[:UPLOAD_PART_BYTES]
+            await self._send_part(data)
+
+    async def _send_part(self, data):
+        if self._upload_id is None:
+            response = await asyncio.to_thread(
+                transfer_client.create_multipart_upload, Bucket=BUCKET_NAME, Key=self.s3_video_key, ContentType=self.content_type
+            )
+            self._upload_id = response["UploadId"]
+        if len(self._in_flight) >= UPLOAD_CONCURRENCY:
+            await self._in_flight.pop(0)
+        self._part_count += 1
+        self._in_flight.append(asyncio.create_task(self._upload_part(self._part_count, data)))
+
+    async def _upload_part(self, number, data):
+        response = await asyncio.to_thread(
+            transfer_client.upload_part,
+            Bucket=BUCKET_NAME, Key=self.s3_video_key, UploadId=self._upload_id, PartNumber=number, Body=data
+        )
+        self._parts.append({"PartNumber": number, "ETag": response["ETag"]})
+
+    async def complete(self):
+        if self._upload_id is None:
+            await asyncio.to_thread(
+                transfer_client.put_object,
+                Bucket=BUCKET_NAME, Key=self.s3_video_key, Body=bytes(self._buffer), ContentType=self.content_type
+            )
+        else:
+            if self._buffer:
+                await self._send_part(bytes(self._buffer))
+            await asyncio.gather(*self._in_flight)
+            await asyncio.to_thread(
+                transfer_client.complete_multipart_upload,
+                Bucket=BUCKET_NAME, Key=self.s3_video_key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": sorted(self._parts, key=lambda p: p["PartNumber"])}
+            )
+        self._buffer = bytearray()
+        elapsed = time.perf_counter() - self._started
+        UPLOAD_S3_SECONDS.observe(elapsed)
+        UPLOAD_BYTES.inc(self.size)
+        if elapsed > 0:
+            UPLOAD_THROUGHPUT.observe(self.size / elapsed / (1024 * 1024))
+
+    async def abort(self):
+        """Discard whatever was sent; never raises"""
+        # Parts still uploading would outlive an abort, so let them finish first
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+        self._buffer = bytearray()
+        if self._upload_id is not None:
+            try:
+                await asyncio.to_thread(
+                    transfer_client.abort_multipart_upload, Bucket=BUCKET_NAME, Key=self.s3_video_key, UploadId=self._upload_id
+                )
+            except Exception as e:
+                # Left for the expired upload sweeper
+                log_with_context(logging.WARNING, f"Failed to abort multipart upload of {self.s3_video_key}: {str(e)}")
+
+def upload_records(file_id, filename, file_extension, content_type, file_size, s3_video_key, content_hash):
+    """Initial metadata and processing message of a stored video: (metadata_key, metadata, lane, queue_url, message)"""
+    metadata = {
+        "video_id": file_id,
+        "status": "UPLOADED",
+        "filename": filename,
+        "file_extension": file_extension,
+        "content_type": content_type,
+        "size": file_size,
+        "s3_bucket": BUCKET_NAME,
+        "s3_key": s3_video_key,
+        "content_hash": content_hash,
+        "timestamp": int(time.time()),
+        "runtime": 0,  # Will be updated by processor
+        "views": 0,
+        "likes": 0,
+        "engagement": 0
+    }
+    
+    metadata_key = f"metadata/{file_id}.json"
+    
+    # Processing goes to the lane matching the upload size
+    lane, queue_url = select_lane(file_size)
+    message = {
+        "video_id": file_id,
+        "s3_bucket": BUCKET_NAME,
+        "s3_video_key": s3_video_key,
+        "s3_metadata_key": metadata_key,
+        "original_filename": filename,
+        "content_hash": content_hash,
+        "lane": lane
+    }
+    return metadata_key, metadata, lane, queue_url, message
+
+def store_upload_metadata(metadata_key, metadata):
+    """Create the initial metadata object; True once it exists.
+
+    Conditional on the object not existing yet, so a redelivered event never
+    overwrites metadata the processor has already updated.
+    """
+    body, content_type = encode_metadata(metadata)
+    try:
+        s3_client.put_object(
+            Bucket=BUCKET_NAME,
+            Key=metadata_key,
+            Body=body,
+            ContentType=content_type,
+            IfNoneMatch='*'
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "PreconditionFailed":
+            raise
+    return True
+
+async def deliver_upload_events(events):
+    """Write metadata, then send processing messages SQS_BATCH_SIZE at a time per lane.
+
+    events are outbox records; returns those that could not be delivered. A
+    message is only sent once its metadata object exists.
+    """
+    async def store(event):
+        try:
+            return await asyncio.to_thread(store_upload_metadata, event["metadata_key"], event["metadata"])
+        except (ClientError, BotoCoreError) as e:
+            OUTBOX_DELIVERY_FAILURES.labels(step="metadata").inc()
+            log_with_context(logging.ERROR, f"S3 metadata upload failed: {str(e)}", event.get("correlation_id"), event["message"]["video_id"])
+            return False
+
+    stored = await asyncio.gather(*(store(event) for event in events))
+    by_queue = {}
+    for event, ok in zip(events, stored):
+        if ok:
+            by_queue.setdefault((event["lane"], event["queue_url"]), []).append(event)
+
+    delivered = set()
+    for (lane, queue_url), lane_events in by_queue.items():
+        for i in range(0, len(lane_events), SQS_BATCH_SIZE):
+            batch = lane_events[i:i + SQS_BATCH_SIZE]
+            try:
+                response = await asyncio.to_thread(
+                    sqs_client.send_message_batch,
+                    QueueUrl=queue_url,
+                    Entries=[{"Id": str(n), "MessageBody": json.dumps(event["message"])} for n, event in enumerate(batch)]
+                )
+            except Exception as e:
+                OUTBOX_DELIVERY_FAILURES.labels(step="sqs").inc(len(batch))
+                log_with_context(logging.ERROR, f"Failed to send SQS message batch: {str(e)}")
+                continue
+            for entry in response.get("Failed", []):
+                event = batch[int(entry["Id"])]
+                OUTBOX_DELIVERY_FAILURES.labels(step="sqs").inc()
+                log_with_context(logging.ERROR, f"Failed to send SQS message: {entry.get('Code')} {entry.get('Message')}", event.get("correlation_id"), event["message"]["video_id"])
+            now = time.time()
+            for entry in response.get("Successful", []):
+                event = batch[int(entry["Id"])]
+                delivered.add(id(event))
+                UPLOADS_BY_LANE.labels(lane=lane).inc()
+                OUTBOX_DELIVERY_LAG.observe(now - event["enqueued_at"])
+                log_with_context(logging.INFO, f"SQS message sent for processing ({lane} lane)", event.get("correlation_id"), event["message"]["video_id"])
+    return [event for event in events if id(event) not in delivered]
+
+def outbox_record_key(event):
+    return f"{OUTBOX_PREFIX}/{event['message']['video_id']}.json"
+
+def put_outbox_record(event):
+    s3_client.put_object(
+        Bucket=BUCKET_NAME, Key=outbox_record_key(event), Body=json.dumps(event), ContentType="application/json"
+    )
+
+def delete_outbox_records(events):
+    keys = [{"Key": outbox_record_key(event)} for event in events]
+    for i in range(0, len(keys), 1000):  # DeleteObjects maximum
+        s3_client.delete_objects(Bucket=BUCKET_NAME, Delete={"Objects": keys[i:i + 1000], "Quiet": True})
+
+def load_stale_outbox_records():
+    """Outbox records in S3 older than OUTBOX_RECOVERY_SECONDS, i.e. not delivered by the pod that wrote them"""
+    cutoff = time.time() - OUTBOX_RECOVERY_SECONDS
+    events = []
+    for page in s3_client.get_paginator("list_objects_v2").paginate(Bucket=BUCKET_NAME, Prefix=f"{OUTBOX_PREFIX}/"):
+        for obj in page.get("Contents", []):
+            if obj["LastModified"].timestamp() >= cutoff:
+                continue
+            try:
+                response = s3_client.get_object(Bucket=BUCKET_NAME, Key=obj["Key"])
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                    continue  # Delivered and removed since the listing
+                raise
+            events.append(json.loads(response["Body"].read()))
+    return events
+
+class UploadOutbox:
+    """Durable, append-only log of upload events awaiting delivery.
+
+    append() writes and fsyncs events to the active segment file, so a stored
+    upload is never lost once its request has been answered. The flusher seals the
+    active segment (new appends go to a fresh one), delivers every sealed segment
+    in batches and deletes it; undelivered events are carried over into the active
+    segment and retried. Each event also has an S3 record (removed once delivered)
+    from which recover_outbox_records() re-publishes it if this pod's directory is
+    lost. Delivery is at-least-once.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = asyncio.Lock()
+        self._file = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._pending = 0
+
+    def _write(self, lines):
+        if self._file is None:
+            self._file = open(os.path.join(self.directory, f"{time.time_ns():020d}.log"), "ab")
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _seal(self):
+        """Close the active segment; returns every sealed segment, oldest first"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".log"))
+
+    @staticmethod
+    def _read(path):
+        events = []
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Torn final write of a crashed process: its request was never answered
+                    log_with_context(logging.WARNING, f"Skipping unreadable outbox record in {path}")
+        return events
+
+    async def append(self, events):
+        lines = [json.dumps(event).encode() + b"\n" for event in events]
+        recorded = asyncio.gather(*(asyncio.to_thread(put_outbox_record, event) for event in events), return_exceptions=True)
+        async with self._lock:
+            await asyncio.to_thread(self._write, lines)
+        for event, error in zip(events, await recorded):
+            if isinstance(error, Exception):
+                # The local segment still holds the event; only recovery after losing the pod is missed
+                OUTBOX_DELIVERY_FAILURES.labels(step="record").inc()
+                log_with_context(logging.WARNING, f"Failed to record upload event in S3: {str(error)}", event.get("correlation_id"), event["message"]["video_id"])
+        self._pending += len(events)
+        OUTBOX_PENDING.set(self._pending)
+        self._wakeup.set()
+
+    async def flush(self):
+        async with self._lock:
+            segments = await asyncio.to_thread(self._seal)
+        for path in segments:
+            events = await asyncio.to_thread(self._read, path)
+            undelivered = await deliver_upload_events(events) if events else []
+            await forget_outbox_records([event for event in events if event not in undelivered])
+            if undelivered:
+                async with self._lock:
+                    await asyncio.to_thread(self._write, [json.dumps(event).encode() + b"\n" for event in undelivered])
+            await asyncio.to_thread(os.unlink, path)
+            self._pending -= len(events) - len(undelivered)
+            OUTBOX_PENDING.set(self._pending)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_RETRY_SECONDS)
+            except asyncio.TimeoutError:
+                if not self._pending:
+                    continue
+            self._wakeup.clear()
+            # Let concurrent uploads join the batch
+            await asyncio.sleep(OUTBOX_LINGER_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                log_with_context(logging.ERROR, f"Outbox flush failed: {str(e)}")
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # Events left by a previous process are delivered first
+        recovered = await asyncio.to_thread(lambda: sum(len(self._read(path)) for path in self._seal()))
+        self._pending = recovered
+        OUTBOX_PENDING.set(recovered)
+        if recovered:
+            log_with_context(logging.INFO, f"Recovered {recovered} undelivered upload events from the outbox")
+            self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        try:
+            await self.flush()  # Last attempt; whatever is left stays on disk
+        except Exception as e:
+            log_with_context(logging.ERROR, f"Final outbox flush failed: {str(e)}")
+
+upload_outbox = UploadOutbox(OUTBOX_DIR)
+
+async def forget_outbox_records(events):
+    """Remove the S3 records of delivered events; a leftover record only causes a duplicate delivery"""
+    if not events:
+        return
+    try:
+        await asyncio.to_thread(delete_outbox_records, events)
+    except (ClientError, BotoCoreError) as e:
+        log_with_context(logging.WARNING, f"Failed to remove {len(events)} outbox record(s) from S3: {str(e)}")
+
+async def recover_outbox_records():
+    """Re-publish upload events whose pod was lost before delivering them"""
+    events = await asyncio.to_thread(load_stale_outbox_records)
+    if not events:
+        return
+    log_with_context(logging.WARNING, f"Re-publishing {len(events)} upload event(s) left in the S3 outbox")
+    undelivered = await deliver_upload_events(events)
+    await forget_outbox_records([event for event in events if event not in undelivered])
+
+async def register_uploads(uploads, correlation_id):
+    """Record stored videos in the outbox: their initial metadata and processing jobs
+    are delivered in the background. uploads are register_upload argument tuples
+    (without correlation_id).
+    
+    Returns once the events are durable; delivery failures are retried, never dropped.
+    """
+    events = []
+    for upload in uploads:
+        metadata_key, metadata, lane, queue_url, message = upload_records(*upload)
+        events.append({
+            "metadata_key": metadata_key,
+            "metadata": metadata,
+            "lane": lane,
+            "queue_url": queue_url,
+            "message": message,
+            "correlation_id": correlation_id,
+            "enqueued_at": time.time(),
+        })
+    await upload_outbox.append(events)
+    log_with_context(logging.INFO, f"{len(events)} upload event(s) recorded for processing", correlation_id, uploads[0][0] if len(uploads) == 1 else None)
+
+async def register_upload(file_id, filename, file_extension, content_type, file_size, s3_video_key, content_hash, correlation_id):
+    """Write the initial metadata for a stored video and enqueue its processing job (via the outbox)"""
+    await register_uploads([(file_id, filename, file_extension, content_type, file_size, s3_video_key, content_hash)], correlation_id)
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
 @app.post("/upload")
-async def upload_video(file: UploadFile = File(...), request: Request = None):
+async def upload_video(request: Request):
     """
     Upload video file to S3 and metadata to S3.
     Videos stored in S3, metadata stored as JSON in S3.
-    Uses streaming upload (no memory buffering).
+    The multipart body is parsed as it arrives and streamed to S3 in parts
+    (nothing is spooled to disk); the size limit is enforced on the fly.
     Validates file type and size.
     """
     start_time = time.perf_counter()
-    correlation_id = get_correlation_id(request) if request else str(uuid.uuid4())
+    correlation_id = get_correlation_id(request)
     endpoint = "/upload"
     file_id = None
-    s3_video_key = None
+    filename = None
+    video = None
+    video_complete = False
+    sniffed = False
+    stored = False
     
     try:
-        # Validate file type
-        is_valid, error_msg = validate_file_type(file.filename, file.content_type)
-        if not is_valid:
-            log_with_context(logging.WARNING, f"File type validation failed: {error_msg}", correlation_id, filename=file.filename)
-            UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=error_msg
-            )
-        
-        # Get file size for validation and logging
-        file_size = 0
-        try:
-            if hasattr(file, 'size') and file.size:
-                file_size = file.size
-            elif hasattr(file.file, 'seek') and hasattr(file.file, 'tell'):
-                current_pos = file.file.tell()
-                file.file.seek(0, 2)  # Seek to end
-                file_size = file.file.tell()
-                file.file.seek(current_pos)  # Reset to original position
-            else:
-                file_size = getattr(file.file, 'spool_max_size', 0)
-        except Exception as e:
-            log_with_context(logging.WARNING, f"Could not determine file size: {str(e)}", correlation_id, filename=file.filename)
-            file_size = 0
-        
-        # File size validation (500MB limit)
-        if file_size > MAX_FILE_SIZE:
-            log_with_context(logging.WARNING, f"File exceeds 500MB limit: {file_size} bytes", correlation_id, filename=file.filename, file_size=file_size)
-            UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=413).inc()
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"Maximum file size is 500MB. File size: {file_size / (1024*1024):.2f}MB"
-            )
-        
-        file_id = str(uuid.uuid4())
-        file_extension = file.filename.split(".")[-1].lower() if "." in file.filename else "mp4"
-        s3_video_key = f"videos/{file_id}.{file_extension}"
-        
-        log_with_context(logging.INFO, "Upload started", correlation_id, file_id, file.filename, file_size)
-        FILE_SIZE_HISTOGRAM.observe(file_size)
-        
-        # Store video file in S3 (streaming upload - no memory buffering)
         with UPLOAD_LATENCY.time():
             try:
-                # Reset file pointer to beginning for streaming
-                file.file.seek(0)
-                s3_client.upload_fileobj(
-                    file.file,  # File-like object that streams
-                    BUCKET_NAME,
-                    s3_video_key,
-                    ExtraArgs={
-                        "ContentType": file.content_type or "video/mp4"
-                    }
+                async for event in iter_multipart_files(request, "file"):
+                    if event[0] == "begin":
+                        if video is not None:
+                            continue  # Only the first file is stored
+                        _, filename, content_type = event
+                        # Validate file type
+                        is_valid, error_msg = validate_file_type(filename, content_type)
+                        if not is_valid:
+                            log_with_context(logging.WARNING, f"File type validation failed: {error_msg}", correlation_id, filename=filename)
+                            UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+                            raise HTTPException(
+                                status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=error_msg
+                            )
+                        file_id = str(uuid.uuid4())
+                        file_extension = filename.split(".")[-1].lower() if "." in filename else "mp4"
+                        s3_video_key = f"videos/{file_id}.{file_extension}"
+                        video = StreamingVideoUpload(s3_video_key, content_type or "video/mp4")
+                        log_with_context(logging.INFO, "Upload started", correlation_id, file_id, filename)
+                    elif event[0] == "data" and video is not None and not video_complete:
+                        video.write(event[1])
+                        # File size validation (500MB limit), before any more of the body is read
+                        if video.size > MAX_FILE_SIZE:
+                            log_with_context(logging.WARNING, f"File exceeds 500MB limit: over {video.size} bytes received", correlation_id, file_id, filename, video.size)
+                            UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=413).inc()
+                            raise HTTPException(
+                                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                detail=f"Maximum file size is 500MB. Received over {video.size / (1024*1024):.2f}MB"
+                            )
+                    elif event[0] == "end" and video is not None:
+                        video_complete = True
+                    else:
+                        continue
+                    # Content check on the first bytes, before anything is committed to S3
+                    if not sniffed and (video.size >= CONTAINER_SNIFF_BYTES or video_complete):
+                        sniffed = True
+                        if sniff_container(video.head()) is None:
+                            log_with_context(logging.WARNING, "Content is not a recognised video container", correlation_id, file_id, filename)
+                            UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+                            raise HTTPException(
+                                status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="File content is not a supported video container"
+                            )
+                    await video.flush()
+                if video is None:
+                    UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No file provided in the 'file' field")
+                await video.complete()
+                stored = True
+                content_hash, file_size = video.hexdigest(), video.size
+                FILE_SIZE_HISTOGRAM.observe(file_size)
+                log_with_context(logging.INFO, f"Video stored in S3: s3://{BUCKET_NAME}/{s3_video_key} sha256={content_hash}", correlation_id, file_id, filename, file_size)
+            except (ValueError, MultipartParseError) as e:
+                log_with_context(logging.WARNING, f"Malformed upload body: {str(e)}", correlation_id, file_id, filename)
+                UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Expected a multipart/form-data body with a 'file' field"
                 )
-                log_with_context(logging.INFO, f"Video stored in S3: s3://{BUCKET_NAME}/{s3_video_key}", correlation_id, file_id, file.filename, file_size)
+            except ClientDisconnect:
+                log_with_context(logging.WARNING, "Client disconnected during upload", correlation_id, file_id, filename)
+                UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Upload interrupted")
             except ClientError as e:
-                log_with_context(logging.ERROR, f"S3 video upload failed: {str(e)}", correlation_id, file_id, file.filename)
+                log_with_context(logging.ERROR, f"S3 video upload failed: {str(e)}", correlation_id, file_id, filename)
                 UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=500).inc()
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Upload failed. Please try again."
                 )
             except BotoCoreError as e:
-                log_with_context(logging.ERROR, f"BotoCore error during upload: {str(e)}", correlation_id, file_id, file.filename)
+                log_with_context(logging.ERROR, f"BotoCore error during upload: {str(e)}", correlation_id, file_id, filename)
                 UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=500).inc()
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Upload failed. Please try again."
                 )
         
-        # Store metadata in S3
-        timestamp = int(time.time())
-        metadata = {
-            "video_id": file_id,
-            "filename": file.filename,
-            "original_filename": file.filename,  # Keep for backward compatibility
-            "file_extension": file_extension,
-            "content_type": file.content_type or 'video/mp4',
-            "size": file_size,
-            "file_size": file_size,  # Keep for backward compatibility
-            "s3_bucket": BUCKET_NAME,
-            "s3_key": s3_video_key,
-            "s3_video_key": s3_video_key,  # Keep for backward compatibility
-            "processed_url": f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_video_key}",
-            "timestamp": timestamp,
-            "upload_timestamp": timestamp,  # Keep for backward compatibility
-            "runtime": 0,  # Will be updated by processor
-            "status": "UPLOADED",
-            "views": 0,
-            "likes": 0,
-            "engagement": 0
-        }
-        
-        metadata_key = f"metadata/{file_id}.json"
-        
-        try:
-            s3_client.put_object(
-                Bucket=BUCKET_NAME,
-                Key=metadata_key,
-                Body=json.dumps(metadata, indent=2),
-                ContentType='application/json'
-            )
-            log_with_context(logging.INFO, f"Metadata stored in S3: s3://{BUCKET_NAME}/{metadata_key}", correlation_id, file_id)
-        except ClientError as e:
-            log_with_context(logging.ERROR, f"S3 metadata upload failed: {str(e)}", correlation_id, file_id)
-            # Video is already in S3, so we log but don't fail
-        
-        # Send SQS message for processing
-        message = {
-            "video_id": file_id,
-            "s3_bucket": BUCKET_NAME,
-            "s3_video_key": s3_video_key,
-            "s3_metadata_key": metadata_key,
-            "original_filename": file.filename
-        }
-        
-        try:
-            sqs_client.send_message(
-                QueueUrl=QUEUE_URL,
-                MessageBody=json.dumps(message)
-            )
-            log_with_context(logging.INFO, "SQS message sent for processing", correlation_id, file_id)
-        except Exception as e:
-            log_with_context(logging.ERROR, f"Failed to send SQS message: {str(e)}", correlation_id, file_id)
-            # Video and metadata are already stored, so we log but don't fail
+        await register_upload(
+            file_id, filename, file_extension, video.content_type,
+            file_size, s3_video_key, content_hash, correlation_id
+        )
         
         UPLOAD_COUNTER.inc()
         duration = time.perf_counter() - start_time
-        log_with_context(logging.INFO, f"Upload complete: duration={duration:.2f}s", correlation_id, file_id, file.filename, file_size)
+        log_with_context(logging.INFO, f"Upload complete: duration={duration:.2f}s", correlation_id, file_id, filename, file_size)
         
         return {
             "status": "success",
@@ -313,13 +861,875 @@ async def upload_video(file: UploadFile = File(...), request: Request = None):
         duration = time.perf_counter() - start_time
         UPLOAD_LATENCY.observe(duration)
         UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=500).inc()
-        log_with_context(logging.ERROR, f"Unexpected error: {str(e)}", correlation_id, file_id, file.filename)
+        log_with_context(logging.ERROR, f"Unexpected error: {str(e)}", correlation_id, file_id, filename)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Upload failed. Please try again."
         )
     finally:
+        if video is not None and not stored:
+            await video.abort()
         # Always track latency
         duration = time.perf_counter() - start_time
         UPLOAD_LATENCY.observe(duration)
 
+
+@app.post("/upload/batch")
+async def upload_batch(request: Request):
+    """
+    Upload several videos in one multipart request (field "files").
+    Files are validated and streamed to S3 as they arrive; a file's final part and
+    completion overlap with receiving the next files, up to BATCH_UPLOAD_CONCURRENCY
+    files at a time. Metadata and SQS messages are written in batches once the
+    body is done. Returns a result per file, in request order; a rejected file does
+    not fail the others.
+    """
+    start_time = time.perf_counter()
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/batch"
+    results = []
+    slots = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    finishing = []
+    completed = []  # (result, video, file_extension) of every fully received file
+    current = None  # [result, video, sniffed] of the file being received
+    received = 0
+
+    def reject(result, status_code, detail):
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=status_code).inc()
+        log_with_context(logging.WARNING, f"Batch file rejected: {detail}", correlation_id, result.get("video_id"), result["filename"])
+        result.update(status="error", error=detail)
+        result.pop("video_id", None)
+
+    async def drop(entry):
+        result, video, _ = entry
+        if video is not None:
+            await video.abort()
+            slots.release()
+        entry[1] = None
+
+    async def finish(result, video):
+        # Runs as a background task: any failure is this file's result, never the batch's
+        try:
+            await video.complete()
+            result.update(status="success", size=video.size)
+        except Exception as e:
+            log_with_context(logging.ERROR, f"S3 video upload failed: {type(e).__name__}: {str(e)}", correlation_id, result["video_id"], result["filename"])
+            await video.abort()
+            reject(result, 500, "Upload failed. Please try again.")
+        finally:
+            slots.release()
+
+    try:
+        try:
+            async for event in iter_multipart_files(request, "files"):
+                if event[0] == "begin":
+                    _, filename, content_type = event
+                    result = {"filename": filename}
+                    results.append(result)
+                    current = [result, None, False]
+                    if len(results) > MAX_BATCH_FILES:
+                        reject(result, 400, f"Maximum {MAX_BATCH_FILES} files per batch")
+                        continue
+                    is_valid, error_msg = validate_file_type(filename, content_type)
+                    if not is_valid:
+                        reject(result, 400, error_msg)
+                        continue
+                    await slots.acquire()
+                    result["video_id"] = file_id = str(uuid.uuid4())
+                    file_extension = filename.split(".")[-1].lower() if "." in filename else "mp4"
+                    current[1] = StreamingVideoUpload(f"videos/{file_id}.{file_extension}", content_type or "video/mp4")
+                    continue
+
+                result, video, sniffed = current
+                if video is None:
+                    continue  # Rejected file: its bytes are skipped
+                if event[0] == "data":
+                    video.write(event[1])
+                    received += len(event[1])
+                    if received > MAX_BATCH_REQUEST_BYTES:
+                        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=413).inc()
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Maximum batch size is {MAX_BATCH_REQUEST_BYTES // (1024*1024)}MB"
+                        )
+                    if video.size > MAX_FILE_SIZE:
+                        await drop(current)
+                        reject(result, 413, f"Maximum file size is 500MB. Received over {video.size / (1024*1024):.2f}MB")
+                        continue
+                if not sniffed and (video.size >= CONTAINER_SNIFF_BYTES or event[0] == "end"):
+                    current[2] = True
+                    if sniff_container(video.head()) is None:
+                        await drop(current)
+                        reject(result, 400, "File content is not a supported video container")
+                        continue
+                if event[0] == "end":
+                    # Final part and completion run while the next file is received
+                    finishing.append(asyncio.create_task(finish(result, video)))
+                    completed.append((result, video, video.s3_video_key.rsplit(".", 1)[-1]))
+                    current[1] = None
+                else:
+                    try:
+                        await video.flush()
+                    except (ClientError, BotoCoreError) as e:
+                        # This file's failure only: the rest of its bytes are skipped
+                        log_with_context(logging.ERROR, f"S3 video upload failed: {type(e).__name__}: {str(e)}", correlation_id, result["video_id"], result["filename"])
+                        await drop(current)
+                        reject(result, 500, "Upload failed. Please try again.")
+        except (ValueError, MultipartParseError, ClientDisconnect) as e:
+            log_with_context(logging.WARNING, f"Batch upload failed: {type(e).__name__}: {str(e)}", correlation_id)
+            UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Expected a complete multipart/form-data body with 'files' fields"
+            )
+        await asyncio.gather(*finishing)
+        if not results:
+            UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files provided in the 'files' field")
+
+        stored = [(result, video, file_extension) for result, video, file_extension in completed if result["status"] == "success"]
+        await register_uploads([
+            (result["video_id"], result["filename"], file_extension, video.content_type, video.size, video.s3_video_key, video.hexdigest())
+            for result, video, file_extension in stored
+        ], correlation_id)
+    except BaseException:
+        # Whatever failed (or cancelled the request), stored files are not registered,
+        # so nothing would ever process them; remove them
+        if current is not None:
+            await drop(current)
+        await asyncio.gather(*finishing, return_exceptions=True)
+        await asyncio.gather(*(
+            asyncio.to_thread(s3_client.delete_object, Bucket=BUCKET_NAME, Key=video.s3_video_key)
+            for result, video, _ in completed if result.get("status") == "success"
+        ), return_exceptions=True)
+        raise
+    for result, video, _ in stored:
+        FILE_SIZE_HISTOGRAM.observe(video.size)
+        UPLOAD_COUNTER.inc()
+
+    duration = time.perf_counter() - start_time
+    UPLOAD_LATENCY.observe(duration)
+    log_with_context(logging.INFO, f"Batch upload complete: stored={len(stored)}/{len(results)} duration={duration:.2f}s", correlation_id)
+    return {
+        "status": "success" if len(stored) == len(results) else "partial" if stored else "failed",
+        "uploaded": len(stored),
+        "failed": len(results) - len(stored),
+        "results": results
+    }
+
+# ============================================================================
+# Direct-to-S3 uploads
+#
+# initiate -> parts -> (client PUTs each part to S3) -> complete. Video bytes never
+# pass through the uploader. On complete the part sizes are read back from S3 (the
+# client's word is not trusted), the multipart upload is completed and the video is
+# registered exactly like a proxied upload. There is no server-side content hash
+# for these uploads, so upload-time dedup does not apply to them.
+# ============================================================================
+def pending_upload_key(video_id):
+    return f"{PENDING_UPLOADS_PREFIX}/{video_id}.json"
+
+def direct_part_size(file_size):
+    """Part size for a direct upload: DIRECT_PART_BYTES, grown to stay within S3's part limit"""
+    return max(DIRECT_PART_BYTES, math.ceil(file_size / S3_MAX_PARTS))
+
+def load_pending_upload(video_id):
+    """Session of a direct upload that has been initiated but not completed, or None"""
+    try:
+        uuid.UUID(video_id)
+    except ValueError:
+        return None
+    try:
+        response = s3_client.get_object(Bucket=BUCKET_NAME, Key=pending_upload_key(video_id))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+    session = json.loads(response["Body"].read())
+    if session.get("expires_at", float("inf")) < time.time():
+        return None  # Left for the sweeper
+    return session
+
+def uploaded_parts(session):
+    """Parts of a direct upload that are in S3, as (part number, etag, size), in order"""
+    parts = []
+    kwargs = {"Bucket": BUCKET_NAME, "Key": session["s3_video_key"], "UploadId": session["upload_id"]}
+    while True:
+        response = s3_client.list_parts(**kwargs)
+        parts.extend((p["PartNumber"], p["ETag"], p["Size"]) for p in response.get("Parts", []))
+        if not response.get("IsTruncated"):
+            return sorted(parts)
+        kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+
+def abort_direct_upload(session):
+    s3_client.abort_multipart_upload(Bucket=BUCKET_NAME, Key=session["s3_video_key"], UploadId=session["upload_id"])
+    s3_client.delete_object(Bucket=BUCKET_NAME, Key=pending_upload_key(session["video_id"]))
+    if session.get("protocol") == "tus":
+        s3_client.delete_object(Bucket=BUCKET_NAME, Key=tail_key(session["video_id"]))
+
+class InvalidContainer(Exception):
+    """The stored bytes of a direct upload are not a recognised video container"""
+
+async def finish_pending_upload(session, parts, correlation_id, check_container=False):
+    """Complete the multipart upload of a pending session and register the video like /upload does.
+
+    With check_container, the parts (which S3 will not serve before completion) are
+    sniffed right after completing and the object is deleted if they are not a video.
+    """
+    video_id = session["video_id"]
+    await asyncio.to_thread(
+        s3_client.complete_multipart_upload,
+        Bucket=BUCKET_NAME,
+        Key=session["s3_video_key"],
+        UploadId=session["upload_id"],
+        MultipartUpload={"Parts": [{"PartNumber": number, "ETag": etag} for number, etag, _ in parts]}
+    )
+    try:
+        await asyncio.to_thread(s3_client.delete_object, Bucket=BUCKET_NAME, Key=pending_upload_key(video_id))
+    except (ClientError, BotoCoreError) as e:
+        log_with_context(logging.WARNING, f"Failed to remove pending upload record: {str(e)}", correlation_id, video_id)
+    if check_container:
+        response = await asyncio.to_thread(
+            s3_client.get_object, Bucket=BUCKET_NAME, Key=session["s3_video_key"], Range=f"bytes=0-{CONTAINER_SNIFF_BYTES - 1}"
+        )
+        if sniff_container(response["Body"].read()) is None:
+            await asyncio.to_thread(s3_client.delete_object, Bucket=BUCKET_NAME, Key=session["s3_video_key"])
+            raise InvalidContainer(session["s3_video_key"])
+
+    file_size = sum(size for _, _, size in parts)
+    FILE_SIZE_HISTOGRAM.observe(file_size)
+    UPLOAD_BYTES.inc(file_size)
+    await register_upload(
+        video_id, session["filename"], session["file_extension"], session["content_type"],
+        file_size, session["s3_video_key"], None, correlation_id
+    )
+    UPLOAD_COUNTER.inc()
+
+async def get_pending_upload(video_id, endpoint, correlation_id):
+    session = await asyncio.to_thread(load_pending_upload, video_id)
+    if session is None or session.get("protocol") != "presigned":
+        log_with_context(logging.WARNING, "Unknown, expired or completed direct upload", correlation_id, video_id)
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=404).inc()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return session
+
+def direct_upload_failed(endpoint, e, correlation_id, video_id=None):
+    log_with_context(logging.ERROR, f"Direct upload S3 call failed: {str(e)}", correlation_id, video_id)
+    UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=500).inc()
+    return HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Upload failed. Please try again.")
+
+@app.post("/upload/initiate")
+async def initiate_upload(body: InitiateUploadRequest, request: Request):
+    """
+    Start a direct-to-S3 multipart upload.
+    Validates file type and declared size; returns the video id and part layout
+    to request presigned part URLs for.
+    """
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/initiate"
+
+    is_valid, error_msg = validate_file_type(body.filename, body.content_type)
+    if not is_valid:
+        log_with_context(logging.WARNING, f"File type validation failed: {error_msg}", correlation_id, filename=body.filename)
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_msg)
+    if body.size <= 0:
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File size must be positive")
+    if body.size > MAX_FILE_SIZE:
+        log_with_context(logging.WARNING, f"File exceeds 500MB limit: {body.size} bytes", correlation_id, filename=body.filename, file_size=body.size)
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=413).inc()
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Maximum file size is 500MB. File size: {body.size / (1024*1024):.2f}MB"
+        )
+
+    file_id = str(uuid.uuid4())
+    file_extension = body.filename.split(".")[-1].lower() if "." in body.filename else "mp4"
+    s3_video_key = f"videos/{file_id}.{file_extension}"
+    content_type = body.content_type or "video/mp4"
+    part_size = direct_part_size(body.size)
+
+    try:
+        response = await asyncio.to_thread(
+            s3_client.create_multipart_upload, Bucket=BUCKET_NAME, Key=s3_video_key, ContentType=content_type
+        )
+        session = {
+            "video_id": file_id,
+            "protocol": "presigned",
+            "upload_id": response["UploadId"],
+            "s3_video_key": s3_video_key,
+            "filename": body.filename,
+            "file_extension": file_extension,
+            "content_type": content_type,
+            "size": body.size,
+            "part_size": part_size,
+            "part_count": math.ceil(body.size / part_size),
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "expires_at": int(time.time()) + UPLOAD_SESSION_TTL,
+        }
+        await asyncio.to_thread(
+            s3_client.put_object,
+            Bucket=BUCKET_NAME,
+            Key=pending_upload_key(file_id),
+            Body=json.dumps(session),
+            ContentType="application/json"
+        )
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, file_id)
+
+    DIRECT_UPLOADS.labels(step="initiated").inc()
+    log_with_context(logging.INFO, "Direct upload initiated", correlation_id, file_id, body.filename, body.size)
+    return {
+        "video_id": file_id,
+        "part_size": part_size,
+        "part_count": session["part_count"],
+        "expires_in": DIRECT_URL_EXPIRATION,
+    }
+
+@app.post("/upload/{video_id}/parts")
+async def presign_upload_parts(video_id: str, request: Request, body: Optional[PartUrlsRequest] = None):
+    """
+    Presigned PUT URLs for parts of a direct upload (all parts unless part_numbers
+    is given, e.g. to retry a failed part after its URL expired). Clients must keep
+    each part at part_size bytes, except the last.
+    """
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/{id}/parts"
+    session = await get_pending_upload(video_id, endpoint, correlation_id)
+
+    part_numbers = (body.part_numbers if body and body.part_numbers else None) or range(1, session["part_count"] + 1)
+    invalid = [n for n in part_numbers if not 1 <= n <= session["part_count"]]
+    if invalid:
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Part numbers must be between 1 and {session['part_count']}: {invalid[:10]}"
+        )
+
+    # Presigning is local signing work; no S3 round trip per part
+    parts = [
+        {
+            "part_number": n,
+            "url": s3_client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": BUCKET_NAME, "Key": session["s3_video_key"], "UploadId": session["upload_id"], "PartNumber": n},
+                ExpiresIn=DIRECT_URL_EXPIRATION,
+            ),
+        }
+        for n in part_numbers
+    ]
+    return {"video_id": video_id, "part_size": session["part_size"], "expires_in": DIRECT_URL_EXPIRATION, "parts": parts}
+
+@app.post("/upload/{video_id}/complete")
+async def complete_upload(video_id: str, request: Request):
+    """
+    Complete a direct upload once every part is in S3, then write metadata and
+    start processing exactly as for a proxied upload.
+    """
+    start_time = time.perf_counter()
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/{id}/complete"
+    session = await get_pending_upload(video_id, endpoint, correlation_id)
+
+    try:
+        parts = await asyncio.to_thread(uploaded_parts, session)
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+
+    missing = sorted(set(range(1, session["part_count"] + 1)) - {number for number, _, _ in parts})
+    if missing:
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Missing parts: {missing[:10]}")
+    file_size = sum(size for _, _, size in parts)
+    if file_size > MAX_FILE_SIZE:
+        log_with_context(logging.WARNING, f"Direct upload exceeds 500MB limit: {file_size} bytes", correlation_id, video_id, session["filename"], file_size)
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=413).inc()
+        try:
+            await asyncio.to_thread(abort_direct_upload, session)
+            DIRECT_UPLOADS.labels(step="aborted").inc()
+        except (ClientError, BotoCoreError) as e:
+            log_with_context(logging.ERROR, f"Failed to abort oversized direct upload: {str(e)}", correlation_id, video_id)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Maximum file size is 500MB. File size: {file_size / (1024*1024):.2f}MB"
+        )
+    if file_size != session["size"]:
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Uploaded {file_size} bytes but {session['size']} were declared"
+        )
+
+    try:
+        await finish_pending_upload(session, parts, correlation_id, check_container=True)
+    except InvalidContainer:
+        log_with_context(logging.WARNING, "Content is not a recognised video container", correlation_id, video_id)
+        UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=400).inc()
+        DIRECT_UPLOADS.labels(step="rejected").inc()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File content is not a supported video container")
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+    DIRECT_UPLOADS.labels(step="completed").inc()
+    duration = time.perf_counter() - start_time
+    log_with_context(logging.INFO, f"Direct upload complete: parts={len(parts)} duration={duration:.2f}s", correlation_id, video_id, session["filename"], file_size)
+    return {
+        "status": "success",
+        "video_id": video_id,
+        "message": "Video uploaded to S3, metadata to S3, and processing started"
+    }
+
+@app.delete("/upload/{video_id}")
+async def abort_upload(video_id: str, request: Request):
+    """Abort a direct upload and discard its parts"""
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/{id}"
+    session = await get_pending_upload(video_id, endpoint, correlation_id)
+    try:
+        await asyncio.to_thread(abort_direct_upload, session)
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+    DIRECT_UPLOADS.labels(step="aborted").inc()
+    log_with_context(logging.INFO, "Direct upload aborted", correlation_id, video_id)
+    return {"status": "aborted", "video_id": video_id}
+
+# ============================================================================
+# Resumable uploads (tus 1.0 core protocol)
+#
+# POST creates an upload, HEAD reports how many bytes the server holds and PATCH
+# appends from that offset. Bytes are cut into parts of part_size and every full
+# part becomes an S3 multipart part as soon as it arrives. Bytes after the last
+# whole part (a PATCH ending mid-part, or a dropped connection) are staged as a
+# tail object tagged with the part boundary it starts at, and the next PATCH
+# continues from the tail, so no acknowledged byte is ever re-sent. The offset is
+# derived from S3 (part list plus a tail matching its boundary) rather than kept
+# in session state. The final part completes the upload and registers it like /upload.
+# ============================================================================
+def tus_headers(session=None, offset=None):
+    headers = {"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+    if session is not None:
+        headers["Upload-Length"] = str(session["size"])
+        headers["Upload-Expires"] = formatdate(session["expires_at"], usegmt=True)
+    if offset is not None:
+        headers["Upload-Offset"] = str(offset)
+    return headers
+
+def parse_upload_metadata(header):
+    """tus Upload-Metadata: comma-separated "key base64(value)" pairs"""
+    metadata = {}
+    for pair in filter(None, (p.strip() for p in header.split(","))):
+        key, _, value = pair.partition(" ")
+        metadata[key] = base64.b64decode(value).decode("utf-8") if value else ""
+    return metadata
+
+def stored_offset(session, parts):
+    """Bytes held in S3 from the start of the upload (contiguous whole parts)"""
+    offset = 0
+    for expected, (number, _, size) in enumerate(parts, start=1):
+        if number != expected or (size != session["part_size"] and offset + size != session["size"]):
+            break
+        offset += size
+    return offset
+
+def tail_key(video_id):
+    return f"{PENDING_UPLOADS_PREFIX}/{video_id}.tail"
+
+def load_tail(session, part_offset):
+    """Bytes staged after the last whole part, or b"" if no tail starts at part_offset"""
+    try:
+        response = s3_client.get_object(Bucket=BUCKET_NAME, Key=tail_key(session["video_id"]))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return b""
+        raise
+    if response.get("Metadata", {}).get("offset") != str(part_offset):
+        return b""  # Already merged into a part that was stored after it
+    return response["Body"].read()
+
+def tail_length(session, part_offset):
+    """Size of the tail load_tail would return"""
+    try:
+        response = s3_client.head_object(Bucket=BUCKET_NAME, Key=tail_key(session["video_id"]))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return 0
+        raise
+    if response.get("Metadata", {}).get("offset") != str(part_offset):
+        return 0
+    return response["ContentLength"]
+
+class UploadLocked(Exception):
+    """Another PATCH is appending to the upload (or has taken over our lock)"""
+
+def lock_key(video_id):
+    return f"{PENDING_UPLOADS_PREFIX}/{video_id}.lock"
+
+def precondition_failed(e):
+    return e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict")
+
+class ResumableUploadLock:
+    """
+    Exclusive right to append to one resumable upload, across replicas.
+
+    The lock is an S3 object created with If-None-Match, so only one request gets
+    it. It carries an expiry: the lock of a replica that died mid-PATCH is taken
+    over with If-Match once it has expired. The holder renews it (If-Match on its
+    own ETag) before writing once half the lease has passed, so a request whose
+    lock was taken over stops before its next write.
+    """
+
+    def __init__(self, video_id):
+        self.key = lock_key(video_id)
+        self.etag = None
+        self.expires_at = 0.0
+
+    def _put(self, **condition):
+        expires_at = time.time() + RESUMABLE_LOCK_LEASE
+        try:
+            response = s3_client.put_object(
+                Bucket=BUCKET_NAME, Key=self.key, Body=json.dumps({"expires_at": expires_at}),
+                ContentType="application/json", **condition
+            )
+        except ClientError as e:
+            if precondition_failed(e):
+                raise UploadLocked()
+            raise
+        self.etag, self.expires_at = response["ETag"], expires_at
+
+    def acquire(self):
+        try:
+            self._put(IfNoneMatch="*")
+            return
+        except UploadLocked:
+            pass
+        try:
+            response = s3_client.get_object(Bucket=BUCKET_NAME, Key=self.key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                raise UploadLocked()  # Released in between; the client retries after a HEAD
+            raise
+        if json.loads(response["Body"].read()).get("expires_at", 0) > time.time():
+            raise UploadLocked()
+        self._put(IfMatch=response["ETag"])
+
+    def renewal_due(self):
+        return self.expires_at - time.time() < RESUMABLE_LOCK_LEASE / 2
+
+    def renew(self):
+        self._put(IfMatch=self.etag)
+
+    def release(self):
+        try:
+            s3_client.delete_object(Bucket=BUCKET_NAME, Key=self.key, IfMatch=self.etag)
+        except ClientError as e:
+            if not precondition_failed(e) and e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                raise
+
+# Uploads with a PATCH in progress on this replica; a second one is refused without
+# touching S3
+resumable_patches = set()
+
+def resumable_error(endpoint, status_code, detail, headers=None):
+    UPLOAD_ERRORS.labels(endpoint=endpoint, status_code=status_code).inc()
+    return HTTPException(status_code=status_code, detail=detail, headers={**tus_headers(), **(headers or {})})
+
+async def get_resumable_upload(video_id, endpoint, correlation_id):
+    session = await asyncio.to_thread(load_pending_upload, video_id)
+    if session is None or session.get("protocol") != "tus":
+        log_with_context(logging.WARNING, "Unknown, expired or completed resumable upload", correlation_id, video_id)
+        raise resumable_error(endpoint, status.HTTP_404_NOT_FOUND, "Upload not found")
+    return session
+
+@app.post("/upload/resumable", status_code=status.HTTP_201_CREATED)
+async def create_resumable_upload(request: Request):
+    """
+    Create a resumable upload (tus creation extension).
+    Upload-Length is required; Upload-Metadata carries filename and filetype.
+    """
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/resumable"
+    try:
+        file_size = int(request.headers["Upload-Length"])
+        metadata = parse_upload_metadata(request.headers.get("Upload-Metadata", ""))
+    except (KeyError, ValueError):
+        raise resumable_error(endpoint, status.HTTP_400_BAD_REQUEST, "Upload-Length and a valid Upload-Metadata header are required")
+    filename = metadata.get("filename") or "video.mp4"
+    content_type = metadata.get("filetype") or None
+
+    is_valid, error_msg = validate_file_type(filename, content_type)
+    if not is_valid:
+        log_with_context(logging.WARNING, f"File type validation failed: {error_msg}", correlation_id, filename=filename)
+        raise resumable_error(endpoint, status.HTTP_400_BAD_REQUEST, error_msg)
+    if file_size <= 0:
+        raise resumable_error(endpoint, status.HTTP_400_BAD_REQUEST, "Upload-Length must be positive")
+    if file_size > MAX_FILE_SIZE:
+        log_with_context(logging.WARNING, f"File exceeds 500MB limit: {file_size} bytes", correlation_id, filename=filename, file_size=file_size)
+        raise resumable_error(
+            endpoint, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"Maximum file size is 500MB. File size: {file_size / (1024*1024):.2f}MB"
+        )
+
+    file_id = str(uuid.uuid4())
+    file_extension = filename.split(".")[-1].lower() if "." in filename else "mp4"
+    s3_video_key = f"videos/{file_id}.{file_extension}"
+    part_size = direct_part_size(file_size)
+    session = {
+        "video_id": file_id,
+        "protocol": "tus",
+        "s3_video_key": s3_video_key,
+        "filename": filename,
+        "file_extension": file_extension,
+        "content_type": content_type or "video/mp4",
+        "size": file_size,
+        "part_size": part_size,
+        "part_count": math.ceil(file_size / part_size),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "expires_at": int(time.time()) + UPLOAD_SESSION_TTL,
+    }
+    try:
+        response = await asyncio.to_thread(
+            s3_client.create_multipart_upload, Bucket=BUCKET_NAME, Key=s3_video_key, ContentType=session["content_type"]
+        )
+        session["upload_id"] = response["UploadId"]
+        await asyncio.to_thread(
+            s3_client.put_object,
+            Bucket=BUCKET_NAME,
+            Key=pending_upload_key(file_id),
+            Body=json.dumps(session),
+            ContentType="application/json"
+        )
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, file_id)
+
+    RESUMABLE_UPLOADS.labels(step="created").inc()
+    log_with_context(logging.INFO, "Resumable upload created", correlation_id, file_id, filename, file_size)
+    # Relative to the creation URL, so the Location is right both directly and behind the gateway
+    headers = {**tus_headers(session, 0), "Location": f"resumable/{file_id}"}
+    return Response(
+        content=json.dumps({"video_id": file_id, "part_size": part_size}),
+        status_code=status.HTTP_201_CREATED,
+        media_type="application/json",
+        headers=headers
+    )
+
+@app.head("/upload/resumable/{video_id}")
+async def resumable_upload_offset(video_id: str, request: Request):
+    """Progress of a resumable upload: the offset the next PATCH must start at"""
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/resumable/{id}"
+    session = await get_resumable_upload(video_id, endpoint, correlation_id)
+    try:
+        parts = await asyncio.to_thread(uploaded_parts, session)
+        part_offset = stored_offset(session, parts)
+        offset = part_offset + await asyncio.to_thread(tail_length, session, part_offset)
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+    return Response(status_code=status.HTTP_200_OK, headers=tus_headers(session, offset))
+
+@app.patch("/upload/resumable/{video_id}")
+async def append_resumable_upload(video_id: str, request: Request):
+    """
+    Append bytes at Upload-Offset. Whole parts are stored as they arrive and the
+    rest is staged as the upload's tail, so a PATCH of any size (or a dropped
+    connection) leaves the offset at the last byte received. One PATCH per upload
+    runs at a time; a concurrent one is refused with 409.
+    """
+    start_time = time.perf_counter()
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/resumable/{id}"
+    if request.headers.get("Content-Type") != "application/offset+octet-stream":
+        raise resumable_error(endpoint, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Content-Type must be application/offset+octet-stream")
+    try:
+        client_offset = int(request.headers["Upload-Offset"])
+    except (KeyError, ValueError):
+        raise resumable_error(endpoint, status.HTTP_400_BAD_REQUEST, "Upload-Offset header is required")
+
+    session = await get_resumable_upload(video_id, endpoint, correlation_id)
+    # The offset is only stable while no other request appends, so lock before reading it
+    if video_id in resumable_patches:
+        raise resumable_error(endpoint, status.HTTP_409_CONFLICT, "Another request is appending to this upload")
+    resumable_patches.add(video_id)
+    lock = ResumableUploadLock(video_id)
+    try:
+        try:
+            await asyncio.to_thread(lock.acquire)
+        except UploadLocked:
+            log_with_context(logging.WARNING, "Resumable upload is locked by another request", correlation_id, video_id)
+            raise resumable_error(endpoint, status.HTTP_409_CONFLICT, "Another request is appending to this upload")
+        except (ClientError, BotoCoreError) as e:
+            raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+        try:
+            return await append_locked(session, lock, request, client_offset, correlation_id, start_time)
+        finally:
+            try:
+                await asyncio.to_thread(lock.release)
+            except (ClientError, BotoCoreError) as e:
+                # Expires on its own; the next PATCH takes it over after the lease
+                log_with_context(logging.WARNING, f"Failed to release resumable upload lock: {str(e)}", correlation_id, video_id)
+    finally:
+        resumable_patches.discard(video_id)
+
+async def append_locked(session, lock, request, client_offset, correlation_id, start_time):
+    """The body of a PATCH, run while holding the upload's lock"""
+    video_id = session["video_id"]
+    endpoint = "/upload/resumable/{id}"
+    try:
+        parts = await asyncio.to_thread(uploaded_parts, session)
+        offset = stored_offset(session, parts)  # Always a part boundary; the buffer holds what follows it
+        tail = await asyncio.to_thread(load_tail, session, offset)
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+    upload_offset = offset + len(tail)
+    if client_offset != upload_offset:
+        raise resumable_error(endpoint, status.HTTP_409_CONFLICT, f"Upload-Offset must be {upload_offset}", {"Upload-Offset": str(upload_offset)})
+    if upload_offset == session["size"]:
+        raise resumable_error(endpoint, status.HTTP_409_CONFLICT, "Upload is already complete", {"Upload-Offset": str(upload_offset)})
+
+    part_size, file_size = session["part_size"], session["size"]
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and upload_offset + int(content_length) > file_size:
+        raise resumable_error(endpoint, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, "Data exceeds Upload-Length", {"Upload-Offset": str(upload_offset)})
+    parts = [p for p in parts if p[0] <= offset // part_size]  # Stray parts past a gap are overwritten
+    buffer = bytearray(tail)
+    received = 0
+    staged = 0
+
+    def check_container(final=False):
+        # Content check on the first bytes of the upload, before the first part is stored
+        if offset == 0 and (len(buffer) >= CONTAINER_SNIFF_BYTES or final) and sniff_container(bytes(buffer[:CONTAINER_SNIFF_BYTES])) is None:
+            log_with_context(logging.WARNING, "Content is not a recognised video container", correlation_id, video_id)
+            raise resumable_error(endpoint, status.HTTP_400_BAD_REQUEST, "File content is not a supported video container", {"Upload-Offset": "0"})
+
+    async def hold_lock():
+        # Before every write: fails with UploadLocked if another request took the lock over
+        if lock.renewal_due():
+            await asyncio.to_thread(lock.renew)
+
+    async def store_part(data):
+        nonlocal offset
+        await hold_lock()
+        number = offset // part_size + 1
+        response = await asyncio.to_thread(
+            transfer_client.upload_part,
+            Bucket=BUCKET_NAME, Key=session["s3_video_key"], UploadId=session["upload_id"], PartNumber=number, Body=data
+        )
+        parts.append((number, response["ETag"], len(data)))
+        offset += len(data)
+
+    async def stage_tail():
+        # Replaces the previous tail; one tagged with an older boundary is ignored by load_tail
+        nonlocal staged
+        await hold_lock()
+        if buffer:
+            await asyncio.to_thread(
+                s3_client.put_object,
+                Bucket=BUCKET_NAME, Key=tail_key(video_id), Body=bytes(buffer), Metadata={"offset": str(offset)}
+            )
+        elif tail:
+            await asyncio.to_thread(s3_client.delete_object, Bucket=BUCKET_NAME, Key=tail_key(video_id))
+        staged = len(buffer)
+
+    try:
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if offset + len(buffer) + len(chunk) > file_size:
+                    await stage_tail()  # Keep what was valid so the reported offset holds
+                    raise resumable_error(endpoint, status.HTTP_400_BAD_REQUEST, "Data exceeds Upload-Length", {"Upload-Offset": str(offset + len(buffer))})
+                buffer += chunk
+                check_container()
+                while len(buffer) >= part_size:
+                    await store_part(bytes(buffer[:part_size]))
+                    del buffer[:part_size]
+            if buffer and offset + len(buffer) == file_size:
+                check_container(final=True)
+                await store_part(bytes(buffer))
+                buffer.clear()
+        except ClientDisconnect:
+            # Everything received so far is kept; the client resumes after a HEAD
+            log_with_context(logging.INFO, f"Resumable upload interrupted at offset {offset + len(buffer)}", correlation_id, video_id)
+        await stage_tail()
+    except UploadLocked:
+        log_with_context(logging.WARNING, f"Resumable upload lock lost at offset {offset}", correlation_id, video_id)
+        raise resumable_error(endpoint, status.HTTP_409_CONFLICT, "Another request took over this upload")
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+    finally:
+        # The re-read tail is not counted again; bytes of a failed request past its last stored part are lost
+        kept = offset + staged - upload_offset
+        RESUMABLE_PATCH_BYTES.labels(outcome="stored").inc(max(0, kept))
+        RESUMABLE_PATCH_BYTES.labels(outcome="discarded").inc(max(0, received - kept))
+
+    if offset == file_size:
+        try:
+            await hold_lock()
+            await finish_pending_upload(session, parts, correlation_id)
+        except UploadLocked:
+            raise resumable_error(endpoint, status.HTTP_409_CONFLICT, "Another request took over this upload")
+        except (ClientError, BotoCoreError) as e:
+            raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+        RESUMABLE_UPLOADS.labels(step="completed").inc()
+        duration = time.perf_counter() - start_time
+        log_with_context(logging.INFO, f"Resumable upload complete: parts={len(parts)} duration={duration:.2f}s", correlation_id, video_id, session["filename"], file_size)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=tus_headers(session, offset + staged))
+
+@app.delete("/upload/resumable/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def terminate_resumable_upload(video_id: str, request: Request):
+    """Abort a resumable upload and discard its parts (tus termination extension)"""
+    correlation_id = get_correlation_id(request)
+    endpoint = "/upload/resumable/{id}"
+    session = await get_resumable_upload(video_id, endpoint, correlation_id)
+    try:
+        await asyncio.to_thread(abort_direct_upload, session)
+    except (ClientError, BotoCoreError) as e:
+        raise direct_upload_failed(endpoint, e, correlation_id, video_id)
+    RESUMABLE_UPLOADS.labels(step="terminated").inc()
+    log_with_context(logging.INFO, "Resumable upload terminated", correlation_id, video_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=tus_headers())
+
+# ============================================================================
+# Expired upload cleanup
+# ============================================================================
+def sweep_expired_uploads():
+    """Abort multipart uploads and drop pending sessions older than UPLOAD_SESSION_TTL.
+
+    Also catches multipart uploads that never got a session or whose proxied
+    /upload died mid-transfer. Idempotent, so every replica can run it.
+    """
+    cutoff = time.time() - UPLOAD_SESSION_TTL
+    for page in s3_client.get_paginator("list_multipart_uploads").paginate(Bucket=BUCKET_NAME, Prefix="videos/"):
+        for upload in page.get("Uploads", []):
+            if upload["Initiated"].timestamp() >= cutoff:
+                continue
+            try:
+                s3_client.abort_multipart_upload(Bucket=BUCKET_NAME, Key=upload["Key"], UploadId=upload["UploadId"])
+                EXPIRED_UPLOADS_SWEPT.labels(kind="multipart").inc()
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+                    raise
+    for page in s3_client.get_paginator("list_objects_v2").paginate(Bucket=BUCKET_NAME, Prefix=f"{PENDING_UPLOADS_PREFIX}/"):
+        for obj in page.get("Contents", []):
+            if obj["LastModified"].timestamp() < cutoff:
+                s3_client.delete_object(Bucket=BUCKET_NAME, Key=obj["Key"])
+                EXPIRED_UPLOADS_SWEPT.labels(kind="session").inc()
+
+async def upload_sweeper():
+    while True:
+        try:
+            await asyncio.to_thread(sweep_expired_uploads)
+        except Exception as e:
+            log_with_context(logging.ERROR, f"Expired upload sweep failed: {str(e)}")
+        try:
+            await recover_outbox_records()
+        except Exception as e:
+            log_with_context(logging.ERROR, f"Outbox recovery failed: {str(e)}")
+        await asyncio.sleep(UPLOAD_SWEEP_INTERVAL)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    await upload_outbox.start()
+    asyncio.create_task(upload_sweeper())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await upload_outbox.stop()
@@ -0,0 +1,123 @@
+import hashlib
+import io
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+
+# Services are flat modules run from their own directory (see the Dockerfile)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# boto3 clients are created at import time; tests never reach AWS
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+PART_SIZE = 64 * 1024
+
+
+class FakeS3:
+    """In-memory bucket with the calls the upload endpoints make"""
+
+    def __init__(self):
+        self.objects = {}  # key -> (body, metadata)
+        self.modified = {}  # key -> LastModified
+        self.uploads = {}  # upload id -> {part number: body}
+
+    @staticmethod
+    def _missing(operation):
+        return ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not found"}}, operation)
+
+    def _etag(self, Key):
+        return f'"{hashlib.md5(self.objects[Key][0]).hexdigest()}"' if Key in self.objects else None
+
+    def _check(self, Key, operation, IfMatch=None, IfNoneMatch=None):
+        if (IfNoneMatch == "*" and Key in self.objects) or (IfMatch and IfMatch != self._etag(Key)):
+            raise ClientError({"Error": {"Code": "PreconditionFailed", "Message": "At least one of the pre-conditions you specified did not hold"}}, operation)
+
+    def put_object(self, Bucket, Key, Body, Metadata=None, IfMatch=None, IfNoneMatch=None, **kwargs):
+        self._check(Key, "PutObject", IfMatch, IfNoneMatch)
+        self.objects[Key] = (Body.encode() if isinstance(Body, str) else bytes(Body), Metadata or {})
+        self.modified[Key] = datetime.now(timezone.utc)
+        return {"ETag": self._etag(Key)}
+
+    def get_object(self, Bucket, Key, Range=None):
+        if Key not in self.objects:
+            raise self._missing("GetObject")
+        body, metadata = self.objects[Key]
+        if Range:
+            start, end = Range.removeprefix("bytes=").split("-")
+            body = body[int(start):int(end) + 1]
+        return {"Body": io.BytesIO(body), "Metadata": metadata, "ETag": self._etag(Key)}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        body, metadata = self.objects[Key]
+        return {"ContentLength": len(body), "Metadata": metadata}
+
+    def delete_object(self, Bucket, Key, IfMatch=None):
+        if IfMatch and Key not in self.objects:
+            raise self._missing("DeleteObject")
+        self._check(Key, "DeleteObject", IfMatch)
+        self.objects.pop(Key, None)
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        now = datetime.now(timezone.utc)
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        yield {"Contents": [{"Key": key, "LastModified": self.modified.get(key, now)} for key in keys]}
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete["Objects"]:
+            self.objects.pop(obj["Key"], None)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = str(uuid.uuid4())
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f'"part-{PartNumber}"'}
+
+    def list_parts(self, Bucket, Key, UploadId, **kwargs):
+        parts = self.uploads[UploadId]
+        return {"Parts": [{"PartNumber": n, "ETag": f'"part-{n}"', "Size": len(parts[n])} for n in sorted(parts)]}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = (b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"]), {})
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+
+
+@pytest.fixture
+def s3(monkeypatch, tmp_path):
+    import main
+    fake = FakeS3()
+    monkeypatch.setattr(main, "s3_client", fake)
+    monkeypatch.setattr(main, "transfer_client", fake)
+    monkeypatch.setattr(main, "DIRECT_PART_BYTES", PART_SIZE)
+    # Events stay in the local outbox; no flusher runs without the app's startup
+    monkeypatch.setattr(main, "upload_outbox", main.UploadOutbox(str(tmp_path)))
+    return fake
+
+
+@pytest.fixture
+def client(s3):
+    import main
+    return TestClient(main.app)
+
+
+def video_bytes(size):
+    return (b"\x00\x00\x00\x18ftypmp42" + os.urandom(size))[:size]
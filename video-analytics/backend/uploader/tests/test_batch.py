@@ -0,0 +1,83 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import main
+from conftest import PART_SIZE, video_bytes
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_PART_BYTES", PART_SIZE)
+
+
+def batch(client, *files):
+    return client.post("/upload/batch", files=[("files", (name, data, "video/mp4")) for name, data in files])
+
+
+def videos(s3):
+    return {key: body for key, (body, _) in s3.objects.items() if key.startswith("videos/")}
+
+
+def events(s3):
+    return [key for key in s3.objects if key.startswith("outbox/")]
+
+
+def test_every_file_is_stored_and_registered(client, s3):
+    large, small = video_bytes(3 * PART_SIZE + 10), video_bytes(500)
+    response = batch(client, ("a.mp4", large), ("b.mp4", small))
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["status"], body["uploaded"], body["failed"]) == ("success", 2, 0)
+    ids = [result["video_id"] for result in body["results"]]
+    assert videos(s3) == {f"videos/{ids[0]}.mp4": large, f"videos/{ids[1]}.mp4": small}
+    assert len(events(s3)) == 2
+
+
+def test_a_rejected_file_does_not_fail_the_others(client, s3):
+    response = batch(client, ("a.mp4", b"<!DOCTYPE html>\n" + b"x" * 100), ("b.txt", b"text"), ("c.mp4", video_bytes(500)))
+    body = response.json()
+    assert (body["status"], body["uploaded"], body["failed"]) == ("partial", 1, 2)
+    assert [result["status"] for result in body["results"]] == ["error", "error", "success"]
+    assert len(videos(s3)) == 1 and len(events(s3)) == 1
+
+
+def test_an_s3_failure_while_receiving_a_file_fails_only_that_file(monkeypatch, client, s3):
+    create_multipart_upload = s3.create_multipart_upload
+    calls = []
+
+    def flaky_create_multipart_upload(**kwargs):
+        calls.append(kwargs["Key"])
+        if len(calls) == 1:
+            raise ClientError({"Error": {"Code": "SlowDown", "Message": "Reduce your request rate"}}, "CreateMultipartUpload")
+        return create_multipart_upload(**kwargs)
+
+    monkeypatch.setattr(s3, "create_multipart_upload", flaky_create_multipart_upload)
+    second = video_bytes(2 * PART_SIZE + 1)
+    response = batch(client, ("a.mp4", video_bytes(2 * PART_SIZE + 1)), ("b.mp4", second))
+    assert response.status_code == 200
+    failed, stored = response.json()["results"]
+    assert failed == {"filename": "a.mp4", "status": "error", "error": "Upload failed. Please try again."}
+    assert videos(s3) == {f"videos/{stored['video_id']}.mp4": second}
+    assert s3.uploads == {}
+
+
+def test_a_truncated_body_removes_the_files_already_stored(client, s3):
+    first = video_bytes(PART_SIZE + 10)
+    body = (
+        b"--b\r\nContent-Disposition: form-data; name=\"files\"; filename=\"a.mp4\"\r\nContent-Type: video/mp4\r\n\r\n"
+        + first + b"\r\n--b\r\nContent-Disposition: form-data; name=\"files\"; filename=\"b.mp4\"\r\n\r\n" + video_bytes(100)
+    )
+    response = client.post("/upload/batch", content=body, headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 400
+    assert videos(s3) == {} and events(s3) == []
+    assert s3.uploads == {}
+
+
+def test_a_failure_to_register_removes_the_stored_files(monkeypatch, client, s3):
+    async def broken_register_uploads(uploads, correlation_id):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(main, "register_uploads", broken_register_uploads)
+    with pytest.raises(OSError):
+        batch(client, ("a.mp4", video_bytes(2 * PART_SIZE)), ("b.mp4", video_bytes(500)))
+    assert videos(s3) == {}
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import main
+
+
+class FakeSQS:
+    """send_message_batch that fails the first `failures` calls"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []  # video ids, in send order
+
+    def send_message_batch(self, QueueUrl, Entries):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Could not connect to the endpoint URL")
+        self.sent.extend(json.loads(entry["MessageBody"])["video_id"] for entry in Entries)
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries]}
+
+
+@pytest.fixture
+def sqs(monkeypatch, s3):
+    fake = FakeSQS()
+    monkeypatch.setattr(main, "sqs_client", fake)
+    return fake
+
+
+def register(*video_ids):
+    uploads = [(video_id, "clip.mp4", "mp4", "video/mp4", 1000, f"videos/{video_id}.mp4", "sha") for video_id in video_ids]
+    asyncio.run(main.register_uploads(uploads, "correlation"))
+
+
+def records(s3):
+    return sorted(key for key in s3.objects if key.startswith("outbox/"))
+
+
+def segments(outbox):
+    return [name for name in os.listdir(outbox.directory) if name.endswith(".log")]
+
+
+def test_register_is_durable_before_delivery(s3, sqs):
+    register("a", "b")
+    assert records(s3) == ["outbox/a.json", "outbox/b.json"]
+    assert len(segments(main.upload_outbox)) == 1
+    assert sqs.sent == [] and "metadata/a.json" not in s3.objects
+
+
+def test_flush_delivers_metadata_then_messages_and_forgets_the_events(s3, sqs):
+    register("a", "b")
+    asyncio.run(main.upload_outbox.flush())
+    assert sqs.sent == ["a", "b"]
+    assert "metadata/a.json" in s3.objects and "metadata/b.json" in s3.objects
+    assert records(s3) == []
+    assert segments(main.upload_outbox) == []
+
+
+def test_undelivered_events_are_kept_and_retried(s3, sqs):
+    sqs.failures = 1
+    register("a")
+    asyncio.run(main.upload_outbox.flush())
+    assert sqs.sent == [] and records(s3) == ["outbox/a.json"]
+    assert len(segments(main.upload_outbox)) == 1
+    asyncio.run(main.upload_outbox.flush())
+    assert sqs.sent == ["a"] and records(s3) == []
+
+
+def test_existing_metadata_is_not_overwritten(s3, sqs):
+    register("a")
+    s3.put_object(Bucket="bucket", Key="metadata/a.json", Body=b"updated by the processor")
+    asyncio.run(main.upload_outbox.flush())
+    assert s3.objects["metadata/a.json"][0] == b"updated by the processor"
+    assert sqs.sent == ["a"]
+
+
+def test_a_restarted_process_delivers_the_segments_left_behind(s3, sqs):
+    register("a")
+    main.upload_outbox._file.close()  # The process dies
+    with open(os.path.join(main.upload_outbox.directory, segments(main.upload_outbox)[0]), "ab") as f:
+        f.write(b'{"metadata_key": "metadata/torn')  # Its last, unanswered write was torn
+    restarted = main.UploadOutbox(main.upload_outbox.directory)
+
+    async def restart():
+        await restarted.start()
+        assert restarted._pending == 1
+        await restarted.stop()
+
+    asyncio.run(restart())
+    assert sqs.sent == ["a"]
+    assert segments(restarted) == []
+
+
+def test_recovery_republishes_only_stale_records(s3, sqs):
+    register("lost", "live")
+    os.unlink(os.path.join(main.upload_outbox.directory, segments(main.upload_outbox)[0]))  # "lost" is only in S3 now
+    s3.modified["outbox/lost.json"] = datetime.now(timezone.utc) - timedelta(seconds=main.OUTBOX_RECOVERY_SECONDS + 1)
+    asyncio.run(main.recover_outbox_records())
+    assert sqs.sent == ["lost"]
+    assert records(s3) == ["outbox/live.json"]
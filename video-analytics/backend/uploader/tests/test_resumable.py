@@ -0,0 +1,157 @@
+import base64
+import json
+import time
+
+import pytest
+
+import main
+from conftest import PART_SIZE, video_bytes
+from main import stored_offset
+
+TUS_HEADERS = {"Tus-Resumable": "1.0.0", "Content-Type": "application/offset+octet-stream"}
+
+
+def create_upload(client, size):
+    metadata = "filename " + base64.b64encode(b"clip.mp4").decode()
+    response = client.post("/upload/resumable", headers={"Tus-Resumable": "1.0.0", "Upload-Length": str(size), "Upload-Metadata": metadata})
+    assert response.status_code == 201
+    return response.json()["video_id"]
+
+
+def patch(client, video_id, offset, data):
+    return client.patch(f"/upload/resumable/{video_id}", content=data, headers={**TUS_HEADERS, "Upload-Offset": str(offset)})
+
+
+def head_offset(client, video_id):
+    return int(client.head(f"/upload/resumable/{video_id}").headers["Upload-Offset"])
+
+
+SESSION = {"part_size": 100, "size": 250}
+
+
+@pytest.mark.parametrize("parts, offset", [
+    ([], 0),
+    ([(1, "a", 100), (2, "b", 100)], 200),
+    ([(1, "a", 100), (2, "b", 100), (3, "c", 50)], 250),  # Short final part
+    ([(1, "a", 100), (3, "c", 50)], 100),                  # Gap: only the contiguous prefix counts
+    ([(1, "a", 100), (2, "b", 40)], 100),                  # Short part that is not the last
+    ([(2, "b", 100)], 0),
+])
+def test_stored_offset(parts, offset):
+    assert stored_offset(SESSION, parts) == offset
+
+
+@pytest.mark.parametrize("chunk", [1000, PART_SIZE - 1, PART_SIZE + 1, 3 * PART_SIZE + 17])
+def test_patches_of_any_size_keep_every_byte(client, s3, chunk):
+    data = video_bytes(5 * PART_SIZE + 123)
+    video_id = create_upload(client, len(data))
+    offset = 0
+    while offset < len(data):
+        response = patch(client, video_id, offset, data[offset:offset + chunk])
+        assert response.status_code == 204
+        new_offset = int(response.headers["Upload-Offset"])
+        assert new_offset == min(len(data), offset + chunk)
+        if new_offset < len(data):
+            assert head_offset(client, video_id) == new_offset
+        offset = new_offset
+
+    assert s3.objects[f"videos/{video_id}.mp4"][0] == data
+    assert f"uploads/{video_id}.tail" not in s3.objects
+    assert f"uploads/{video_id}.json" not in s3.objects
+
+
+def test_tail_is_merged_into_the_next_part(client, s3):
+    data = video_bytes(3 * PART_SIZE)
+    video_id = create_upload(client, len(data))
+    assert patch(client, video_id, 0, data[:PART_SIZE + 10]).headers["Upload-Offset"] == str(PART_SIZE + 10)
+    tail, metadata = s3.objects[f"uploads/{video_id}.tail"]
+    assert tail == data[PART_SIZE:PART_SIZE + 10] and metadata == {"offset": str(PART_SIZE)}
+
+    assert patch(client, video_id, PART_SIZE + 10, data[PART_SIZE + 10:2 * PART_SIZE]).status_code == 204
+    assert f"uploads/{video_id}.tail" not in s3.objects
+    assert head_offset(client, video_id) == 2 * PART_SIZE
+
+
+def test_wrong_offset_is_a_conflict(client):
+    data = video_bytes(2 * PART_SIZE)
+    video_id = create_upload(client, len(data))
+    patch(client, video_id, 0, data[:500])
+    response = patch(client, video_id, 0, data[:500])
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "500"
+
+
+def test_tail_from_an_older_boundary_is_ignored(client, s3):
+    data = video_bytes(3 * PART_SIZE)
+    video_id = create_upload(client, len(data))
+    patch(client, video_id, 0, data[:PART_SIZE])
+    # Left behind by a request that stored the part after it but died before replacing it
+    s3.objects[f"uploads/{video_id}.tail"] = (b"stale", {"offset": "0"})
+    assert head_offset(client, video_id) == PART_SIZE
+    assert patch(client, video_id, PART_SIZE, data[PART_SIZE:]).status_code == 204
+    assert s3.objects[f"videos/{video_id}.mp4"][0] == data
+
+
+def test_data_past_upload_length_is_rejected(client):
+    data = video_bytes(PART_SIZE)
+    video_id = create_upload(client, len(data))
+    response = patch(client, video_id, 0, data + b"extra")
+    assert response.status_code == 413
+    assert head_offset(client, video_id) == 0
+
+
+def test_terminate_removes_the_tail(client, s3):
+    data = video_bytes(2 * PART_SIZE)
+    video_id = create_upload(client, len(data))
+    patch(client, video_id, 0, data[:100])
+    assert client.delete(f"/upload/resumable/{video_id}").status_code == 204
+    assert not any(key.startswith(f"uploads/{video_id}") for key in s3.objects)
+    assert client.head(f"/upload/resumable/{video_id}").status_code == 404
+
+
+def lock(s3, video_id, expires_in):
+    s3.objects[f"uploads/{video_id}.lock"] = (json.dumps({"expires_at": time.time() + expires_in}).encode(), {})
+
+
+def test_patch_while_another_replica_holds_the_lock_is_a_conflict(client, s3):
+    data = video_bytes(2 * PART_SIZE)
+    video_id = create_upload(client, len(data))
+    lock(s3, video_id, 60)
+    assert patch(client, video_id, 0, data[:500]).status_code == 409
+    assert head_offset(client, video_id) == 0
+    assert f"uploads/{video_id}.lock" in s3.objects  # Not ours to release
+
+
+def test_patch_while_one_runs_on_this_replica_is_a_conflict(monkeypatch, client, s3):
+    data = video_bytes(2 * PART_SIZE)
+    video_id = create_upload(client, len(data))
+    monkeypatch.setattr(main, "resumable_patches", {video_id})
+    assert patch(client, video_id, 0, data[:500]).status_code == 409
+    assert f"uploads/{video_id}.lock" not in s3.objects
+
+
+def test_an_expired_lock_is_taken_over_and_released(client, s3):
+    data = video_bytes(2 * PART_SIZE)
+    video_id = create_upload(client, len(data))
+    lock(s3, video_id, -1)  # Left by a replica that died mid-PATCH
+    assert patch(client, video_id, 0, data[:500]).status_code == 204
+    assert head_offset(client, video_id) == 500
+    assert f"uploads/{video_id}.lock" not in s3.objects
+    assert main.resumable_patches == set()
+
+
+def test_a_request_whose_lock_was_taken_over_stops_writing(monkeypatch, client, s3):
+    monkeypatch.setattr(main, "RESUMABLE_LOCK_LEASE", 0)  # Renew before every write
+    data = video_bytes(3 * PART_SIZE)
+    video_id = create_upload(client, len(data))
+
+    upload_part = s3.upload_part
+
+    def slow_upload_part(**kwargs):
+        lock(s3, video_id, 60)  # Meanwhile another replica decided this request was dead
+        return upload_part(**kwargs)
+
+    monkeypatch.setattr(s3, "upload_part", slow_upload_part)
+    assert patch(client, video_id, 0, data[:2 * PART_SIZE]).status_code == 409
+    assert list(s3.uploads.values())[0].keys() == {1}
+    assert f"uploads/{video_id}.lock" in s3.objects
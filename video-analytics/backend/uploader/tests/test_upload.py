@@ -0,0 +1,37 @@
+import pytest
+
+import main
+from conftest import PART_SIZE, video_bytes
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_PART_BYTES", PART_SIZE)
+
+
+def multipart(filename, data, closed=True):
+    body = (
+        f'--b\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\nContent-Type: video/mp4\r\n\r\n'.encode()
+        + data
+    )
+    return body + b"\r\n--b--\r\n" if closed else body
+
+
+def post(client, body):
+    return client.post("/upload", content=body, headers={"Content-Type": "multipart/form-data; boundary=b"})
+
+
+def test_large_videos_are_stored_in_parts(client, s3):
+    data = video_bytes(3 * PART_SIZE + 10)
+    response = post(client, multipart("clip.mp4", data))
+    assert response.status_code == 200
+    assert s3.objects[f"videos/{response.json()['video_id']}.mp4"][0] == data
+    assert s3.uploads == {}
+
+
+@pytest.mark.parametrize("size", [500, 3 * PART_SIZE + 10])
+def test_a_truncated_body_stores_nothing(client, s3, size):
+    response = post(client, multipart("clip.mp4", video_bytes(size), closed=False))
+    assert response.status_code == 400
+    assert not any(key.startswith(("videos/", "outbox/")) for key in s3.objects)
+    assert s3.uploads == {}  # Parts already sent are aborted
@@ -0,0 +1,71 @@
+import pytest
+
+import main
+from conftest import video_bytes
+
+
+@pytest.mark.parametrize("head, container", [
+    (b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00", "mp4"),
+    (b"\x00\x00\x00\x08wide\x00\x00\x00\x00\x00\x00\x00\x00", "mov"),
+    (b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x00\x00\x00\x00\x00\x00\x00", "matroska"),
+    (b"RIFF\x00\x10\x00\x00AVI LIST", "avi"),
+    (b"FLV\x01\x05\x00\x00\x00\x09\x00\x00\x00\x00\x00\x00\x00", "flv"),
+    (b"\x30\x26\xb2\x75\x8e\x66\xcf\x11\xa6\xd9\x00\xaa\x00\x62\xce\x6c", "asf"),
+    (b"RIFF\x00\x10\x00\x00WAVEfmt ", None),  # RIFF, but audio
+    (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR", None),
+    (b"<!DOCTYPE html>\n", None),
+    (b"\x00\x00", None),
+])
+def test_sniff_container(head, container):
+    assert main.sniff_container(head) == container
+
+
+def upload(client, data, filename="clip.mp4", **kwargs):
+    return client.post("/upload", files={"file": (filename, data, "video/mp4")}, **kwargs)
+
+
+def test_video_content_is_stored(client, s3):
+    data = video_bytes(5000)
+    response = upload(client, data)
+    assert response.status_code == 200
+    assert s3.objects[f"videos/{response.json()['video_id']}.mp4"][0] == data
+
+
+def test_non_video_content_is_rejected_before_anything_is_stored(client, s3):
+    response = upload(client, b"<!DOCTYPE html>\n" + b"x" * 5000)
+    assert response.status_code == 400
+    assert s3.objects == {} and s3.uploads == {}
+
+
+@pytest.mark.parametrize("path, limit", [("/upload", "MAX_REQUEST_BYTES"), ("/upload/batch", "MAX_BATCH_REQUEST_BYTES")])
+def test_oversized_requests_are_rejected_by_content_length(monkeypatch, client, s3, path, limit):
+    monkeypatch.setattr(main, limit, 1000)
+    response = client.post(path, files={"file": ("clip.mp4", video_bytes(5000), "video/mp4")}, headers={"Origin": "https://app.example"})
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == "https://app.example"  # Browsers can read the rejection
+    assert s3.objects == {} and s3.uploads == {}
+
+
+def test_resumable_upload_with_non_video_content_stores_no_part(client, s3):
+    metadata = "filename Y2xpcC5tcDQ="  # clip.mp4
+    response = client.post("/upload/resumable", headers={"Tus-Resumable": "1.0.0", "Upload-Length": "5000", "Upload-Metadata": metadata})
+    video_id = response.json()["video_id"]
+    response = client.patch(
+        f"/upload/resumable/{video_id}", content=b"\x89PNG\r\n\x1a\n" + b"x" * 4992,
+        headers={"Tus-Resumable": "1.0.0", "Content-Type": "application/offset+octet-stream", "Upload-Offset": "0"}
+    )
+    assert response.status_code == 400
+    assert response.headers["Upload-Offset"] == "0"
+    assert all(parts == {} for parts in s3.uploads.values())
+    assert f"uploads/{video_id}.tail" not in s3.objects
+
+
+def test_direct_upload_with_non_video_content_is_deleted_on_complete(client, s3):
+    data = b"\x89PNG\r\n\x1a\n" + b"x" * 4992
+    video_id = client.post("/upload/initiate", json={"filename": "clip.mp4", "size": len(data)}).json()["video_id"]
+    upload_id, = s3.uploads
+    s3.upload_part(Bucket="bucket", Key=f"videos/{video_id}.mp4", UploadId=upload_id, PartNumber=1, Body=data)  # The client's presigned PUT
+    response = client.post(f"/upload/{video_id}/complete")
+    assert response.status_code == 400
+    assert f"videos/{video_id}.mp4" not in s3.objects
+    assert not any(key.startswith(("metadata/", "outbox/")) for key in s3.objects)  # Never registered
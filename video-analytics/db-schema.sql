@@ -8,6 +8,14 @@ CREATE TABLE IF NOT EXISTS videos (
     s3_bucket VARCHAR(255) NOT NULL,
     s3_key VARCHAR(512) NOT NULL,
     thumbnail_key VARCHAR(512),
+    hls_master_key VARCHAR(512),
+    renditions JSON,
+    content_hash VARCHAR(64),
+    duplicate_of UUID,
+    thumbnails JSON,
+    perceptual_hash BIGINT,
+    scene_index BYTEA,
+    audio_summary JSON,
     size_bytes BIGINT,
     duration_seconds INTEGER,
     status VARCHAR(50) DEFAULT 'UPLOADED',
@@ -17,6 +25,16 @@ CREATE TABLE IF NOT EXISTS videos (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Columns added after the initial release (no-ops on fresh databases)
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS hls_master_key VARCHAR(512);
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS renditions JSON;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS duplicate_of UUID;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS thumbnails JSON;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS perceptual_hash BIGINT;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS scene_index BYTEA;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS audio_summary JSON;
+
 -- Views table
 CREATE TABLE IF NOT EXISTS video_views (
     id SERIAL PRIMARY KEY,
@@ -41,6 +59,7 @@ CREATE INDEX IF NOT EXISTS idx_views_video_id ON video_views(video_id);
 CREATE INDEX IF NOT EXISTS idx_views_viewed_at ON video_views(viewed_at DESC);
 CREATE INDEX IF NOT EXISTS idx_likes_video_id ON video_likes(video_id);
 CREATE INDEX IF NOT EXISTS idx_likes_liked_at ON video_likes(liked_at DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_content_hash ON videos(content_hash);
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Script to rewrite stored video metadata records in the current schema and encoding.
+Usage: python migrate_metadata.py [--bucket BUCKET] [--encoding binary|json] [--dry-run]
+Example: python migrate_metadata.py --bucket video-analytics-uploads --dry-run
+
+Run it after the analytics, processor and uploader services that read the new
+encoding are deployed. Records already in the current format are skipped, and each
+rewrite is conditional on the object's ETag, so a record updated by the processor
+while the script runs is left alone (run the script again to pick it up).
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+# The codec is shared with the services; use the analytics service's copy
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "analytics"))
+from metadata_codec import decode_metadata, encode_metadata, is_current  # noqa: E402
+
+s3_client = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
+
+
+def metadata_keys(bucket: str):
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix="metadata/"):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith(".json"):
+                yield obj["Key"]
+
+
+def migrate_record(bucket: str, key: str, encoding: str, dry_run: bool):
+    """
+    Rewrite one metadata record.
+
+    Returns:
+        (outcome, bytes before, bytes after), outcome being "current", "migrated",
+        "changed" (updated concurrently) or "failed"
+    """
+    try:
+        obj = s3_client.get_object(Bucket=bucket, Key=key)
+        body = obj["Body"].read()
+        if is_current(body, encoding):
+            return "current", len(body), len(body)
+        new_body, content_type = encode_metadata(decode_metadata(body), encoding)
+        if not dry_run:
+            s3_client.put_object(
+                Bucket=bucket,
+                Key=key,
+                Body=new_body,
+                ContentType=content_type,
+                IfMatch=obj["ETag"]
+            )
+        return "migrated", len(body), len(new_body)
+    except s3_client.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+            return "changed", 0, 0
+        print(f"{key}: {str(e)}")
+        return "failed", 0, 0
+    except ValueError as e:
+        print(f"{key}: {str(e)}")
+        return "failed", 0, 0
+
+
+def migrate(bucket: str, encoding: str, dry_run: bool, concurrency: int):
+    counts = {"current": 0, "migrated": 0, "changed": 0, "failed": 0}
+    bytes_before = bytes_after = 0
+
+    print(f"Migrating metadata in s3://{bucket}/metadata/ to {encoding}{' (dry run)' if dry_run else ''}")
+    print("-" * 50)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = executor.map(lambda key: migrate_record(bucket, key, encoding, dry_run), metadata_keys(bucket))
+        for i, (outcome, before, after) in enumerate(results, 1):
+            counts[outcome] += 1
+            if outcome == "migrated":
+                bytes_before += before
+                bytes_after += after
+            if i % 100 == 0:
+                print(f"[{i}] {counts['migrated']} migrated, {counts['current']} already current")
+
+    print("-" * 50)
+    print(f"Completed: {counts['migrated']} migrated, {counts['current']} already current, "
+          f"{counts['changed']} changed during migration, {counts['failed']} failed")
+    if counts["migrated"]:
+        print(f"Migrated records: {bytes_before} bytes -> {bytes_after} bytes "
+              f"({100 * (bytes_after - bytes_before) / bytes_before:+.1f}%)")
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rewrite video metadata records in the current schema and encoding")
+    parser.add_argument("--bucket", default=os.getenv("S3_BUCKET_NAME", "video-analytics-uploads"))
+    parser.add_argument("--encoding", choices=("binary", "json"), default=os.getenv("METADATA_ENCODING", "binary"))
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    counts = migrate(args.bucket, args.encoding, args.dry_run, args.concurrency)
+    sys.exit(1 if counts["failed"] else 0)